@@ -0,0 +1,497 @@
+# @title   : run_benchmarks.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Synthetic pipeline benchmarks for ImageCoordinatePicker with JSON output and baseline comparison.
+# @License : MIT License
+#
+# 生成合成的背景、叠加图片与坐标点，测量各处理流程的耗时:
+#     python benchmarks/run_benchmarks.py                           快速档，结果以JSON输出到标准输出
+#     python benchmarks/run_benchmarks.py --full -o result.json     720p~8K、1~1000张叠加图片、10~100万个坐标点
+#     python benchmarks/run_benchmarks.py --save-baseline baseline.json
+#     python benchmarks/run_benchmarks.py --baseline baseline.json  比较基线，有性能退化时返回1
+#
+# gui.startup为启动到显示第一帧的耗时(子进程中测量)，gui.startup_process为启动并退出的进程总耗时。
+# core.*与project.*不需要图形界面；gui.*需要Tk，没有显示器时自动启动Xvfb，找不到Xvfb时跳过并记录在skipped中。
+# 运行期间缓存目录指向临时目录，不会改动用户的磁盘缓存和自动保存文件。
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from picker_core import Layout, OverlayItem, SpatialGrid, parse_coordinate_text, write_layout_text
+from picker_points import PointStore
+from picker_project import ProjectState, ProjectWriter
+from renpy_export import RenpyExportOptions, write_screens
+
+# 结果文件格式版本
+RESULT_VERSION = 1
+# 背景尺寸档位
+BACKGROUND_SIZES = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+# 快速档与完整档的工作量: (背景, 叠加图片数量, 坐标点数量)
+QUICK_WORKLOAD = (("1080p",), (1, 100), (10, 10000))
+FULL_WORKLOAD = (("720p", "1080p", "4k", "8k"), (1, 10, 100, 1000), (10, 1000, 100000, 1000000))
+# 合成叠加图片时最多生成的不同文件数(其余重复使用，与实际项目中的重复素材相近)
+MAX_SPRITE_FILES = 50
+# 拖动和缩放窗口时模拟的帧数
+DRAG_FRAMES = 60
+RESIZE_STEPS = ((900, 600), (1400, 800), (1100, 700), (1600, 900))
+# 测量启动耗时时运行的主程序(以--startup-time启动，显示第一帧后输出耗时并退出)
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+# Xvfb使用的显示编号
+XVFB_DISPLAY = ":97"
+# 判定为性能退化的默认阈值: 中位数变慢超过该比例且绝对差超过最小差值(秒)
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA = 0.005
+
+
+def isolate_cache_dir(directory):
+    #####让default_cache_dir()指向临时目录(需要在导入main之前调用)#####
+    os.environ["XDG_CACHE_HOME"] = directory
+    os.environ["LOCALAPPDATA"] = directory
+    if sys.platform == "darwin":
+        os.environ["HOME"] = directory
+
+
+def synthetic_points(count, width, height, seed=1):
+    #####生成可重复的随机坐标点#####
+    rng = random.Random(seed)
+    return [(rng.randrange(width), rng.randrange(height)) for _ in range(count)]
+
+
+def measure(function, repeat, setup=None):
+    #####运行repeat次并返回耗时统计，setup的返回值传给function且不计入耗时#####
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(state)
+        times.append(time.perf_counter() - start)
+    return {"median": statistics.median(times), "min": min(times), "repeat": repeat}
+
+
+def benchmark_name(group, name, **params):
+    #####结果名称，例如 gui.drag[bg=1080p,overlays=100]#####
+    return f"{group}.{name}[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def run_core_benchmarks(workload, repeat, work_dir, results):
+    #####不依赖图形界面的流程: 解析、导出、空间索引、坐标点存储与项目保存#####
+    backgrounds, overlay_counts, point_counts = workload
+    width, height = BACKGROUND_SIZES[backgrounds[0]]
+    overlays = [OverlayItem(f"sprite_{index}", index % width, index % height, 64, 64, f"sprite_{index}.png")
+                for index in range(max(overlay_counts))]
+
+    for count in point_counts:
+        points = synthetic_points(count, width, height)
+        text = "".join(f"({x}, {y})\n" for x, y in points)
+        layout = Layout(width, height, points, overlays, "background.png", "bench")
+
+        results[benchmark_name("core", "parse", points=count)] = measure(
+            lambda _: parse_coordinate_text(text), repeat)
+        results[benchmark_name("core", "export_text", points=count)] = measure(
+            lambda _: write_layout_text(layout, io.StringIO()), repeat)
+        results[benchmark_name("core", "export_renpy", points=count)] = measure(
+            lambda _: write_screens([layout], io.StringIO(), RenpyExportOptions()), repeat)
+
+        def spatial(_):
+            grid = SpatialGrid()
+            for index, (x, y) in enumerate(points):
+                grid.insert(index, (x, y, x, y))
+            for x, y in points[:1000]:
+                grid.nearest(x, y, 8)
+        results[benchmark_name("core", "spatial_index", points=count)] = measure(spatial, repeat)
+
+        def point_store(_):
+            # 建立存储、换算一次画布坐标(缩放后重绘)、删除一半的点后按行读取
+            store = PointStore(points)
+            store.to_canvas(10, 10, 1.5, 1.5)
+            for point_id in range(0, count, 2):
+                store.remove_id(point_id)
+            store.snapshot()
+        results[benchmark_name("core", "point_store", points=count)] = measure(point_store, repeat)
+
+        project_path = os.path.join(work_dir, f"bench_{count}.icpproj")
+
+        def project_state():
+            state = ProjectState()
+            state.background_path = "background.png"
+            state.background_sha1 = "0" * 40
+            state.width, state.height = width, height
+            state.points = list(points)
+            return state
+
+        def save_project(state):
+            # 完整快照一次，再追加一次修改了最后一个点的增量
+            writer = ProjectWriter(project_path)
+            writer.save(state)
+            changed = project_state()
+            if changed.points:
+                changed.points[-1] = (0, 0)
+            writer.save(changed)
+        results[benchmark_name("project", "save", points=count)] = measure(save_project, repeat, project_state)
+
+
+def start_tk():
+    #####创建Tk根窗口，没有显示器时尝试启动Xvfb，返回(根窗口或None, Xvfb进程或None)#####
+    import tkinter as tk
+    try:
+        return tk.Tk(), None
+    except tk.TclError:
+        pass
+
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None, None
+    process = subprocess.Popen(
+        [xvfb, XVFB_DISPLAY, "-screen", "0", "1920x1080x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    os.environ["DISPLAY"] = XVFB_DISPLAY
+    for _ in range(50):
+        time.sleep(0.1)
+        try:
+            return tk.Tk(), process
+        except tk.TclError:
+            continue
+    process.terminate()
+    return None, None
+
+
+class FakeEvent:
+    #####模拟Tk鼠标事件#####
+    def __init__(self, x, y, state=0):
+        self.x = x
+        self.y = y
+        self.state = state
+
+
+class GuiBench:
+    #####在真实的Tk窗口中构造合成项目并测量界面流程#####
+    def __init__(self, root, work_dir):
+        import main
+        self.main = main
+        # 界面启动时不导入PIL，这里生成合成图片需要先导入
+        main.load_imaging()
+        self.root = root
+        self.work_dir = work_dir
+        self.app = main.ImageCoordinatePicker(root)
+        self.root.geometry("1400x800")
+        self.root.update()
+
+    def close(self):
+        #####停止后台线程并销毁窗口#####
+        self.app.autosave.stop()
+        self.root.destroy()
+
+    def background_file(self, label):
+        #####生成(或复用)指定尺寸的合成背景图片#####
+        path = os.path.join(self.work_dir, f"background_{label}.bmp")
+        if not os.path.exists(path):
+            Image = self.main.Image
+            width, height = BACKGROUND_SIZES[label]
+            image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+            image.save(path)
+        return path
+
+    def sprite_files(self, count):
+        #####生成合成的叠加图片文件(最多MAX_SPRITE_FILES个不同文件)#####
+        Image = self.main.Image
+        paths = []
+        for index in range(min(count, MAX_SPRITE_FILES)):
+            path = os.path.join(self.work_dir, f"sprite_{index}.png")
+            if not os.path.exists(path):
+                size = 32 + (index * 7) % 96
+                Image.new("RGBA", (size, size), (index * 5 % 256, 128, 255 - index * 5 % 256, 200)).save(path)
+            paths.append(path)
+        return [paths[index % len(paths)] for index in range(count)]
+
+    def open_background(self, label):
+        #####打开背景图片(清空坐标点与叠加图片)#####
+        self.app.open_background_file(self.background_file(label))
+        self.root.update()
+
+    def load_overlays(self, count):
+        #####加载count张叠加图片并等待后台解码完成#####
+        if not count:
+            return
+        width, height = self.app.background_image.size
+        rng = random.Random(count)
+        entries = [
+            (path, None, (rng.randrange(width), rng.randrange(height)))
+            for path in self.sprite_files(count)
+        ]
+        done = []
+        self.app.load_overlay_files(entries, on_loaded=done.append)
+        while not done:
+            self.root.update()
+            time.sleep(0.005)
+
+    def resize(self, _):
+        #####依次改变窗口尺寸，每次执行一次预览渲染和一次高质量渲染#####
+        for width, height in RESIZE_STEPS:
+            self.root.geometry(f"{width}x{height}")
+            self.root.update()
+            self.app.render_resize_preview()
+            self.app.render_resize_final()
+            self.root.update_idletasks()
+
+    def drag(self, _):
+        #####选中所有叠加图片，成组拖动DRAG_FRAMES帧#####
+        app = self.app
+        if not app.draggable_images:
+            return
+        app.set_image_selection(app.draggable_images, app.draggable_images[0])
+        primary = app.draggable_images[0]
+        x, y = primary.canvas_origin()
+        primary.on_press(FakeEvent(x + 1, y + 1))
+        for frame in range(1, DRAG_FRAMES + 1):
+            primary.on_drag(FakeEvent(x + 1 + frame, y + 1 + frame // 2))
+            # 模拟一帧: 立即执行按帧合并的刷新
+            if app.group_drag_job is not None:
+                self.root.after_cancel(app.group_drag_job)
+                app.group_drag_job = None
+            app.flush_group_drag()
+            self.root.update_idletasks()
+        primary.on_release(FakeEvent(x + 1 + DRAG_FRAMES, y + 1 + DRAG_FRAMES // 2))
+
+    def toggle_mode(self, _):
+        #####切换到叠加图片模式再切换回来#####
+        self.app.toggle_mode()
+        self.app.toggle_mode()
+        self.root.update_idletasks()
+
+    def repair_z_order(self, _):
+        #####置顶叠加图片(恢复图层顺序)#####
+        self.app.bring_images_to_top()
+        self.root.update_idletasks()
+
+    def import_points(self, path):
+        #####执行真实的导入坐标流程(后台解析、进度对话框、按批次添加)，文件对话框与提示框改为直接返回#####
+        main = self.main
+        messages = []
+        replacements = {
+            (main.filedialog, "askopenfilename"): lambda **_: path,
+            (main.messagebox, "showinfo"): lambda *args, **_: messages.append(args),
+            (main.messagebox, "showwarning"): lambda *args, **_: messages.append(args),
+            (main.messagebox, "showerror"): lambda *args, **_: messages.append(args),
+        }
+        originals = {key: getattr(*key) for key in replacements}
+        for (module, name), replacement in replacements.items():
+            setattr(module, name, replacement)
+        try:
+            self.app.import_coordinates()
+            # 导入结束时会弹出一个提示框
+            while not messages:
+                self.root.update()
+                time.sleep(0.001)
+        finally:
+            for (module, name), original in originals.items():
+                setattr(module, name, original)
+        title, message = messages[0][:2]
+        if title != "成功":
+            raise RuntimeError(f"导入坐标失败: {message}")
+
+    def export(self, _):
+        #####导出保存数据与Ren'Py screen#####
+        layout = self.app.build_layout()
+        write_layout_text(layout, io.StringIO())
+        write_screens([layout], io.StringIO(), RenpyExportOptions())
+
+
+def measure_startup(repeat):
+    #####在子进程中启动主程序repeat次，返回(启动到第一帧的耗时统计, 进程总耗时统计)，失败时返回(None, None)#####
+    first_frames = []
+    processes = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run([sys.executable, MAIN_SCRIPT, "--startup-time"],
+                                       capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return None, None
+        elapsed = time.perf_counter() - start
+        values = [line.split()[1] for line in completed.stdout.splitlines() if line.startswith("first_frame_ms ")]
+        if completed.returncode != 0 or not values:
+            return None, None
+        first_frames.append(float(values[-1]) / 1000)
+        processes.append(elapsed)
+    return (
+        {"median": statistics.median(first_frames), "min": min(first_frames), "repeat": repeat},
+        {"median": statistics.median(processes), "min": min(processes), "repeat": repeat},
+    )
+
+
+def run_gui_benchmarks(root, workload, repeat, work_dir, results):
+    #####界面流程: 缩放窗口、拖动、模式切换、图层修复、导入与导出#####
+    backgrounds, overlay_counts, point_counts = workload
+    bench = GuiBench(root, work_dir)
+    try:
+        for label in backgrounds:
+            for count in overlay_counts:
+                bench.open_background(label)
+                bench.load_overlays(count)
+                params = {"bg": label, "overlays": count}
+                results[benchmark_name("gui", "resize", **params)] = measure(bench.resize, repeat)
+                results[benchmark_name("gui", "mode_toggle", **params)] = measure(bench.toggle_mode, repeat)
+                results[benchmark_name("gui", "z_order", **params)] = measure(bench.repair_z_order, repeat)
+                bench.app.toggle_mode()
+                results[benchmark_name("gui", "drag", **params)] = measure(bench.drag, repeat)
+
+        label = backgrounds[0]
+        for count in point_counts:
+            path = os.path.join(work_dir, f"points_{count}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(f"({x}, {y})\n" for x, y in synthetic_points(count, *BACKGROUND_SIZES[label]))
+
+            def fresh_background():
+                bench.open_background(label)
+                return path
+            results[benchmark_name("gui", "import", bg=label, points=count)] = measure(
+                bench.import_points, repeat, fresh_background)
+
+            # 导出使用导入后的坐标点与最多的叠加图片
+            bench.load_overlays(max(overlay_counts))
+            results[benchmark_name("gui", "export", bg=label, points=count, overlays=max(overlay_counts))] = measure(
+                bench.export, repeat)
+    finally:
+        bench.close()
+
+
+def missing_results(results, baseline, skipped=()):
+    #####基线中有、本次没有运行的项目，返回(未运行的项目, 因跳过而未运行的项目)#####
+    prefixes = tuple(reason.split(":", 1)[0] for reason in skipped)
+    missing = sorted(set(baseline.get("results", {})) - set(results))
+    unexpected = [name for name in missing if not (prefixes and name.startswith(prefixes))]
+    return unexpected, [name for name in missing if name not in unexpected]
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA):
+    #####与基线比较，返回[(名称, 基线中位数, 当前中位数, 比值)]中的退化项#####
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        old, new = base["median"], result["median"]
+        ratio = new / old if old > 0 else float("inf")
+        if new - old > min_delta and ratio > 1 + tolerance:
+            regressions.append((name, old, new, ratio))
+    return regressions
+
+
+def build_parser():
+    #####命令行参数#####
+    parser = argparse.ArgumentParser(description="ImageCoordinatePicker 合成负载基准测试")
+    parser.add_argument("--full", action="store_true", help="运行完整档(720p~8K、1~1000张叠加图片、10~100万个坐标点)")
+    parser.add_argument("--backgrounds", help="逗号分隔的背景档位，例如 1080p,4k")
+    parser.add_argument("--overlays", help="逗号分隔的叠加图片数量")
+    parser.add_argument("--points", help="逗号分隔的坐标点数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数(取中位数)")
+    parser.add_argument("--no-gui", action="store_true", help="只运行不需要图形界面的项目")
+    parser.add_argument("-o", "--output", help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--baseline", help="与基线JSON比较，有退化时返回1")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="允许变慢的比例")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA, help="忽略小于该值(秒)的差异")
+    return parser
+
+
+def main(argv=None):
+    #####运行基准测试，返回退出码#####
+    args = build_parser().parse_args(argv)
+    backgrounds, overlay_counts, point_counts = FULL_WORKLOAD if args.full else QUICK_WORKLOAD
+    if args.backgrounds:
+        backgrounds = tuple(args.backgrounds.split(","))
+        unknown = [label for label in backgrounds if label not in BACKGROUND_SIZES]
+        if unknown:
+            print(f"未知的背景档位: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+    if args.overlays:
+        overlay_counts = tuple(int(value) for value in args.overlays.split(","))
+    if args.points:
+        point_counts = tuple(int(value) for value in args.points.split(","))
+    workload = (backgrounds, overlay_counts, point_counts)
+
+    results = {}
+    skipped = []
+    work_dir = tempfile.mkdtemp(prefix="icp_bench_")
+    isolate_cache_dir(os.path.join(work_dir, "cache"))
+    xvfb = None
+    try:
+        run_core_benchmarks(workload, args.repeat, work_dir, results)
+        if args.no_gui:
+            skipped.append("gui: --no-gui")
+        else:
+            root, xvfb = start_tk()
+            if root is None:
+                skipped.append("gui: 没有可用的显示器或Xvfb")
+            else:
+                # 启动耗时在独立进程中测量(当前进程已经导入了各模块)
+                first_frame, process = measure_startup(args.repeat)
+                if first_frame is None:
+                    skipped.append("gui.startup: 主程序没有输出启动耗时")
+                else:
+                    results[benchmark_name("gui", "startup")] = first_frame
+                    results[benchmark_name("gui", "startup_process")] = process
+                run_gui_benchmarks(root, workload, args.repeat, work_dir, results)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "version": RESULT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workload": {"backgrounds": backgrounds, "overlays": overlay_counts, "points": point_counts},
+        "repeat": args.repeat,
+        "skipped": skipped,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance, args.min_delta)
+        for name, old, new, ratio in regressions:
+            print(f"性能退化: {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms (x{ratio:.2f})", file=sys.stderr)
+        # 基线中的项目没有运行时无法判断是否退化: 因显示器等原因跳过的只提示，其余视为失败
+        missing, skipped_missing = missing_results(results, baseline, skipped)
+        if skipped_missing:
+            print(f"已跳过基线中的 {len(skipped_missing)} 项: {', '.join(skipped)}", file=sys.stderr)
+        for name in missing:
+            print(f"未运行: {name}", file=sys.stderr)
+        if regressions or missing:
+            return 1
+        print(f"与基线相比没有性能退化 ({len(results)} 项)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,17 +7,560 @@
 # @Version : V1.2
 # @License : MIT License
 
+import time
+
+# 程序开始启动的时间(在导入其他模块之前记录)，用于计算启动到显示第一帧的耗时
+STARTUP_STARTED = time.perf_counter()
+
+import itertools
 import os
+import queue
+import sys
+import threading
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import filedialog, messagebox, ttk, simpledialog
 
-from PIL import Image, ImageTk
+from picker_core import (
+    Layout, OverlayItem, SnapLines, SpatialGrid, align_boxes, background_to_canvas, canvas_to_background,
+    COORDINATE_MAX, COORDINATE_MIN, default_cache_dir, distribute_boxes, is_valid_coordinate,
+    iter_coordinate_chunks, scaled_size, write_layout_text
+)
+from picker_history import (
+    AddOverlays, CommandGroup, DeletePointIndices, DeletePoints, History, InsertPoints, MoveOverlays,
+    RemoveOverlays, SetOverlayProperty, SetPoint, SetPointLabel
+)
+from picker_cache import DiskImageCache, entry_key
+from picker_project import PROJECT_EXTENSION, AutosaveWorker, ProjectState, file_sha1, read_project
+from picker_listview import VirtualListView
+from picker_points import PointStore
+from picker_profile import PROFILER, TkCallProxy, instrument
+
+# 窗口缩放期间预览渲染的最小间隔(毫秒)，约等于一帧
+RESIZE_PREVIEW_INTERVAL_MS = 16
+# 窗口尺寸稳定多久后执行高质量渲染(毫秒)
+RESIZE_SETTLE_DELAY_MS = 150
+# 重采样滤镜(取值与PIL.Image.Resampling相同，启动时不需要导入PIL)
+RESAMPLE_NEAREST = 0
+RESAMPLE_LANCZOS = 1
+# 缩放过程中使用的快速低质量重采样滤镜
+RESIZE_PREVIEW_FILTER = RESAMPLE_NEAREST
+# 拖动期间画布与列表刷新的最小间隔(毫秒)，约等于一帧
+DRAG_LIST_UPDATE_INTERVAL_MS = 16
+# 坐标点标注的半径(像素)
+POINT_RADIUS = 3
+# 缩放图片缓存的内存上限(字节)
+SCALED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 导入坐标时每次界面刷新最多添加的坐标点数量
+IMPORT_POINTS_PER_TICK = 5000
+# 导入坐标时界面轮询后台结果的间隔(毫秒)
+IMPORT_POLL_INTERVAL_MS = 15
+# 批量添加图片时解码与缩放的线程数
+DECODE_WORKERS = os.cpu_count() or 4
+# 背景图块的边长(画布像素)
+TILE_SIZE = 256
+# 放大查看时叠加图片只缩放视口向外扩展这么多(画布像素)的部分，平移时不必每次重新裁剪
+OVERLAY_CROP_MARGIN = 256
+# 每次滚轮缩放的倍率
+ZOOM_STEP = 1.25
+# 相对于"适应窗口"的最小缩放倍率
+ZOOM_MIN = 0.25
+# 最大缩放时一个原图像素在画布上的最大边长(像素)
+ZOOM_MAX_DISPLAY_SCALE = 8.0
+# 状态栏刷新的最小间隔(毫秒)，约等于一帧
+STATUS_UPDATE_INTERVAL_MS = 16
+# 取色范围选项(边长为奇数的正方形区域)
+SAMPLE_SIZES = ("1x1", "3x3", "5x5")
+# 按原始数值取色的16位灰度模式(I模式的PNG同样按16位范围换算)
+HIGH_DEPTH_MODES = ("I", "I;16", "I;16L", "I;16B", "I;16N")
+# 导入Ren'Py screen时搜索结果最多显示的数量
+RENPY_SEARCH_LIMIT = 500
+# 自动保存的间隔(毫秒)
+AUTOSAVE_INTERVAL_MS = 5000
+# 未保存为项目时自动保存的恢复文件，程序启动时上一次的恢复文件改名保留(已有未恢复的文件时依次编号，不覆盖)
+RECOVERY_FILE_NAME = "autosave" + PROJECT_EXTENSION
+PREVIOUS_RECOVERY_PREFIX = "autosave.previous"
+# 缓存目录中记录上次打开或保存的项目路径的文件，启动后在后台重新打开该项目
+LAST_PROJECT_FILE_NAME = "last_project.txt"
+# 叠加图片空间索引的单元格边长(背景像素)
+OVERLAY_CELL_SIZE = 256
+# 悬停高亮与点选坐标点的范围(画布像素)
+PICK_RADIUS = 8
+# 悬停高亮与框选框的颜色
+HOVER_COLOR = "#1e90ff"
+# 拖动距离小于此值(画布像素)时按点选处理
+BAND_MIN_SIZE = 4
+# 拖动叠加图片时的吸附距离(画布像素)
+SNAP_DISTANCE = 6
+# 网格尺寸选项(背景像素)
+GRID_SIZES = ("关", "8", "10", "16", "20", "32", "50", "64")
+# 吸附参考线的颜色
+GUIDE_COLOR = "#ff00ff"
+# 成组拖动期间临时加在画布元素上的标签，每帧用一次move移动整组图片
+GROUP_DRAG_TAG = "group_drag"
+# 方向键微移的步长(背景像素)，按住Shift时使用较大的步长
+NUDGE_STEP = 1
+NUDGE_STEP_LARGE = 10
+# 鼠标事件state中的修饰键位
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+# 对齐菜单: (菜单文本, 对齐方式)，None为分隔线
+ALIGN_MENU_ITEMS = (
+    ("左对齐", "left"), ("水平居中", "center"), ("右对齐", "right"), None,
+    ("顶端对齐", "top"), ("垂直居中", "middle"), ("底端对齐", "bottom"), None,
+    ("水平等距分布", "horizontal"), ("垂直等距分布", "vertical")
+)
+# 性能监视面板的刷新间隔(毫秒)
+PROFILE_PANEL_INTERVAL_MS = 250
+# 性能监视面板中列出的耗时最多的调用数量
+PROFILE_TOP_COUNT = 5
+# 性能监视期间记录输入时间的事件(用于计算输入到画面刷新的延迟)
+PROFILE_INPUT_EVENTS = ("<Motion>", "<ButtonPress>", "<KeyPress>", "<MouseWheel>", "<Configure>")
+
+# 叠加图片在项目文件中的id
+overlay_ids = itertools.count(1)
+
+# 启动时不导入PIL与NumPy(约占模块导入时间的大半)，第一次需要图片时由load_imaging()导入
+Image = ImageTk = np = None
+imaging_lock = threading.Lock()
+
+
+def iter_index_runs(indices):
+    #####把升序的行号合并为连续区间(首行, 末行)#####
+    first = last = None
+    for index in indices:
+        if last is not None and index == last + 1:
+            last = index
+            continue
+        if first is not None:
+            yield first, last
+        first = last = index
+    if first is not None:
+        yield first, last
+
+
+def format_bytes(nbytes):
+    #####把字节数格式化为便于阅读的文本#####
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
+
+
+def load_imaging():
+    #####第一次需要解码或显示图片时导入PIL与NumPy并打开磁盘缓存(可以在任意线程调用)#####
+    global Image, ImageTk, np, disk_image_cache
+    if Image is not None:
+        return
+    with imaging_lock:
+        if Image is not None:
+            return
+        from PIL import Image as pil_image, ImageTk as pil_image_tk
+        try:
+            import numpy as numpy_module
+        except ImportError:  # 未安装NumPy时退回PIL逐像素读取
+            numpy_module = None
+        disk_image_cache = DiskImageCache()
+        ImageTk, np = pil_image_tk, numpy_module
+        # Image最后赋值: 其他线程看到Image不为None时其余模块都已就绪
+        Image = pil_image
+
+
+def load_image_file(file_path):
+    #####完整读取图片并立即关闭文件句柄(Image.open是惰性的，会一直占用句柄)#####
+    load_imaging()
+    with Image.open(file_path) as image:
+        image.load()
+    return image
+
+
+def unused_recovery_path(directory):
+    #####为上次遗留的恢复文件选择不覆盖已有文件的路径(autosave.previous.icpproj、autosave.previous.2.icpproj...)#####
+    path = os.path.join(directory, PREVIOUS_RECOVERY_PREFIX + PROJECT_EXTENSION)
+    number = 2
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{PREVIOUS_RECOVERY_PREFIX}.{number}{PROJECT_EXTENSION}")
+        number += 1
+    return path
+
+
+def leftover_recovery_files(directory):
+    #####尚未恢复的自动保存文件，最近修改的在前#####
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    paths = [os.path.join(directory, name) for name in names
+             if name.startswith(PREVIOUS_RECOVERY_PREFIX) and name.endswith(PROJECT_EXTENSION)]
+    stamped = []
+    for path in paths:
+        try:
+            stamped.append((os.path.getmtime(path), path))
+        except OSError:
+            pass
+    return [path for _, path in sorted(stamped, reverse=True)]
+
+
+def background_changed(state):
+    #####项目保存后背景图片是否被修改(按内容哈希判断，无法读取时视为未修改)#####
+    if not state.background_sha1:
+        return False
+    try:
+        return file_sha1(state.background_path) != state.background_sha1
+    except OSError:
+        return False
+
+
+def read_cached_image(digest, size, resample):
+    #####从磁盘缓存读取缩放结果，未命中时返回None#####
+    entry = disk_image_cache.get(entry_key(digest, size, resample))
+    if entry is None:
+        return None
+    with entry:
+        # frombuffer直接引用映射的内存，复制一份后才能解除映射
+        view = Image.frombuffer(entry.mode, entry.size, entry.data, "raw", entry.mode, 0, 1)
+        image = view.copy()
+        del view
+    return image
+
+
+def write_cached_image(digest, scaled, resample):
+    #####把缩放结果写入磁盘缓存(只缓存高质量滤镜的结果，缩放窗口时的预览不写入)#####
+    if resample != RESAMPLE_LANCZOS:
+        return
+    if scaled.mode not in ("L", "LA", "RGB", "RGBA"):
+        scaled = scaled.convert("RGBA")
+    disk_image_cache.put(entry_key(digest, scaled.size, resample), scaled.mode, scaled.size, scaled.tobytes())
+
+
+def write_cached_image_later(digest, scaled, resample):
+    #####在后台线程中写入磁盘缓存，界面线程不等待转换与写文件#####
+    global cache_writer
+    if cache_writer is None:
+        from concurrent.futures import ThreadPoolExecutor
+        cache_writer = ThreadPoolExecutor(max_workers=1)
+    cache_writer.submit(write_cached_image, digest, scaled, resample)
+
+
+@instrument("decode_overlay_image", "pil")
+def decode_overlay_image(file_path, scale_x, scale_y):
+    #####后台线程: 预先缩放到当前背景缩放比例，返回(原图或None, 原图尺寸, 缩放图片, 内容哈希)#####
+    load_imaging()
+    # 源文件未变化且磁盘缓存中已有这一尺寸时不需要解码原图
+    info = disk_image_cache.source_info(file_path)
+    if info is not None:
+        digest, width, height = info
+        scaled = read_cached_image(digest, scaled_size(width, height, scale_x, scale_y), RESAMPLE_LANCZOS)
+        if scaled is not None:
+            return None, (width, height), scaled, digest
+
+    # PIL的解码与缩放会释放GIL，多个线程可以并行利用多核
+    image = load_image_file(file_path)
+    scaled = image.resize(scaled_size(image.width, image.height, scale_x, scale_y), RESAMPLE_LANCZOS)
+    try:
+        digest = disk_image_cache.register_source(file_path, image.width, image.height)
+        write_cached_image(digest, scaled, RESAMPLE_LANCZOS)
+    except OSError:
+        digest = None
+    return image, image.size, scaled, digest
+
+
+class OverlaySource:
+    #####叠加图片的源文件: 常驻尺寸与路径，解码后的图片在节省内存模式下用完即释放，需要新的缩放尺寸时再读取#####
+    def __init__(self, path, image, size, stamp=None, keep_decoded=True, digest=None):
+        self.path = path
+        self.stamp = stamp  # 源文件的(修改时间, 大小)，用于判断能否共享
+        self.digest = digest  # 源文件内容的SHA-1，用于查找磁盘缓存
+        self.width, self.height = size
+        self.keep_decoded = keep_decoded
+        self.image = image if keep_decoded else None
+        self.users = 0  # 使用该源的叠加图片数量
+        self.reloads = 0  # 从磁盘重新读取的次数
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def decoded(self):
+        #####返回解码后的图片，已释放时从源文件重新读取#####
+        if self.image is not None:
+            return self.image
+        image = load_image_file(self.path)
+        # 源文件在此期间被修改时按原尺寸使用，保持布局不变
+        if image.size != self.size:
+            image = image.resize(self.size, RESAMPLE_LANCZOS)
+        self.reloads += 1
+        if self.keep_decoded:
+            self.image = image
+        return image
+
+    @instrument("OverlaySource.resize", "pil")
+    def resize(self, size, resample):
+        #####缩放到指定尺寸(供缩放缓存未命中时调用)，优先使用磁盘缓存#####
+        if self.digest is not None and resample == RESAMPLE_LANCZOS:
+            scaled = read_cached_image(self.digest, size, resample)
+            if scaled is not None:
+                return scaled
+        scaled = self.decoded().resize(size, resample)
+        # 只缓存不超过原图尺寸的结果: 放大查看时的大尺寸结果占用空间多，还会挤掉常用的适应窗口尺寸
+        if (self.digest is not None and resample == RESAMPLE_LANCZOS
+                and size[0] <= self.width and size[1] <= self.height):
+            write_cached_image_later(self.digest, scaled, resample)
+        return scaled
+
+    @instrument("OverlaySource.resize_region", "pil")
+    def resize_region(self, size, box, resample):
+        #####缩放到size时只生成显示区域box(显示像素)对应的部分，供放大查看时裁剪到视口#####
+        left, top, right, bottom = box
+        ratio_x = self.width / size[0]
+        ratio_y = self.height / size[1]
+        return self.decoded().resize(
+            (right - left, bottom - top), resample,
+            box=(left * ratio_x, top * ratio_y, right * ratio_x, bottom * ratio_y)
+        )
+
+    def set_keep_decoded(self, keep_decoded):
+        #####切换是否常驻解码后的图片#####
+        self.keep_decoded = keep_decoded
+        if not keep_decoded:
+            self.image = None
+
+    def nbytes(self):
+        #####解码后的图片占用的内存，已释放时为0#####
+        return self.width * self.height * len(self.image.getbands()) if self.image is not None else 0
+
+
+class OverlaySourcePool:
+    #####按源文件共享OverlaySource: 使用同一文件的叠加图片只保留一份解码结果和缩放结果#####
+    def __init__(self):
+        self.sources = {}  # 规范化的绝对路径 -> OverlaySource
+        self.keep_decoded = True
+
+    def acquire(self, file_path, image, size, digest=None):
+        #####为刚加载的图片取得共享的源，文件未变化时沿用已有的源；image为None表示原图未解码#####
+        key = os.path.normcase(os.path.abspath(file_path))
+        try:
+            stat = os.stat(file_path)
+            stamp = (stat.st_mtime, stat.st_size)
+        except OSError:
+            stamp = None
+        source = self.sources.get(key)
+        if source is None or stamp is None or source.stamp != stamp:
+            source = OverlaySource(file_path, image, size, stamp, self.keep_decoded, digest)
+            self.sources[key] = source
+        elif source.image is None and image is not None and self.keep_decoded:
+            source.image = image
+        source.users += 1
+        return source
+
+    def release(self, source):
+        #####一张叠加图片不再使用该源，没有使用者时释放解码结果与缩放缓存#####
+        source.users -= 1
+        if source.users > 0:
+            return
+        key = os.path.normcase(os.path.abspath(source.path))
+        if self.sources.get(key) is source:
+            del self.sources[key]
+        source.image = None
+        scaled_image_cache.invalidate(source)
+
+    def set_keep_decoded(self, keep_decoded):
+        #####切换所有源的存储方式#####
+        self.keep_decoded = keep_decoded
+        for source in self.sources.values():
+            source.set_keep_decoded(keep_decoded)
+
+    def clear(self):
+        #####背景更换时丢弃所有源#####
+        self.sources.clear()
+
+
+class ScaledImageCache:
+    #####按(源图片, 目标尺寸, 重采样滤镜)缓存缩放后的PhotoImage的LRU缓存#####
+    def __init__(self, max_bytes=SCALED_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (源图片, PhotoImage, 占用字节数)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, size, resample=RESAMPLE_LANCZOS):
+        #####获取缩放后的PhotoImage，未命中时缩放并缓存#####
+        # 条目中保留源图片引用，保证缓存存活期间id(source)不会被复用
+        key = (id(source), size, resample)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return self.put(source, size, resample, source.resize(size, resample))
+
+    @instrument("ScaledImageCache.put", "tk")
+    def put(self, source, size, resample, scaled):
+        #####放入已缩放好的图片(例如后台线程预先缩放的结果)，返回PhotoImage#####
+        # 已有相同条目时沿用，使用同一源的叠加图片共享同一张PhotoImage
+        key = (id(source), size, resample)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry[1]
+        photo = ImageTk.PhotoImage(scaled)
+
+        # 缩放后的PIL图片转换后即丢弃，只计算Tk端PhotoImage的RGBA缓冲区
+        width, height = size
+        nbytes = width * height * 4
+        self.entries[key] = (source, photo, nbytes)
+        self.total_bytes += nbytes
+        self.evict()
+        return photo
+
+    def evict(self):
+        #####按最近最少使用顺序淘汰，直到总占用不超过上限(保留最新条目)#####
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry[2]
+
+    def invalidate(self, source):
+        #####删除某张源图片的所有缓存条目#####
+        source_id = id(source)
+        for key in [key for key in self.entries if key[0] == source_id]:
+            self.total_bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        #####清空缓存#####
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        #####返回缓存统计信息#####
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+        }
+
+
+# 背景图片与所有叠加图片共享的缩放缓存
+scaled_image_cache = ScaledImageCache()
+# 跨会话复用的缩放结果磁盘缓存，第一次需要图片时由load_imaging()打开(启动时不读取索引)
+disk_image_cache = None
+# 把界面线程上得到的缩放结果写入磁盘缓存的后台线程，第一次写入时创建
+cache_writer = None
+
+
+class TilePyramid:
+    #####背景图片的2的幂次金字塔，按需生成任意显示尺寸下的单个图块#####
+    def __init__(self, image, min_size=TILE_SIZE):
+        # 调色板等模式无法高质量缩放，统一转换为RGBA
+        base = image if image.mode in ("L", "RGB", "RGBA") else image.convert("RGBA")
+        self.width, self.height = image.size
+
+        # 第n层是原图按2^n缩小的结果，由上一层reduce(2)得到
+        self.levels = [base]
+        while min(self.levels[-1].size) > min_size:
+            self.levels.append(self.levels[-1].reduce(2))
+
+    @instrument("TilePyramid.render_tile", "pil")
+    def render_tile(self, display_size, tile_box, resample=RESAMPLE_LANCZOS):
+        #####生成显示尺寸为display_size时，画面区域tile_box(显示像素)对应的图块#####
+        display_width, display_height = display_size
+        # 每个显示像素对应的原图像素数，选择不小于显示分辨率的最粗一层
+        scale = min(self.width / display_width, self.height / display_height)
+        level_index = 0
+        while level_index + 1 < len(self.levels) and 2 ** (level_index + 1) <= scale:
+            level_index += 1
+        level = self.levels[level_index]
+
+        # 第n层坐标 = 原图坐标 / 2^n
+        factor = 2 ** level_index
+        ratio_x = self.width / (factor * display_width)
+        ratio_y = self.height / (factor * display_height)
+        left, top, right, bottom = tile_box
+        box = (left * ratio_x, top * ratio_y, right * ratio_x, bottom * ratio_y)
+        return level.resize((right - left, bottom - top), resample, box=box)
+
+
+class PixelSampler:
+    #####背景图片的像素数组，加载时转换一次，取色时O(1)查表#####
+    def __init__(self, image):
+        self.width, self.height = image.size
+        # 16位灰度按原始数值取色(convert("RGBA")会把超过255的值截断)，其余模式统一转换为RGBA
+        # 浮点(F)模式按PIL的转换规则截断到0~255
+        self.depth_scale = 255 / 65535 if image.mode in HIGH_DEPTH_MODES else None
+        if self.depth_scale is None:
+            image = image.convert("RGBA")
+        if np is not None:
+            self.pixels = np.ascontiguousarray(np.asarray(image))
+        else:
+            self.pixels = image.load()
+
+    def sample(self, x, y, radius=0):
+        #####读取(x, y)处的RGB颜色，radius>0时取(2*radius+1)^2区域的平均值#####
+        left, right = max(0, x - radius), min(self.width, x + radius + 1)
+        top, bottom = max(0, y - radius), min(self.height, y + radius + 1)
+
+        if self.depth_scale is not None:
+            return self.sample_gray(left, right, top, bottom)
+
+        if np is not None:
+            if radius == 0:
+                return tuple(int(value) for value in self.pixels[y, x, :3])
+            region = self.pixels[top:bottom, left:right, :3]
+            return tuple(int(round(value)) for value in region.mean(axis=(0, 1)))
+
+        if radius == 0:
+            return self.pixels[x, y][:3]
+        totals = [0, 0, 0]
+        for row in range(top, bottom):
+            for column in range(left, right):
+                pixel = self.pixels[column, row]
+                totals[0] += pixel[0]
+                totals[1] += pixel[1]
+                totals[2] += pixel[2]
+        count = (right - left) * (bottom - top)
+        return tuple(int(round(total / count)) for total in totals)
+
+    def sample_gray(self, left, right, top, bottom):
+        #####高位深灰度图片: 按原始数值求平均后换算为0~255的灰度颜色#####
+        if np is not None:
+            value = float(self.pixels[top:bottom, left:right].mean())
+        else:
+            total = sum(self.pixels[column, row] for row in range(top, bottom) for column in range(left, right))
+            value = total / ((right - left) * (bottom - top))
+        gray = max(0, min(255, int(round(value * self.depth_scale))))
+        return gray, gray, gray
+
+
+class CanvasLayerManager:
+    #####按图层顺序管理画布元素的叠放顺序(只调整层级，不重建图片)#####
+    # 图层标签从下到上依次为: 背景、叠加图片、坐标点、坐标文本、悬停高亮与框选框、吸附参考线、性能监视面板
+    DEFAULT_LAYERS = ("background", "draggable", "point", "point_text", "hover", "guide", "profile")
+
+    def __init__(self, canvas, layers=DEFAULT_LAYERS):
+        self.canvas = canvas
+        self.layers = list(layers)
+        self.z_index = {tag: index for index, tag in enumerate(self.layers)}
+
+    def restack(self):
+        #####按z-index从下到上依次抬升各图层，每个图层只需一次画布调用#####
+        for tag in self.layers:
+            self.canvas.tag_raise(tag)
+
+    def raise_in_layer(self, item_id, tag):
+        #####将元素移到所在图层的最上方，但不越过更高的图层#####
+        self.canvas.tag_raise(item_id, tag)
 
 
 class DraggableImage:
-    def __init__(self, canvas, original_image, bg_scale_x, bg_scale_y, bg_x, bg_y, name="叠加图片", x=0, y=0):
+    def __init__(self, canvas, source, bg_scale_x, bg_scale_y, bg_x, bg_y, name="叠加图片", x=0, y=0,
+                 source_path=None, viewport=None):
         self.canvas = canvas
-        self.original_image = original_image
+        self.source = source  # 共享的OverlaySource，只保证尺寸与路径常驻
+        self.source_path = source_path
         self.bg_scale_x = bg_scale_x
         self.bg_scale_y = bg_scale_y
         self.bg_x = bg_x
@@ -28,33 +571,26 @@ class DraggableImage:
         self.drag_offset_y = 0
         self.is_locked = False
         self.is_selected = False  # 跟踪选中状态
-
-        # 计算缩放后的尺寸(与背景图片相同的缩放比例)
-        self.scaled_width = int(round(original_image.width / bg_scale_x))
-        self.scaled_height = int(round(original_image.height / bg_scale_y))
-
-        # 缩放图片
-        self.scaled_image = original_image.resize(
-            (self.scaled_width, self.scaled_height),
-            Image.Resampling.LANCZOS
-        )
-
-        # 创建图像副本
-        self.photo = ImageTk.PhotoImage(self.scaled_image)
-
-        # 将背景坐标转换为画布坐标(使用四舍五入减少误差)
-        canvas_x = bg_x + int(round(x / bg_scale_x))
-        canvas_y = bg_y + int(round(y / bg_scale_y))
-
-        # 在画布上创建图像对象
-        self.canvas_id = self.canvas.create_image(
-            canvas_x, canvas_y, anchor=tk.NW, image=self.photo, tags=("draggable", "overlay")
-        )
+        self.list_index = -1  # 在叠加图片列表中的行号
+        self.uid = next(overlay_ids)  # 在项目文件中的id
 
         # 存储背景坐标(相对于背景图片左上角)
         self.bg_coord_x = x
         self.bg_coord_y = y
 
+        # 画布视口尺寸(为None时不裁剪)与当前滤镜；crop_box为已生成部分在显示图片中的范围，None表示完全不可见
+        self.viewport = viewport
+        self.resample = RESAMPLE_LANCZOS
+        self.scaled_width, self.scaled_height = 0, 0
+        self.crop_box = None
+        self.render_key = None
+        self.photo = None
+
+        # 在画布上创建图像对象，再按缩放后的尺寸(与背景图片相同的缩放比例)只生成可见的部分
+        self.canvas_id = self.canvas.create_image(0, 0, anchor=tk.NW, tags=("draggable", "overlay"))
+        self.render(scaled_size(source.width, source.height, bg_scale_x, bg_scale_y))
+        self.place()
+
         # 绑定事件
         self.canvas.tag_bind(self.canvas_id, "<Button-1>", self.on_press)
         self.canvas.tag_bind(self.canvas_id, "<B1-Motion>", self.on_drag)
@@ -62,24 +598,33 @@ class DraggableImage:
 
     def on_press(self, event):
         #####鼠标按下事件#####
+        # Shift/Ctrl+单击切换该图片的选中状态，不开始拖动
+        if hasattr(self, 'parent_app') and event.state & (SHIFT_MASK | CONTROL_MASK):
+            self.parent_app.toggle_image_selection(self)
+            return
+
         if self.is_locked:
             return
 
         self.is_dragging = True
-        # 计算鼠标相对于图片左上角的偏移
-        coords = self.canvas.coords(self.canvas_id)
-        self.drag_offset_x = event.x - coords[0]
-        self.drag_offset_y = event.y - coords[1]
-        # 将当前图片置于顶层
-        self.canvas.tag_raise(self.canvas_id)
-
-        # 选中当前图片
-        self.set_selected(True)
-
-        # 通知父组件选中此图片
+        # 计算鼠标相对于图片左上角的偏移(画布上的元素可能只是裁剪后的可见部分)
+        origin_x, origin_y = self.canvas_origin()
+        self.drag_offset_x = event.x - origin_x
+        self.drag_offset_y = event.y - origin_y
+        # 将当前图片置于叠加图片图层的顶层
+        self.canvas.tag_raise(self.canvas_id, "draggable")
+
+        # 选中当前图片(已在多选中时保留其他选中的图片)，并与其他选中的图片一起拖动
         if hasattr(self, 'parent_app'):
-            self.parent_app.select_image_by_reference(self)
+            if self.is_selected:
+                self.parent_app.set_image_selection(self.parent_app.selected_images, self)
+            else:
+                self.parent_app.select_image_by_reference(self)
+            self.parent_app.begin_group_drag(self)
+        else:
+            self.set_selected(True)
 
+    @instrument("DraggableImage.on_drag")
     def on_drag(self, event):
         #####鼠标拖动事件#####
         if self.is_locked:
@@ -89,82 +634,136 @@ class DraggableImage:
             # 更新图片位置
             new_x = event.x - self.drag_offset_x
             new_y = event.y - self.drag_offset_y
-            self.canvas.coords(self.canvas_id, new_x, new_y)
 
             # 更新背景坐标 - 使用四舍五入减少误差
-            self.bg_coord_x = int(round((new_x - self.bg_x) * self.bg_scale_x))
-            self.bg_coord_y = int(round((new_y - self.bg_y) * self.bg_scale_y))
+            bg_coord_x = canvas_to_background(new_x, self.bg_x, self.bg_scale_x)
+            bg_coord_y = canvas_to_background(new_y, self.bg_y, self.bg_scale_y)
 
-            # 更新列表中的坐标显示
+            # 吸附到其他叠加图片、背景或网格，画布和列表按帧率为整组图片批量更新
             if hasattr(self, 'parent_app'):
-                self.parent_app.update_image_list_item(self)
-                self.parent_app.update_coord_list_from_images()
+                bg_coord_x, bg_coord_y = self.parent_app.snap_image_position(self, bg_coord_x, bg_coord_y)
+                self.parent_app.drag_group_to(bg_coord_x, bg_coord_y)
+            else:
+                self.bg_coord_x = bg_coord_x
+                self.bg_coord_y = bg_coord_y
+                self.place()
+                self.refresh_visible()
 
     def on_release(self, event):
         #####鼠标释放事件#####
-        if self.is_locked:
+        if not self.is_dragging:
             return
 
         self.is_dragging = False
 
-        # 更新坐标点列表
+        # 立即提交整组图片的最终位置，整个拖动记录为一条历史
         if hasattr(self, 'parent_app'):
-            self.parent_app.update_coord_list_from_images()
+            self.parent_app.end_group_drag()
 
     def get_bg_coordinates(self):
         #####获取图片在背景上的坐标#####
         return self.bg_coord_x, self.bg_coord_y
 
-    def update_position(self, bg_x, bg_y, bg_scale_x, bg_scale_y, canvas_bg_x, canvas_bg_y):
-        #####更新图片位置(基于背景坐标)#####
+    @instrument("DraggableImage.update_position", paint=True)
+    def update_position(self, bg_x, bg_y, bg_scale_x, bg_scale_y, canvas_bg_x, canvas_bg_y,
+                        resample=RESAMPLE_LANCZOS, viewport=None):
+        #####更新图片位置(基于背景坐标)，viewport为画布尺寸#####
         # 更新缩放比例
         self.bg_scale_x = bg_scale_x
         self.bg_scale_y = bg_scale_y
         self.bg_x = canvas_bg_x
         self.bg_y = canvas_bg_y
 
-        # 重新计算缩放后的尺寸 - 使用四舍五入减少误差
-        self.scaled_width = int(round(self.original_image.width / bg_scale_x))
-        self.scaled_height = int(round(self.original_image.height / bg_scale_y))
-
-        # 缩放图片
-        self.scaled_image = self.original_image.resize(
-            (self.scaled_width, self.scaled_height),
-            Image.Resampling.LANCZOS
-        )
-
-        # 更新图片
-        self.photo = ImageTk.PhotoImage(self.scaled_image)
-
-        # 计算画布坐标(使用四舍五入减少误差)
-        canvas_x = canvas_bg_x + int(round(bg_x / bg_scale_x))
-        canvas_y = canvas_bg_y + int(round(bg_y / bg_scale_y))
-
-        # 更新画布上的图片
-        self.canvas.itemconfig(self.canvas_id, image=self.photo)
-        self.canvas.coords(self.canvas_id, canvas_x, canvas_y)
+        self.resample = resample
+        if viewport is not None:
+            self.viewport = viewport
 
         # 更新背景坐标
         self.bg_coord_x = bg_x
         self.bg_coord_y = bg_y
 
-    def set_position_by_bg_coords(self, bg_x, bg_y):
-        #####通过背景坐标设置图片位置#####
-        # 计算画布坐标 - 使用四舍五入减少误差
-        canvas_x = self.bg_x + int(round(bg_x / self.bg_scale_x))
-        canvas_y = self.bg_y + int(round(bg_y / self.bg_scale_y))
-
-        # 更新位置
-        self.canvas.coords(self.canvas_id, canvas_x, canvas_y)
+        # 重新缩放可见的部分；节省内存模式下源文件无法重新读取时保留原来的显示
+        try:
+            self.render(scaled_size(self.source.width, self.source.height, bg_scale_x, bg_scale_y))
+        except OSError:
+            pass
+        self.place()
+
+    def canvas_origin(self):
+        #####图片左上角的画布坐标(使用四舍五入减少误差)#####
+        return (background_to_canvas(self.bg_coord_x, self.bg_x, self.bg_scale_x),
+                background_to_canvas(self.bg_coord_y, self.bg_y, self.bg_scale_y))
+
+    def canvas_box(self):
+        #####整张图片(包括视口外的部分)在画布上的范围#####
+        origin_x, origin_y = self.canvas_origin()
+        return origin_x, origin_y, origin_x + self.scaled_width, origin_y + self.scaled_height
+
+    def visible_box(self, size, margin=0):
+        #####显示尺寸为size时图片落在视口(向外扩展margin)内的部分，相对图片左上角的显示像素范围，完全不可见时为None#####
+        width, height = size
+        if self.viewport is None:
+            return 0, 0, width, height
+        origin_x, origin_y = self.canvas_origin()
+        view_width, view_height = self.viewport
+        left = max(0, -margin - origin_x)
+        top = max(0, -margin - origin_y)
+        right = min(width, view_width + margin - origin_x)
+        bottom = min(height, view_height + margin - origin_y)
+        if left >= right or top >= bottom:
+            return None
+        return left, top, right, bottom
+
+    def render(self, size):
+        #####按显示尺寸size只缩放视口附近可见的部分: 整张可见时使用共享的缩放缓存，完全不可见时不生成图片#####
+        box = self.visible_box(size, OVERLAY_CROP_MARGIN)
+        render_key = (size, self.resample, box)
+        if render_key == self.render_key:
+            return
+        if box is None:
+            photo = None
+        elif box == (0, 0, *size):
+            photo = scaled_image_cache.get(self.source, size, self.resample)
+        else:
+            # 裁剪结果只属于这张图片的当前视图，不放入共享缓存
+            photo = ImageTk.PhotoImage(self.source.resize_region(size, box, self.resample))
+        self.photo = photo
+        self.scaled_width, self.scaled_height = size
+        self.crop_box = box
+        self.render_key = render_key
+        self.canvas.itemconfig(self.canvas_id, image=photo if photo is not None else "")
+
+    def place(self):
+        #####把画布元素移动到已生成部分的位置#####
+        origin_x, origin_y = self.canvas_origin()
+        left, top = self.crop_box[:2] if self.crop_box is not None else (0, 0)
+        self.canvas.coords(self.canvas_id, origin_x + left, origin_y + top)
+
+    def refresh_visible(self):
+        #####平移或移动后已生成的部分不再覆盖可见区域时重新裁剪#####
+        size = (self.scaled_width, self.scaled_height)
+        needed = self.visible_box(size)
+        box = self.crop_box
+        if needed is None or (box is not None and box[0] <= needed[0] and box[1] <= needed[1]
+                              and box[2] >= needed[2] and box[3] >= needed[3]):
+            return
+        try:
+            self.render(size)
+        except OSError:
+            return
+        self.place()
 
-        # 更新背景坐标
+    def set_position_by_bg_coords(self, bg_x, bg_y, commit=True):
+        #####通过背景坐标设置图片位置，commit为False时由调用者批量刷新列表#####
+        # 更新背景坐标与画布位置，移入视口的部分需要重新裁剪
         self.bg_coord_x = bg_x
         self.bg_coord_y = bg_y
+        self.place()
+        self.refresh_visible()
 
         # 更新列表中的坐标显示
-        if hasattr(self, 'parent_app'):
-            self.parent_app.update_image_list_item(self)
-            self.parent_app.update_coord_list_from_images()
+        if commit and hasattr(self, 'parent_app'):
+            self.parent_app.commit_image_positions([self])
 
     def set_locked(self, locked):
         #####设置锁定状态#####
@@ -180,6 +779,70 @@ class DraggableImage:
         self.parent_app = parent_app
 
 
+class CoordinateDialog:
+    #####输入背景坐标的对话框: 第一次使用时创建，关闭时只隐藏，之后直接复用#####
+    def __init__(self, app):
+        self.app = app
+        self.on_confirm = None
+        self.window = tk.Toplevel(app.root)
+        self.window.withdraw()
+        self.window.transient(app.root)
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        # 输入框
+        ttk.Label(self.window, text="X坐标:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        self.x_var = tk.StringVar(self.window)
+        self.x_entry = ttk.Entry(self.window, textvariable=self.x_var)
+        self.x_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
+
+        ttk.Label(self.window, text="Y坐标:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        self.y_var = tk.StringVar(self.window)
+        y_entry = ttk.Entry(self.window, textvariable=self.y_var)
+        y_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
+
+        # 确定按钮，回车确定、Esc取消
+        ttk.Button(self.window, text="确定", command=self.confirm).grid(row=2, column=0, columnspan=2, pady=10)
+        self.window.bind("<Return>", lambda event: self.confirm())
+        self.window.bind("<Escape>", lambda event: self.hide())
+
+        # 配置权重
+        self.window.columnconfigure(1, weight=1)
+
+    def show(self, title, x, y, on_confirm):
+        #####显示对话框，确定后以(x, y)调用on_confirm#####
+        self.window.title(title)
+        self.x_var.set(str(x))
+        self.y_var.set(str(y))
+        self.on_confirm = on_confirm
+        self.app.center_window(self.window, 300, 150)
+        self.window.deiconify()
+        self.window.grab_set()
+        self.x_entry.focus_set()
+        self.x_entry.select_range(0, tk.END)
+
+    def confirm(self):
+        #####检查输入并执行确定操作#####
+        try:
+            x = int(self.x_var.get())
+            y = int(self.y_var.get())
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的整数坐标", parent=self.window)
+            return
+        if not is_valid_coordinate(x, y):
+            messagebox.showerror("错误", f"坐标应在 {COORDINATE_MIN} 到 {COORDINATE_MAX} 之间", parent=self.window)
+            return
+        on_confirm = self.on_confirm
+        self.hide()
+        if on_confirm is not None:
+            on_confirm(x, y)
+
+    def hide(self):
+        #####隐藏对话框(保留控件以便下次复用)#####
+        self.on_confirm = None
+        self.window.grab_release()
+        self.window.withdraw()
+
+
 class ImageCoordinatePicker:
     def __init__(self, root):
         self.root = root
@@ -193,8 +856,11 @@ class ImageCoordinatePicker:
 
         # 存储图片和坐标点
         self.background_image = None
+        self.background_path = None
+        self.renpy_image_prefix = "gui/"  # 导出Ren'Py时的图片路径前缀
         self.draggable_images = []  # 存储所有可拖动图片
-        self.points = []  # 存储坐标点
+        self.points = PointStore()  # 存储坐标点(整数数组，可带名称)
+        self.point_items = []  # 与points一一对应的画布元素(圆点ID, 文本ID)
         self.current_mode = "coordinate"  # 当前模式: "coordinate" 或 "overlay"
 
         # 创建主框架
@@ -213,11 +879,46 @@ class ImageCoordinatePicker:
         self.canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         self.canvas.bind("<Button-1>", self.canvas_clicked)
         self.canvas.bind("<Motion>", self.canvas_mouse_move)
+        # Ctrl+滚轮缩放(Windows/macOS使用MouseWheel，X11使用Button-4/5)，中键拖动平移
+        self.canvas.bind("<Control-MouseWheel>", self.on_canvas_zoom)
+        self.canvas.bind("<Control-Button-4>", self.on_canvas_zoom)
+        self.canvas.bind("<Control-Button-5>", self.on_canvas_zoom)
+        # Shift+拖动框选坐标点，Shift+单击选中最近的坐标点
+        self.canvas.bind("<Shift-ButtonPress-1>", self.on_band_start)
+        self.canvas.bind("<B1-Motion>", self.on_band_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_band_end)
+        self.canvas.bind("<ButtonPress-2>", self.on_pan_start)
+        self.canvas.bind("<B2-Motion>", self.on_pan_drag)
+        self.root.bind("<Control-Key-0>", self.reset_zoom)
 
         # 信息显示标签
         self.info_label = ttk.Label(left_frame, text="坐标: (0, 0) - 模式: 坐标获取")
         self.info_label.grid(row=1, column=0, sticky=tk.W, pady=5)
 
+        # 取色范围(对抖动/网点图片取区域平均色)
+        sample_frame = ttk.Frame(left_frame)
+        sample_frame.grid(row=1, column=0, sticky=tk.E, pady=5)
+        ttk.Label(sample_frame, text="取色范围:").grid(row=0, column=0, padx=(0, 5))
+        self.sample_size_var = tk.StringVar(value=SAMPLE_SIZES[0])
+        ttk.Combobox(
+            sample_frame, textvariable=self.sample_size_var, values=SAMPLE_SIZES, width=5, state="readonly"
+        ).grid(row=0, column=1)
+
+        # 拖动叠加图片时的吸附与网格
+        self.snap_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(sample_frame, text="吸附对齐", variable=self.snap_var).grid(row=0, column=2, padx=(10, 5))
+        ttk.Label(sample_frame, text="网格:").grid(row=0, column=3, padx=(0, 5))
+        self.grid_size_var = tk.StringVar(value=GRID_SIZES[0])
+        ttk.Combobox(
+            sample_frame, textvariable=self.grid_size_var, values=GRID_SIZES, width=4, state="readonly"
+        ).grid(row=0, column=4)
+
+        # 节省内存: 叠加图片只常驻尺寸与路径，需要新的缩放尺寸时才重新读取源文件
+        self.lean_memory_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            sample_frame, text="节省内存", variable=self.lean_memory_var, command=self.toggle_lean_memory
+        ).grid(row=0, column=5, padx=(10, 0))
+
         # 按钮区域
         button_frame = ttk.Frame(left_frame)
         button_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
@@ -241,7 +942,22 @@ class ImageCoordinatePicker:
         self.mode_button.grid(row=0, column=5, padx=5)
 
         self.save_button = ttk.Button(button_frame, text="保存数据", command=self.save_data)
-        self.save_button.grid(row=0, column=6, padx=(5, 0))
+        self.save_button.grid(row=0, column=6, padx=5)
+
+        self.export_renpy_button = ttk.Button(button_frame, text="导出Ren'Py", command=self.export_renpy_screen)
+        self.export_renpy_button.grid(row=0, column=7, padx=5)
+
+        self.import_renpy_button = ttk.Button(button_frame, text="导入Ren'Py", command=self.import_renpy_screen)
+        self.import_renpy_button.grid(row=0, column=8, padx=5)
+
+        self.open_project_button = ttk.Button(button_frame, text="打开项目", command=self.open_project)
+        self.open_project_button.grid(row=0, column=9, padx=5)
+
+        self.save_project_button = ttk.Button(button_frame, text="保存项目", command=self.save_project)
+        self.save_project_button.grid(row=0, column=10, padx=5)
+
+        self.recover_button = ttk.Button(button_frame, text="恢复自动保存", command=self.recover_autosave)
+        self.recover_button.grid(row=0, column=11, padx=(5, 0))
 
         # 右侧控制面板
         right_panel = ttk.LabelFrame(right_frame, text="控制面板", padding="5")
@@ -250,7 +966,9 @@ class ImageCoordinatePicker:
         # 叠加图片列表
         ttk.Label(right_panel, text="叠加图片列表:").grid(row=0, column=0, sticky=tk.W, pady=(0, 5))
 
-        self.image_listbox = tk.Listbox(right_panel, height=10, width=40)
+        # 虚拟化列表: 行文本在绘制时由叠加图片生成，只为可见行创建画布元素
+        self.image_listbox = VirtualListView(right_panel, lambda: len(self.draggable_images),
+                                             self.image_row_text, self.image_row_fields)
         self.image_listbox.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 5))
         self.image_listbox.bind("<<ListboxSelect>>", self.on_image_selected)
 
@@ -273,10 +991,24 @@ class ImageCoordinatePicker:
         self.bring_to_top_button = ttk.Button(image_control_frame, text="置顶", command=self.bring_images_to_top)
         self.bring_to_top_button.grid(row=0, column=4, padx=5)
 
+        self.align_button = ttk.Menubutton(image_control_frame, text="对齐")
+        align_menu = tk.Menu(self.align_button, tearoff=0)
+        for item in ALIGN_MENU_ITEMS:
+            if item is None:
+                align_menu.add_separator()
+            else:
+                align_menu.add_command(label=item[0], command=lambda mode=item[1]: self.align_selected_images(mode))
+        self.align_button["menu"] = align_menu
+        self.align_button.grid(row=0, column=5, padx=5)
+
+        self.memory_button = ttk.Button(image_control_frame, text="内存占用", command=self.show_memory_report)
+        self.memory_button.grid(row=0, column=6, padx=(5, 0))
+
         # 坐标点列表
         ttk.Label(right_panel, text="坐标点列表:").grid(row=3, column=0, sticky=tk.W, pady=(0, 5))
 
-        self.coord_list = tk.Listbox(right_panel, height=10, width=40)
+        self.coord_list = VirtualListView(right_panel, lambda: len(self.points),
+                                          self.point_row_text, self.point_row_fields, self.points.filter_rows)
         self.coord_list.grid(row=4, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 5))
         self.coord_list.bind("<<ListboxSelect>>", self.on_coord_selected)
 
@@ -293,6 +1025,9 @@ class ImageCoordinatePicker:
         self.remove_point_button = ttk.Button(coord_control_frame, text="删除坐标", command=self.remove_selected_point)
         self.remove_point_button.grid(row=0, column=2, padx=5)
 
+        self.name_point_button = ttk.Button(coord_control_frame, text="命名", command=self.name_selected_point)
+        self.name_point_button.grid(row=0, column=3, padx=5)
+
         # 配置权重
         root.columnconfigure(0, weight=1)
         root.rowconfigure(0, weight=1)
@@ -313,11 +1048,118 @@ class ImageCoordinatePicker:
         self.bg_scale_x = 1.0
         self.bg_scale_y = 1.0
 
-        # 当前选中的叠加图片
+        # 选中的叠加图片，selected_image_index为主选中图片(设置坐标、重命名的对象)的行号
         self.selected_image_index = -1
+        self.selected_images = set()
+
+        # 背景图块: (列, 行) -> (Canvas ID, PhotoImage)
+        self.bg_pyramid = None
+        self.pixel_sampler = None
+        self.bg_tiles = {}
+        self.bg_tiles_key = None
+        self.bg_display_width = 0
+        self.bg_display_height = 0
+        self.bg_fit_ratio = 1.0
+        self.canvas_size = (600, 500)
+
+        # 视图缩放与平移: 缩放倍率相对于适应窗口，view_center为画布中央对应的原图坐标
+        self.zoom = 1.0
+        self.view_center = (0, 0)
+        self.pan_last = None
+
+        # 鼠标移动时状态栏的节流状态
+        self.last_status_key = None
+        self.pending_status_key = None
+        self.status_update_job = None
+        self.motion_events_total = 0
+        self.motion_events_dropped = 0
+
+        # 画布图层管理
+        self.layers = CanvasLayerManager(self.canvas)
+
+        # 叠加图片的源文件，使用同一文件的叠加图片共享解码与缩放结果
+        self.overlay_sources = OverlaySourcePool()
+
+        # 拖动期间待刷新的列表行
+        self.drag_dirty_images = set()
+
+        # 成组拖动: [(图片, 起始x, 起始y)]，主图片在最前；拖动目标按帧合并
+        self.group_drag = []
+        self.group_drag_target = None
+        self.group_drag_job = None
+        self.last_nudge = None
+
+        # 窗口缩放调度状态
+        self.resize_preview_job = None
+        self.resize_settle_job = None
+        self.rendered_canvas_size = None
+        self.rendered_resample = None
+
+        # 空间索引(背景坐标): 叠加图片按包围盒登记，坐标点的索引由self.points按点id维护
+        self.overlay_grid = SpatialGrid(OVERLAY_CELL_SIZE)
+        self.overlays_by_uid = {}
+        # 打开项目时未能加载的叠加图片记录(项目id -> 记录)，保存项目时原样写回，不会因为文件暂时缺失而丢失
+        self.unloaded_overlays = {}
+        # 撤销/重做时正在后台重新读取的叠加图片{"command": 历史记录}，完成前不再执行其他撤销/重做
+        self.pending_restore = None
+
+        # 悬停高亮与框选
+        self.hover_target = None
+        self.hover_item = self.canvas.create_rectangle(
+            0, 0, 0, 0, outline=HOVER_COLOR, width=2, state=tk.HIDDEN, tags=("hover", "overlay")
+        )
+        self.band_start = None
+        self.band_item = None
+
+        # 拖动吸附: 拖动开始时生成排好序的候选线，参考线只在拖动期间显示
+        self.snap_lines = None
+        self.guide_items = (
+            self.canvas.create_line(0, 0, 0, 0, fill=GUIDE_COLOR, dash=(4, 2), state=tk.HIDDEN, tags=("guide",)),
+            self.canvas.create_line(0, 0, 0, 0, fill=GUIDE_COLOR, dash=(4, 2), state=tk.HIDDEN, tags=("guide",))
+        )
+
+        # 撤销/重做历史
+        self.history = History()
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+        self.root.bind("<Control-Z>", self.redo)
+        for key in ("<Left>", "<Right>", "<Up>", "<Down>"):
+            self.root.bind(key, self.nudge_selected_images)
+
+        # 性能监视: F12开关画布左上角的帧时间面板，Ctrl+F12导出Chrome trace
+        self.profiled_widgets = ()
+        self.profile_bindings = []
+        self.profile_panel_job = None
+        self.profile_panel_items = (
+            self.canvas.create_rectangle(0, 0, 0, 0, fill="black", outline="", state=tk.HIDDEN, tags=("profile",)),
+            self.canvas.create_text(8, 8, anchor=tk.NW, fill="#00ff00", font="TkFixedFont", state=tk.HIDDEN,
+                                    tags=("profile",))
+        )
+        self.root.bind("<F12>", self.toggle_profiling)
+        self.root.bind("<Control-F12>", self.dump_profile_trace)
+
+        # 项目文件与后台自动保存: 未保存为项目时写入缓存目录中的恢复文件
+        self.project_path = None
+        self.recovery_path = os.path.join(default_cache_dir(), RECOVERY_FILE_NAME)
+        if os.path.exists(self.recovery_path):
+            try:
+                os.replace(self.recovery_path, unused_recovery_path(default_cache_dir()))
+            except OSError:
+                pass
+        self.autosave = AutosaveWorker()
+        self.autosave_error = None
+        self.autosave_saved_token = None  # 上次提交保存时的autosave_token()
+        self.root.after(AUTOSAVE_INTERVAL_MS, self.autosave_tick)
+        self.last_project_record = os.path.join(default_cache_dir(), LAST_PROJECT_FILE_NAME)
+
+        # 坐标输入对话框第一次使用时才创建
+        self.coordinate_dialog = None
 
-        # 背景图片的Canvas ID
-        self.bg_image_id = None
+        # 启动计时: 画布第一次绘制完成时记录启动耗时，不影响首帧的工作(导入PIL、打开上次的项目)推迟到之后
+        self.startup_time = None
+        self.exit_after_first_frame = False
+        self.canvas.bind("<Expose>", self.on_first_expose)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
 
     def batch_add_images(self):
@@ -334,40 +1176,181 @@ class ImageCoordinatePicker:
         if not file_paths:
             return
 
-        for file_path in file_paths:
-            try:
-                image = Image.open(file_path)
-                # 使用文件名(不含扩展名)作为图片名称
-                name = os.path.splitext(os.path.basename(file_path))[0]
-
-                # 默认位置在画布中央(背景坐标)
-                bg_width, bg_height = self.background_image.size
-                bg_x = bg_width // 2 - image.width // 2
-                bg_y = bg_height // 2 - image.height // 2
-
-                # 创建可拖动图片
-                draggable_image = DraggableImage(
-                    self.canvas, image,
-                    self.bg_scale_x, self.bg_scale_y,
-                    self.bg_x, self.bg_y,
-                    name, bg_x, bg_y
-                )
-                draggable_image.set_parent_app(self)
+        self.load_overlay_files([(file_path, None, None) for file_path in file_paths], on_loaded=self.record_added_overlays)
+
+    def load_overlay_files(self, entries, failures=None, on_loaded=None):
+        #####并行加载多张叠加图片，entries为(文件路径, 名称, 背景坐标)列表，名称或坐标为None时使用默认值#####
+        # 全部完成后以{entries中的序号: 叠加图片}调用on_loaded
+        # 在线程池中并行解码并按当前缩放比例预缩放，完成一张就放到画布上一张
+        background = self.background_image
+        scale_x, scale_y = self.bg_scale_x, self.bg_scale_y
+        failures = list(failures or [])
+        result_queue = queue.Queue()
+        load_imaging()
+        if entries:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=min(DECODE_WORKERS, len(entries)))
+            for index, entry in enumerate(entries):
+                future = executor.submit(decode_overlay_image, entry[0], scale_x, scale_y)
+                future.add_done_callback(lambda f, item=(index, entry): result_queue.put((item, f)))
+            executor.shutdown(wait=False)
+
+        self.batch_add_images_button.config(state=tk.DISABLED)
+        state = {"remaining": len(entries)}
+        loaded = {}
+
+        def finish():
+            self.batch_add_images_button.config(state=tk.NORMAL)
+            # 新写入的缓存条目登记到磁盘索引，下次启动可以直接使用
+            disk_image_cache.save_index()
+            if self.background_image is not background:
+                return
 
-                self.draggable_images.append(draggable_image)
+            if on_loaded is not None:
+                on_loaded(loaded)
 
-                # 添加到列表
-                self.add_image_to_list(draggable_image)
+            # 更新坐标点列表
+            if self.current_mode == "overlay":
+                self.update_coord_list_from_images()
 
-            except Exception as e:
-                messagebox.showerror("错误", f"无法加载图片 {file_path}: {str(e)}")
+            # 恢复图层顺序
+            self.layers.restack()
+
+            # 所有失败的图片汇总提示一次
+            if failures:
+                details = "\n".join(f"{path}: {error}" for path, error in failures[:20])
+                if len(failures) > 20:
+                    details += f"\n... 另有 {len(failures) - 20} 个"
+                messagebox.showerror("错误", f"{len(failures)} 张图片无法加载:\n{details}")
+
+        def poll():
+            while True:
+                try:
+                    (index, (file_path, name, position)), future = result_queue.get_nowait()
+                except queue.Empty:
+                    break
+                state["remaining"] -= 1
+
+                # 背景图片已更换时丢弃结果
+                if self.background_image is not background:
+                    continue
 
-        # 更新坐标点列表
-        if self.current_mode == "overlay":
-            self.update_coord_list_from_images()
+                try:
+                    image, size, scaled, digest = future.result()
+                except Exception as e:
+                    failures.append((file_path, str(e)))
+                    continue
+
+                # 同一文件共享一个源；预缩放结果直接放入缓存，创建图片时无需再次缩放
+                source = self.overlay_sources.acquire(file_path, image, size, digest)
+                scaled_image_cache.put(source, scaled.size, RESAMPLE_LANCZOS, scaled)
+                loaded[index] = self.add_overlay_image(source, file_path, name, position)
+
+            if state["remaining"] > 0:
+                self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+            else:
+                finish()
+
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
 
-        # 确保背景图片始终在底层
-        self.canvas.tag_lower(self.bg_image_id)
+    def add_overlay_image(self, source, file_path, name=None, position=None):
+        #####根据共享的源创建叠加图片并添加到列表#####
+        # 默认使用文件名(不含扩展名)作为图片名称
+        if name is None:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+
+        # 默认位置在画布中央(背景坐标)
+        if position is None:
+            bg_width, bg_height = self.background_image.size
+            bg_x = bg_width // 2 - source.width // 2
+            bg_y = bg_height // 2 - source.height // 2
+        else:
+            bg_x, bg_y = position
+
+        # 创建可拖动图片
+        draggable_image = DraggableImage(
+            self.canvas, source,
+            self.bg_scale_x, self.bg_scale_y,
+            self.bg_x, self.bg_y,
+            name, bg_x, bg_y, file_path, self.canvas_size
+        )
+        draggable_image.set_parent_app(self)
+
+        self.draggable_images.append(draggable_image)
+        self.overlays_by_uid[draggable_image.uid] = draggable_image
+        self.index_overlay(draggable_image)
+
+        # 添加到列表
+        self.add_image_to_list(draggable_image)
+        return draggable_image
+
+    def toggle_lean_memory(self):
+        #####切换叠加图片的存储方式#####
+        self.overlay_sources.set_keep_decoded(not self.lean_memory_var.get())
+
+    def memory_report(self):
+        #####统计叠加图片的内存占用，返回(每张图片的[(名称, 源尺寸, 解码字节数, 显示字节数, 共享数)], 总计)#####
+        rows = []
+        photos = {}
+        sources = {}
+        for img in self.draggable_images:
+            source = img.source
+            # 放大查看时只计裁剪后的可见部分，完全不可见的图片不占显示内存
+            photo_bytes = img.photo.width() * img.photo.height() * 4 if img.photo is not None else 0
+            # 同一源同一尺寸的叠加图片共享PhotoImage，总计中只计一次
+            photos[id(img.photo)] = photo_bytes
+            sources[id(source)] = source
+            rows.append((img.name, source.size, source.nbytes(), photo_bytes, source.users))
+        totals = {
+            "overlays": len(rows),
+            "sources": len(sources),
+            "decoded_bytes": sum(source.nbytes() for source in sources.values()),
+            "photo_bytes": sum(photos.values()),
+            "cache_bytes": scaled_image_cache.total_bytes,
+            "reloads": sum(source.reloads for source in sources.values()),
+        }
+        return rows, totals
+
+    def show_memory_report(self):
+        #####显示每张叠加图片及总计的内存占用#####
+        rows, totals = self.memory_report()
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("内存占用")
+        self.center_window(dialog, 640, 420)
+        dialog.transient(self.root)
+
+        listbox = tk.Listbox(dialog, width=90, height=18)
+        listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(5, 0), pady=5)
+        scrollbar = ttk.Scrollbar(dialog, orient=tk.VERTICAL, command=listbox.yview)
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S), padx=(0, 5), pady=5)
+        listbox.config(yscrollcommand=scrollbar.set)
+        if rows:
+            listbox.insert(tk.END, *(
+                f"{name}  {width}x{height}  解码 {format_bytes(decoded)}  显示 {format_bytes(photo)}"
+                + (f"  (与其他 {users - 1} 张共享)" if users > 1 else "")
+                for name, (width, height), decoded, photo, users in rows
+            ))
+
+        summary = (
+            f"{totals['overlays']} 张叠加图片，{totals['sources']} 个源文件\n"
+            f"解码图片: {format_bytes(totals['decoded_bytes'])}    "
+            f"显示图片: {format_bytes(totals['photo_bytes'])}    "
+            f"缩放缓存: {format_bytes(totals['cache_bytes'])}\n"
+            f"总计: {format_bytes(totals['decoded_bytes'] + totals['photo_bytes'])}    "
+            f"从磁盘重新读取: {totals['reloads']} 次"
+        )
+        ttk.Label(dialog, text=summary, justify=tk.LEFT).grid(row=1, column=0, columnspan=2, sticky=tk.W, padx=5)
+        ttk.Button(dialog, text="关闭", command=dialog.destroy).grid(row=2, column=0, columnspan=2, pady=10)
+
+        dialog.columnconfigure(0, weight=1)
+        dialog.rowconfigure(0, weight=1)
+
+    def show_coordinate_dialog(self, title, x, y, on_confirm):
+        #####显示坐标输入对话框(第一次使用时创建，之后复用)#####
+        if self.coordinate_dialog is None:
+            self.coordinate_dialog = CoordinateDialog(self)
+        self.coordinate_dialog.show(title, x, y, on_confirm)
 
     def center_window(self, window, width, height):
         #####控制窗口生成于屏幕中央#####
@@ -391,59 +1374,124 @@ class ImageCoordinatePicker:
             return
 
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            total_bytes = os.path.getsize(file_path)
+        except OSError as e:
+            messagebox.showerror("错误", f"导入坐标时出错: {str(e)}")
+            return
 
-            added_count = 0
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
+        # 后台线程解析文件，界面线程通过after()分批取回结果
+        result_queue = queue.Queue()
+        cancel_event = threading.Event()
+        worker = threading.Thread(
+            target=self.run_coordinate_import,
+            args=(file_path, result_queue, cancel_event),
+            daemon=True
+        )
 
-                # 处理不同的分隔符(逗号、空格、中文逗号等)
-                if '，' in line:  # 中文逗号
-                    parts = line.split('，')
-                elif ',' in line:  # 英文逗号
-                    parts = line.split(',')
-                else:
-                    # 尝试按空格分割
-                    parts = line.split()
+        # 创建进度对话框
+        progress_dialog = tk.Toplevel(self.root)
+        progress_dialog.title("导入坐标")
+        self.center_window(progress_dialog, 320, 120)
+        progress_dialog.transient(self.root)
+        progress_dialog.grab_set()
+
+        status_var = tk.StringVar(value="正在导入...")
+        ttk.Label(progress_dialog, textvariable=status_var).grid(row=0, column=0, padx=10, pady=(10, 5), sticky=tk.W)
+
+        progress_bar = ttk.Progressbar(progress_dialog, maximum=max(total_bytes, 1), mode="determinate")
+        progress_bar.grid(row=1, column=0, padx=10, pady=5, sticky=tk.W + tk.E)
+
+        pending_points = []
+        imported_points = []
+        start_index = len(self.points)
+        state = {"added": 0, "finished": False, "error": None}
+
+        def cancel():
+            cancel_event.set()
+
+        def finish():
+            progress_dialog.destroy()
+            # 整个导入(包括取消前已导入的部分)记录为一条历史
+            if imported_points:
+                self.history.push(InsertPoints(start_index, imported_points))
+            if state["error"] is not None:
+                messagebox.showerror("错误", f"导入坐标时出错: {state['error']}")
+            elif cancel_event.is_set():
+                messagebox.showinfo("已取消", f"导入已取消，已导入 {state['added']} 个坐标点")
+            else:
+                messagebox.showinfo("成功", f"成功导入 {state['added']} 个坐标点")
 
-                if len(parts) >= 2:
+        def poll():
+            # 出现异常时也结束导入，保证进度对话框被关闭并释放grab
+            done = True
+            try:
+                # 取回后台线程已解析的批次
+                while True:
                     try:
-                        x = int(parts[0].strip())
-                        y = int(parts[1].strip())
-
-                        # 添加到点列表
-                        self.points.append((x, y))
-                        self.coord_list.insert(tk.END, f"({x}, {y})")
+                        kind, payload, read_bytes = result_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == "batch":
+                        pending_points.extend(payload)
+                        progress_bar["value"] = read_bytes
+                    elif kind == "error":
+                        state["error"] = payload
+                        state["finished"] = True
+                    else:
+                        state["finished"] = True
+
+                # 每次刷新只添加有限数量的点，保持窗口响应
+                if pending_points and not cancel_event.is_set():
+                    batch = pending_points[:IMPORT_POINTS_PER_TICK]
+                    del pending_points[:IMPORT_POINTS_PER_TICK]
+                    self.add_points(batch)
+                    imported_points.extend(batch)
+                    state["added"] += len(batch)
+                    status_var.set(f"正在导入... 已导入 {state['added']} 个坐标点")
+
+                done = state["finished"] and (not pending_points or cancel_event.is_set())
+            except Exception as e:
+                cancel_event.set()
+                state["error"] = str(e)
+            finally:
+                if done:
+                    finish()
+                else:
+                    self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
 
-                        # 在Canvas上绘制点
-                        self.draw_point(x, y)
+        ttk.Button(progress_dialog, text="取消", command=cancel).grid(row=2, column=0, pady=10)
+        progress_dialog.protocol("WM_DELETE_WINDOW", cancel)
 
-                        added_count += 1
-                    except ValueError:
-                        # 跳过无法解析的行
-                        continue
+        # 配置权重
+        progress_dialog.columnconfigure(0, weight=1)
 
-            messagebox.showinfo("成功", f"成功导入 {added_count} 个坐标点")
+        worker.start()
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
 
+    def run_coordinate_import(self, file_path, result_queue, cancel_event):
+        #####后台线程: 流式解析坐标文件并把结果批次放入队列#####
+        try:
+            for points, read_bytes in iter_coordinate_chunks(file_path, cancel_event):
+                result_queue.put(("batch", points, read_bytes))
+            result_queue.put(("done", None, None))
         except Exception as e:
-            messagebox.showerror("错误", f"导入坐标时出错: {str(e)}")
+            result_queue.put(("error", str(e), None))
 
     def toggle_mode(self):
         #####切换模式#####
+        self.set_hover(None)
         if self.current_mode == "coordinate":
             # 切换到叠加图片模式
             self.current_mode = "overlay"
             self.mode_button.config(text="切换到坐标获取模式")
-            self.info_label.config(text="模式: 叠加图片")
+            self.set_info_text("模式: 叠加图片")
 
             # 重新加载所有叠加图片，确保它们显示在背景图片之上
             self.reload_overlay_images()
 
-            # 更新坐标点列表
+            # 更新坐标点列表(之前的坐标点被替换，相关的历史记录随之失效)
             self.update_coord_list_from_images()
+            self.history.discard_point_commands()
 
             # 禁用坐标点相关功能
             self.add_point_button.config(state=tk.DISABLED)
@@ -454,7 +1502,7 @@ class ImageCoordinatePicker:
             # 切换到坐标获取模式
             self.current_mode = "coordinate"
             self.mode_button.config(text="切换到叠加图片模式")
-            self.info_label.config(text="模式: 坐标获取")
+            self.set_info_text("模式: 坐标获取")
 
             # 重新显示背景图片，确保它显示在叠加图片之上
             if self.background_image:
@@ -465,43 +1513,23 @@ class ImageCoordinatePicker:
             self.edit_point_button.config(state=tk.NORMAL)
             self.remove_point_button.config(state=tk.NORMAL)
 
+    @instrument("update_coord_list_from_images", paint=True)
     def update_coord_list_from_images(self):
         #####从叠加图片更新坐标点列表#####
-        self.coord_list.delete(0, tk.END)
-        self.points = []
-
-        for img in self.draggable_images:
-            x, y = img.get_bg_coordinates()
-            self.points.append((x, y))
-            self.coord_list.insert(tk.END, f"({x}, {y})")
+        # 叠加图片模式下坐标点列表只反映图片位置，不在画布上绘制标注点
+        self.delete_all_point_items()
+        self.points.replace([img.get_bg_coordinates() for img in self.draggable_images])
+        self.drop_stale_point_hover()
+        self.coord_list.reset()
 
     def reload_overlay_images(self):
-        #####重新加载所有叠加图片，确保它们显示在背景图片之上#####
+        #####显示所有叠加图片，确保它们显示在背景图片之上#####
         if not self.background_image:
             return
 
-        # 清除所有叠加图片
-        for img in self.draggable_images:
-            self.canvas.delete(img.canvas_id)
-
-        # 重新创建所有叠加图片
-        for img in self.draggable_images:
-            # 创建新的可拖动图片
-            new_img = DraggableImage(
-                self.canvas, img.original_image,
-                self.bg_scale_x, self.bg_scale_y,
-                self.bg_x, self.bg_y,
-                img.name, img.bg_coord_x, img.bg_coord_y
-            )
-            new_img.set_locked(img.is_locked)
-            new_img.set_parent_app(self)
-
-            # 替换旧的图片对象
-            index = self.draggable_images.index(img)
-            self.draggable_images[index] = new_img
-
-        # 确保叠加图片显示在背景图片之上
-        self.canvas.tag_raise("overlay")
+        # 保留现有图片对象及其锁定状态，只恢复可见性和图层顺序
+        self.canvas.itemconfigure("draggable", state=tk.NORMAL)
+        self.layers.restack()
 
     def load_background_image(self):
         #####加载背景图片#####
@@ -510,93 +1538,248 @@ class ImageCoordinatePicker:
         )
         if file_path:
             try:
-                self.background_image = Image.open(file_path)
-                self.display_background_image()
-                self.points = []
-                self.coord_list.delete(0, tk.END)
-
-                # 清除所有叠加图片
-                for img in self.draggable_images:
-                    self.canvas.delete(img.canvas_id)
-                self.draggable_images = []
-                self.image_listbox.delete(0, tk.END)
-
-                # 重置模式
-                self.current_mode = "coordinate"
-                self.mode_button.config(text="切换到叠加图片模式")
-                self.info_label.config(text="模式: 坐标获取")
-
-                # 启用坐标点相关功能
-                self.add_point_button.config(state=tk.NORMAL)
-                self.edit_point_button.config(state=tk.NORMAL)
-                self.remove_point_button.config(state=tk.NORMAL)
-
+                self.open_background_file(file_path)
+                # 新的背景不属于之前打开的项目
+                self.project_path = None
             except Exception as e:
                 messagebox.showerror("错误", f"无法加载图片: {str(e)}")
 
-    def display_background_image(self):
+    def open_background_file(self, file_path, image=None):
+        #####打开背景图片并清空坐标点与叠加图片，失败时抛出异常，image为已经在后台读取好的图片#####
+        self.background_image = image if image is not None else load_image_file(file_path)
+        self.background_path = file_path
+        self.bg_pyramid = TilePyramid(self.background_image)
+        self.pixel_sampler = PixelSampler(self.background_image)
+        # 旧背景与叠加图片的缩放结果不再需要
+        scaled_image_cache.clear()
+        self.canvas.delete("background")
+        self.bg_tiles = {}
+        self.bg_tiles_key = None
+        self.zoom = 1.0
+        self.view_center = (self.background_image.width / 2, self.background_image.height / 2)
+        self.points.clear()
+        self.coord_list.reset()
+        self.display_background_image()
+
+        # 清除所有叠加图片
+        for img in self.draggable_images:
+            self.canvas.delete(img.canvas_id)
+        self.draggable_images = []
+        self.overlay_sources.clear()
+        self.drag_dirty_images.clear()
+        self.image_listbox.reset()
+        self.selected_image_index = -1
+        self.selected_images = set()
+        self.group_drag = []
+        self.history.clear()
+        self.overlay_grid.clear()
+        self.overlays_by_uid = {}
+        self.unloaded_overlays = {}
+        self.pending_restore = None
+        self.drop_stale_point_hover()
+
+        # 重置模式
+        self.current_mode = "coordinate"
+        self.mode_button.config(text="切换到叠加图片模式")
+        self.set_info_text("模式: 坐标获取")
+
+        # 启用坐标点相关功能
+        self.add_point_button.config(state=tk.NORMAL)
+        self.edit_point_button.config(state=tk.NORMAL)
+        self.remove_point_button.config(state=tk.NORMAL)
+
+    @instrument("display_background_image", paint=True)
+    def display_background_image(self, resample=RESAMPLE_LANCZOS):
         #####显示背景图片#####
         if self.background_image:
             # 获取Canvas的当前尺寸
-            canvas_width = self.canvas.winfo_width()
-            canvas_height = self.canvas.winfo_height()
+            canvas_width, canvas_height = self.current_canvas_size()
 
             # 如果Canvas还没有被渲染，使用默认尺寸
             if canvas_width < 10:
                 canvas_width = 600
             if canvas_height < 10:
                 canvas_height = 500
+            self.canvas_size = (canvas_width, canvas_height)
 
-            # 计算缩放比例，保持宽高比
+            # 计算适应窗口的缩放比例(保持宽高比)，再乘以用户缩放倍率
             img_width, img_height = self.background_image.size
             width_ratio = canvas_width / img_width
             height_ratio = canvas_height / img_height
-            scale_ratio = min(width_ratio, height_ratio)
+            self.bg_fit_ratio = min(width_ratio, height_ratio)
+            scale_ratio = self.bg_fit_ratio * self.zoom
 
             # 计算缩放后的尺寸
-            new_width = int(img_width * scale_ratio)
-            new_height = int(img_height * scale_ratio)
-
-            # 缩放图片
-            display_image = self.background_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(display_image)
-
-            # 计算图片在Canvas中的位置(居中显示)
-            self.bg_x = (canvas_width - new_width) // 2
-            self.bg_y = (canvas_height - new_height) // 2
-
-            # 清除Canvas上的叠加图片和点，但保留背景图片
-            self.canvas.delete("overlay")
-            self.canvas.delete("point")
-            self.canvas.delete("point_text")
-
-            # 如果背景图片不存在，则创建它
-            if self.bg_image_id is None:
-                self.bg_image_id = self.canvas.create_image(
-                    self.bg_x, self.bg_y, anchor=tk.NW, image=self.bg_photo, tags="background"
-                )
-            else:
-                # 更新背景图片
-                self.canvas.itemconfig(self.bg_image_id, image=self.bg_photo)
-                self.canvas.coords(self.bg_image_id, self.bg_x, self.bg_y)
-
-            # 将背景图片置于底层
-            self.canvas.tag_lower(self.bg_image_id)
+            new_width = max(1, int(img_width * scale_ratio))
+            new_height = max(1, int(img_height * scale_ratio))
+            self.bg_display_width = new_width
+            self.bg_display_height = new_height
 
             # 存储缩放比例，用于坐标转换
             self.bg_scale_x = img_width / new_width
             self.bg_scale_y = img_height / new_height
 
-            # 重新绘制已有点和叠加图片
-            self.redraw_points()
+            # 计算图片在Canvas中的位置(视图中心对应的原图坐标位于画布中央)
+            center_x, center_y = self.view_center
+            self.bg_x = int(round(canvas_width / 2 - center_x / self.bg_scale_x))
+            self.bg_y = int(round(canvas_height / 2 - center_y / self.bg_scale_y))
+
+            # 只为可见区域生成背景图块
+            self.render_background_tiles(resample)
+
+            # 已有点与叠加图片只更新位置而不重建
+            self.reposition_point_items()
             for img in self.draggable_images:
                 img.update_position(
                     img.bg_coord_x, img.bg_coord_y,
                     self.bg_scale_x, self.bg_scale_y,
-                    self.bg_x, self.bg_y
+                    self.bg_x, self.bg_y,
+                    resample, self.canvas_size
                 )
                 img.set_parent_app(self)  # 设置父应用程序引用
 
+            # 坐标获取模式下背景覆盖叠加图片，叠加图片模式下显示叠加图片
+            overlay_state = tk.NORMAL if self.current_mode == "overlay" else tk.HIDDEN
+            self.canvas.itemconfigure("draggable", state=overlay_state)
+            self.layers.restack()
+            self.set_hover(None)
+
+            # 记录本次渲染的画布尺寸与滤镜，供缩放调度判断是否需要重绘
+            self.rendered_canvas_size = (canvas_width, canvas_height)
+            self.rendered_resample = resample
+
+    @instrument("render_background_tiles", paint=True)
+    def render_background_tiles(self, resample=RESAMPLE_LANCZOS):
+        #####只为视口内可见的背景图块创建PhotoImage，已有图块直接复用#####
+        display_width, display_height = self.bg_display_width, self.bg_display_height
+
+        # 显示尺寸或滤镜变化后旧图块全部失效
+        tiles_key = (display_width, display_height, resample)
+        if tiles_key != self.bg_tiles_key:
+            self.canvas.delete("background")
+            self.bg_tiles = {}
+            self.bg_tiles_key = tiles_key
+
+        # 视口在显示图片上的范围(显示像素)
+        canvas_width, canvas_height = self.canvas_size
+        left = max(0, -self.bg_x)
+        top = max(0, -self.bg_y)
+        right = min(display_width, canvas_width - self.bg_x)
+        bottom = min(display_height, canvas_height - self.bg_y)
+
+        visible = set()
+        if left < right and top < bottom:
+            for row in range(top // TILE_SIZE, (bottom - 1) // TILE_SIZE + 1):
+                for column in range(left // TILE_SIZE, (right - 1) // TILE_SIZE + 1):
+                    visible.add((column, row))
+                    tile_x = self.bg_x + column * TILE_SIZE
+                    tile_y = self.bg_y + row * TILE_SIZE
+                    tile = self.bg_tiles.get((column, row))
+                    if tile is not None:
+                        self.canvas.coords(tile[0], tile_x, tile_y)
+                        continue
+
+                    tile_box = (
+                        column * TILE_SIZE, row * TILE_SIZE,
+                        min((column + 1) * TILE_SIZE, display_width),
+                        min((row + 1) * TILE_SIZE, display_height)
+                    )
+                    photo = ImageTk.PhotoImage(
+                        self.bg_pyramid.render_tile((display_width, display_height), tile_box, resample)
+                    )
+                    item_id = self.canvas.create_image(
+                        tile_x, tile_y, anchor=tk.NW, image=photo, tags="background"
+                    )
+                    self.bg_tiles[(column, row)] = (item_id, photo)
+
+        # 删除移出视口的图块
+        for key in [key for key in self.bg_tiles if key not in visible]:
+            self.canvas.delete(self.bg_tiles.pop(key)[0])
+
+    def canvas_to_image_pixel(self, canvas_x, canvas_y):
+        #####将画布坐标映射为原图像素坐标，不在背景图片上时返回None#####
+        if not (self.bg_x <= canvas_x < self.bg_x + self.bg_display_width and
+                self.bg_y <= canvas_y < self.bg_y + self.bg_display_height):
+            return None
+
+        # 取画布像素中心所在的原图像素，任意缩放倍率下都精确
+        x = int((canvas_x - self.bg_x + 0.5) * self.bg_scale_x)
+        y = int((canvas_y - self.bg_y + 0.5) * self.bg_scale_y)
+
+        # 限制坐标在图片范围内
+        x = max(0, min(x, self.background_image.width - 1))
+        y = max(0, min(y, self.background_image.height - 1))
+        return x, y
+
+    def on_canvas_zoom(self, event):
+        #####Ctrl+滚轮以鼠标位置为中心缩放#####
+        if not self.background_image:
+            return
+
+        zoom_in = event.num == 4 or event.delta > 0
+        zoom_max = max(1.0, ZOOM_MAX_DISPLAY_SCALE / self.bg_fit_ratio)
+        new_zoom = self.zoom * ZOOM_STEP if zoom_in else self.zoom / ZOOM_STEP
+        new_zoom = max(ZOOM_MIN, min(new_zoom, zoom_max))
+        if new_zoom == self.zoom:
+            return
+
+        # 保持鼠标下的原图坐标不动
+        image_x = (event.x - self.bg_x) * self.bg_scale_x
+        image_y = (event.y - self.bg_y) * self.bg_scale_y
+        img_width, img_height = self.background_image.size
+        new_scale_x = img_width / max(1, int(img_width * self.bg_fit_ratio * new_zoom))
+        new_scale_y = img_height / max(1, int(img_height * self.bg_fit_ratio * new_zoom))
+        canvas_width, canvas_height = self.canvas_size
+        self.view_center = (
+            image_x + (canvas_width / 2 - event.x) * new_scale_x,
+            image_y + (canvas_height / 2 - event.y) * new_scale_y
+        )
+        self.zoom = new_zoom
+
+        # 先快速预览，停止滚动后再高质量渲染
+        self.display_background_image(RESIZE_PREVIEW_FILTER)
+        self.schedule_final_render()
+
+    def reset_zoom(self, event=None):
+        #####恢复为适应窗口显示#####
+        if not self.background_image:
+            return
+        self.zoom = 1.0
+        self.view_center = (self.background_image.width / 2, self.background_image.height / 2)
+        self.display_background_image()
+
+    def on_pan_start(self, event):
+        #####鼠标中键按下，开始平移视图#####
+        self.pan_last = (event.x, event.y)
+
+    def on_pan_drag(self, event):
+        #####鼠标中键拖动平移视图#####
+        if not self.background_image or self.pan_last is None:
+            return
+        dx = event.x - self.pan_last[0]
+        dy = event.y - self.pan_last[1]
+        self.pan_last = (event.x, event.y)
+        if dx or dy:
+            self.pan_view(dx, dy)
+
+    def pan_view(self, dx, dy):
+        #####平移视图: 整体移动画布元素，只补齐新露出的背景图块#####
+        self.bg_x += dx
+        self.bg_y += dy
+        center_x, center_y = self.view_center
+        self.view_center = (center_x - dx * self.bg_scale_x, center_y - dy * self.bg_scale_y)
+
+        # 叠加图片和坐标点都带有overlay标签，缩放比例不变时无需重新缩放
+        self.canvas.move("overlay", dx, dy)
+        # 放大查看时只有裁剪部分不再覆盖视口的图片需要重新裁剪
+        for img in self.draggable_images:
+            img.bg_x = self.bg_x
+            img.bg_y = self.bg_y
+            img.refresh_visible()
+
+        self.render_background_tiles(self.rendered_resample)
+        self.layers.restack()
+
     def add_draggable_image(self):
         #####添加可拖动的叠加图片#####
         if not self.background_image:
@@ -607,201 +1790,341 @@ class ImageCoordinatePicker:
             filetypes=[("图片文件", "*.png *.jpg *.jpeg *.bmp *.gif")]
         )
         if file_path:
-            try:
-                image = Image.open(file_path)
-                # 使用文件名(不含扩展名)作为图片名称
-                name = os.path.splitext(os.path.basename(file_path))[0]
-
-                # 默认位置在画布中央(背景坐标)
-                bg_width, bg_height = self.background_image.size
-                bg_x = bg_width // 2 - image.width // 2
-                bg_y = bg_height // 2 - image.height // 2
-
-                # 创建可拖动图片
-                draggable_image = DraggableImage(
-                    self.canvas, image,
-                    self.bg_scale_x, self.bg_scale_y,
-                    self.bg_x, self.bg_y,
-                    name, bg_x, bg_y
-                )
-                draggable_image.set_parent_app(self)
-
-                self.draggable_images.append(draggable_image)
-
-                # 添加到列表
-                self.add_image_to_list(draggable_image)
-
-                # 更新坐标点列表
-                if self.current_mode == "overlay":
-                    self.update_coord_list_from_images()
-
-                # 确保背景图片始终在底层
-                self.canvas.tag_lower(self.bg_image_id)
-
-            except Exception as e:
-                messagebox.showerror("错误", f"无法加载图片: {str(e)}")
+            # 与批量添加相同，在后台解码并立即关闭文件句柄
+            self.load_overlay_files([(file_path, None, None)], on_loaded=self.record_added_overlays)
 
     def add_image_to_list(self, image):
-        #####添加图片到列表#####
-        bg_x, bg_y = image.get_bg_coordinates()
-        item_text = f"{image.name} - ({bg_x}, {bg_y})"
-        self.image_listbox.insert(tk.END, item_text)
+        #####添加图片到列表(图片已经加入draggable_images的末尾)#####
+        image.list_index = len(self.draggable_images) - 1
+        self.image_listbox.rows_inserted(image.list_index)
+
+    def image_row_text(self, index):
+        #####叠加图片列表第index行的文本#####
+        image = self.draggable_images[index]
+        return f"{image.name} - ({image.bg_coord_x}, {image.bg_coord_y})"
+
+    def image_row_fields(self, index):
+        #####叠加图片列表第index行用于筛选的(名称, x, y)#####
+        image = self.draggable_images[index]
+        return image.name, image.bg_coord_x, image.bg_coord_y
+
+    def point_text(self, x, y, label=""):
+        #####坐标点在列表与画布上显示的文本，有名称时显示在坐标之前#####
+        return f"{label} ({x}, {y})" if label else f"({x}, {y})"
+
+    def point_row_text(self, index):
+        #####坐标点列表第index行的文本#####
+        x, y = self.points[index]
+        return self.point_text(x, y, self.points.label(index))
+
+    def point_row_fields(self, index):
+        #####坐标点列表第index行用于筛选的(名称, x, y)，没有名称的点名称为空#####
+        x, y = self.points[index]
+        return self.points.label(index), x, y
+
+    def is_listed_image(self, image):
+        #####检查图片记录的行号是否有效#####
+        index = image.list_index
+        return 0 <= index < len(self.draggable_images) and self.draggable_images[index] is image
+
+    def reindex_images(self, start=0):
+        #####删除图片后重新编号后续行#####
+        for index in range(start, len(self.draggable_images)):
+            self.draggable_images[index].list_index = index
 
     def update_image_list_item(self, image):
         #####更新列表中的图片项#####
-        if image in self.draggable_images:
-            index = self.draggable_images.index(image)
-            bg_x, bg_y = image.get_bg_coordinates()
-            item_text = f"{image.name} - ({bg_x}, {bg_y})"
-            self.image_listbox.delete(index)
-            self.image_listbox.insert(index, item_text)
-            self.image_listbox.select_set(index)
+        if self.is_listed_image(image):
+            self.image_listbox.rows_changed(image.list_index)
+
+    @instrument("flush_drag_list_updates", paint=True)
+    def flush_drag_list_updates(self):
+        #####刷新位置变化的列表行(列表只重绘可见行)#####
+        dirty_images, self.drag_dirty_images = self.drag_dirty_images, set()
+        indices = sorted(image.list_index for image in dirty_images if self.is_listed_image(image))
+        update_points = self.current_mode == "overlay"
+        for first, last in iter_index_runs(indices):
+            images = self.draggable_images[first:last + 1]
+            self.image_listbox.rows_changed(first, last)
+
+            # 叠加图片模式下坐标点列表与叠加图片一一对应
+            if update_points and last < len(self.points):
+                for index, img in enumerate(images, first):
+                    self.points[index] = img.get_bg_coordinates()
+                self.coord_list.rows_changed(first, last)
+
+    def commit_image_positions(self, images):
+        #####立即提交图片的最终位置(拖动结束、手动设置坐标或批量移动)#####
+        for image in images:
+            self.index_overlay(image)
+            self.drag_dirty_images.add(image)
+        self.flush_drag_list_updates()
+
+    def move_images(self, moves):
+        #####批量移动叠加图片[(图片, x, y)]，索引与列表只刷新一次#####
+        for image, x, y in moves:
+            image.set_position_by_bg_coords(x, y, commit=False)
+        self.commit_image_positions([image for image, _, _ in moves])
+
+    def begin_group_drag(self, image):
+        #####开始拖动: 按下的图片与其他未锁定的选中图片组成一组#####
+        group = [image] + [img for img in self.selected_images if img is not image and not img.is_locked]
+        self.group_drag = [(img, img.bg_coord_x, img.bg_coord_y) for img in group]
+        self.group_drag_target = None
+        for img in group:
+            self.canvas.addtag_withtag(GROUP_DRAG_TAG, img.canvas_id)
+        self.begin_snap(set(group))
+        self.set_hover(None)
+        # 画布获得焦点后方向键用于微移
+        self.canvas.focus_set()
+
+    def drag_group_to(self, x, y):
+        #####记录主图片的目标背景坐标，按帧率合并为一次批量移动#####
+        self.group_drag_target = (x, y)
+        if self.group_drag_job is None:
+            self.group_drag_job = self.root.after(DRAG_LIST_UPDATE_INTERVAL_MS, self.flush_group_drag)
+
+    @instrument("flush_group_drag", paint=True)
+    def flush_group_drag(self):
+        #####把整组图片移动到最新的拖动位置: 画布上一次move，列表一次刷新#####
+        self.group_drag_job = None
+        if not self.group_drag or self.group_drag_target is None:
+            return
+        primary, start_x, start_y = self.group_drag[0]
+        dx = self.group_drag_target[0] - start_x
+        dy = self.group_drag_target[1] - start_y
+        if (primary.bg_coord_x, primary.bg_coord_y) == self.group_drag_target:
+            return
+
+        # 以主图片的画布位置计算整组的画布位移
+        canvas_x, canvas_y = primary.canvas_origin()
+        self.canvas.move(
+            GROUP_DRAG_TAG,
+            background_to_canvas(start_x + dx, primary.bg_x, primary.bg_scale_x) - canvas_x,
+            background_to_canvas(start_y + dy, primary.bg_y, primary.bg_scale_y) - canvas_y
+        )
+        for img, img_start_x, img_start_y in self.group_drag:
+            img.bg_coord_x = img_start_x + dx
+            img.bg_coord_y = img_start_y + dy
+            img.refresh_visible()
+        self.commit_image_positions([img for img, _, _ in self.group_drag])
+
+    def end_group_drag(self):
+        #####结束拖动: 提交最终位置，整组的移动记录为一条历史#####
+        if self.group_drag_job is not None:
+            self.root.after_cancel(self.group_drag_job)
+        self.flush_group_drag()
+        self.canvas.dtag(GROUP_DRAG_TAG)
+        self.end_snap()
+
+        moves = []
+        for img, start_x, start_y in self.group_drag:
+            # 整组按主图片的位移移动，各自按四舍五入对齐到准确的画布坐标
+            img.set_position_by_bg_coords(img.bg_coord_x, img.bg_coord_y, commit=False)
+            if (start_x, start_y) != (img.bg_coord_x, img.bg_coord_y):
+                moves.append((img.uid, start_x, start_y, img.bg_coord_x, img.bg_coord_y))
+        self.group_drag = []
+        self.group_drag_target = None
+        if moves:
+            self.history.push(MoveOverlays(moves))
+
+    def nudge_selected_images(self, event):
+        #####方向键微移选中的叠加图片(Shift加大步长)，连续微移合并为一条历史#####
+        if isinstance(event.widget, (tk.Listbox, tk.Entry)) or self.current_mode != "overlay":
+            return None
+        images = [img for img in self.selected_images if not img.is_locked]
+        if not images or self.group_drag:
+            return None
+
+        step = NUDGE_STEP_LARGE if event.state & SHIFT_MASK else NUDGE_STEP
+        dx, dy = {"Left": (-step, 0), "Right": (step, 0), "Up": (0, -step), "Down": (0, step)}[event.keysym]
+        moves = [(img, img.bg_coord_x + dx, img.bg_coord_y + dy) for img in images]
+
+        last = self.history.last()
+        if last is not None and last is self.last_nudge and {move[0] for move in last.moves} == {img.uid for img in images}:
+            command = MoveOverlays((uid, old_x, old_y, new_x + dx, new_y + dy) for uid, old_x, old_y, new_x, new_y in last.moves)
+            self.history.amend(command)
+        else:
+            command = MoveOverlays((img.uid, img.bg_coord_x, img.bg_coord_y, x, y) for img, x, y in moves)
+            self.history.push(command)
+        self.last_nudge = command
+        self.move_images(moves)
+        return "break"
+
+    def align_selected_images(self, mode):
+        #####对齐或等距分布选中的叠加图片，只选中一张时相对背景图片对齐#####
+        images = [img for img in self.selected_image_list() if not img.is_locked]
+        if not images:
+            messagebox.showwarning("警告", "请先选择未锁定的叠加图片")
+            return
+
+        boxes = [(img.bg_coord_x, img.bg_coord_y, *img.source.size) for img in images]
+        if mode in ("horizontal", "vertical"):
+            if len(images) < 3:
+                messagebox.showwarning("警告", "等距分布至少需要选择3张叠加图片")
+                return
+            positions = distribute_boxes(boxes, mode)
+        else:
+            bounds = (0, 0, *self.background_image.size) if len(images) == 1 else None
+            positions = align_boxes(boxes, mode, bounds)
+
+        moves = [(img, x, y) for img, (x, y) in zip(images, positions) if (x, y) != img.get_bg_coordinates()]
+        if moves:
+            self.history.push(MoveOverlays((img.uid, img.bg_coord_x, img.bg_coord_y, x, y) for img, x, y in moves))
+            self.move_images(moves)
+
+    def selected_image_list(self):
+        #####按列表顺序返回选中的叠加图片#####
+        return sorted(self.selected_images, key=lambda img: img.list_index)
+
+    def set_image_selection(self, images, primary=None, sync_list=True):
+        #####设置选中的叠加图片，只更新选中状态变化的图片；primary为空时取列表中最靠前的一张#####
+        images = {img for img in images if self.is_listed_image(img)}
+        for img in self.selected_images - images:
+            img.set_selected(False)
+        for img in images - self.selected_images:
+            img.set_selected(True)
+        self.selected_images = images
+
+        if primary not in images:
+            primary = min(images, key=lambda img: img.list_index) if images else None
+        self.selected_image_index = primary.list_index if primary is not None else -1
+        if primary is not None:
+            self.update_lock_button(primary)
+
+        if sync_list:
+            # 连续的行合并为一次调用
+            self.image_listbox.selection_clear(0, tk.END)
+            for first, last in iter_index_runs(sorted(img.list_index for img in images)):
+                self.image_listbox.selection_set(first, last)
+            if primary is not None:
+                self.image_listbox.selection_anchor(primary.list_index)
+                self.image_listbox.see(primary.list_index)
 
     def on_image_selected(self, event):
-        #####当选择叠加图片时#####
+        #####当在列表中选择叠加图片时(Shift/Ctrl可多选)#####
         selection = self.image_listbox.curselection()
-        if selection:
-            self.selected_image_index = selection[0]
-            # 取消之前选中的图片
-            for img in self.draggable_images:
-                img.set_selected(False)
-
-            # 选中当前图片
-            if self.selected_image_index < len(self.draggable_images):
-                selected_image = self.draggable_images[self.selected_image_index]
-                selected_image.set_selected(True)
-                # 确保选中的图片显示在最上层
-                self.canvas.tag_raise(selected_image.canvas_id)
+        images = [self.draggable_images[index] for index in selection if index < len(self.draggable_images)]
+        # 最近一次点击的行(选择锚点)作为主选中图片
+        anchor = self.image_listbox.index(tk.ANCHOR)
+        primary = self.draggable_images[anchor] if anchor in selection and anchor < len(self.draggable_images) else None
+        self.set_image_selection(images, primary, sync_list=False)
+        if primary is not None:
+            # 确保主选中的图片显示在叠加图片图层的最上层
+            self.layers.raise_in_layer(primary.canvas_id, "draggable")
 
     def select_image_by_reference(self, image):
-        #####通过图片引用选择图片#####
-        if image in self.draggable_images:
-            index = self.draggable_images.index(image)
-            self.image_listbox.select_clear(0, tk.END)
-            self.image_listbox.select_set(index)
-            self.selected_image_index = index
-
-            # 取消之前选中的图片
-            for img in self.draggable_images:
-                img.set_selected(False)
+        #####通过图片引用只选中这一张图片#####
+        self.set_image_selection([image], image)
 
-            # 选中当前图片
-            image.set_selected(True)
+    def toggle_image_selection(self, image):
+        #####Shift/Ctrl+单击画布上的图片时切换其选中状态#####
+        if image in self.selected_images:
+            self.set_image_selection(self.selected_images - {image})
+        else:
+            self.set_image_selection(self.selected_images | {image}, image)
 
     def toggle_image_lock(self):
-        #####切换选中图片的锁定状态#####
+        #####切换选中图片的锁定状态(多选时按主选中图片的状态统一设置)#####
         if self.selected_image_index < 0 or self.selected_image_index >= len(self.draggable_images):
             messagebox.showwarning("警告", "请先选择一个叠加图片")
             return
 
-        image = self.draggable_images[self.selected_image_index]
-        image.set_locked(not image.is_locked)
-
-        # 更新按钮文本
+        primary = self.draggable_images[self.selected_image_index]
+        locked = not primary.is_locked
+        commands = [
+            SetOverlayProperty(img.uid, "locked", img.is_locked, locked)
+            for img in self.selected_image_list() if img.is_locked != locked
+        ]
+        self.history.push(commands[0] if len(commands) == 1 else CommandGroup(commands))
+        for img in self.selected_images:
+            img.set_locked(locked)
+        self.update_lock_button(primary)
+
+    def update_lock_button(self, image):
+        #####按图片的锁定状态更新按钮文本#####
         if image.is_locked:
             self.lock_image_button.config(text="解锁叠加图片")
         else:
             self.lock_image_button.config(text="锁定叠加图片")
 
     def set_image_position(self):
-        #####设置选中图片的位置(通过输入背景坐标)#####
+        #####设置主选中图片的位置(通过输入背景坐标)，其他选中的图片随之平移#####
         if self.selected_image_index < 0 or self.selected_image_index >= len(self.draggable_images):
             messagebox.showwarning("警告", "请先选择一个叠加图片")
             return
 
-        # 获取当前图片的背景坐标
-        current_x, current_y = self.draggable_images[self.selected_image_index].get_bg_coordinates()
-
-        # 创建输入对话框
-        input_dialog = tk.Toplevel(self.root)
-        input_dialog.title("设置图片位置")
-        self.center_window(input_dialog, 300, 150)
-        input_dialog.transient(self.root)
-        input_dialog.grab_set()
-
-        # 输入框
-        ttk.Label(input_dialog, text="X坐标:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        x_var = tk.StringVar(value=str(current_x))
-        x_entry = ttk.Entry(input_dialog, textvariable=x_var)
-        x_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        ttk.Label(input_dialog, text="Y坐标:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
-        y_var = tk.StringVar(value=str(current_y))
-        y_entry = ttk.Entry(input_dialog, textvariable=y_var)
-        y_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        # 确定按钮
-        def confirm():
-            try:
-                x = int(x_var.get())
-                y = int(y_var.get())
+        # 与拖动、微移和对齐一致，锁定的图片不移动
+        primary = self.draggable_images[self.selected_image_index]
+        if primary.is_locked:
+            messagebox.showwarning("警告", "选中的叠加图片已锁定")
+            return
 
-                # 更新图片位置
-                self.draggable_images[self.selected_image_index].set_position_by_bg_coords(x, y)
-                input_dialog.destroy()
+        # 获取当前图片的背景坐标
+        current_x, current_y = primary.get_bg_coordinates()
 
-                # 更新坐标点列表
-                if self.current_mode == "overlay":
-                    self.update_coord_list_from_images()
-            except ValueError:
-                messagebox.showerror("错误", "请输入有效的整数坐标")
+        def confirm(x, y):
+            # 更新图片位置
+            dx, dy = x - current_x, y - current_y
+            if dx or dy:
+                moves = [(img, img.bg_coord_x + dx, img.bg_coord_y + dy)
+                         for img in self.selected_image_list() if not img.is_locked]
+                self.history.push(MoveOverlays((img.uid, img.bg_coord_x, img.bg_coord_y, new_x, new_y)
+                                               for img, new_x, new_y in moves))
+                self.move_images(moves)
 
-        ttk.Button(input_dialog, text="确定", command=confirm).grid(row=2, column=0, columnspan=2, pady=10)
-
-        # 配置权重
-        input_dialog.columnconfigure(1, weight=1)
+        self.show_coordinate_dialog("设置图片位置", current_x, current_y, confirm)
 
     def remove_selected_image(self):
         #####删除选中的叠加图片#####
-        if 0 <= self.selected_image_index < len(self.draggable_images):
-            # 从画布中删除
-            self.canvas.delete(self.draggable_images[self.selected_image_index].canvas_id)
-            # 从列表中删除
-            del self.draggable_images[self.selected_image_index]
-            # 从列表框中删除
-            self.image_listbox.delete(self.selected_image_index)
-            self.selected_image_index = -1
+        images = self.selected_image_list()
+        if images:
+            # 历史记录只保存源文件路径与位置，撤销时重新读取图片
+            self.history.push(RemoveOverlays(self.overlay_records(images)))
+            # 从后往前删除，减少后续行的重新编号
+            for image in reversed(images):
+                self.delete_overlay(image)
 
             # 更新坐标点列表
             if self.current_mode == "overlay":
                 self.update_coord_list_from_images()
 
+    def delete_overlay(self, image):
+        #####从画布、列表和缩放缓存中删除一张叠加图片#####
+        index = image.list_index
+        self.canvas.delete(image.canvas_id)
+        self.overlay_sources.release(image.source)
+        self.overlay_grid.remove(image)
+        self.overlays_by_uid.pop(image.uid, None)
+        if self.hover_target == ("overlay", image):
+            self.set_hover(None)
+        self.selected_images.discard(image)
+        image.set_selected(False)
+        # 从列表中删除
+        del self.draggable_images[index]
+        self.drag_dirty_images.discard(image)
+        self.reindex_images(index)
+        # 从列表框中删除
+        self.image_listbox.rows_deleted(index)
+        if self.selected_image_index == index:
+            # 主选中图片被删除时由剩下的选中图片中最靠前的一张代替
+            self.selected_image_index = min((img.list_index for img in self.selected_images), default=-1)
+        elif self.selected_image_index > index:
+            self.selected_image_index -= 1
+
     def rename_selected_image(self):
         #####重命名选中的叠加图片#####
         if 0 <= self.selected_image_index < len(self.draggable_images):
-            current_name = self.draggable_images[self.selected_image_index].name
-            new_name = simpledialog.askstring(" ", "请输入新名称:", initialvalue=current_name)
-            if new_name:
-                self.draggable_images[self.selected_image_index].name = new_name
-                self.update_image_list_item(self.draggable_images[self.selected_image_index])
+            image = self.draggable_images[self.selected_image_index]
+            new_name = simpledialog.askstring(" ", "请输入新名称:", initialvalue=image.name)
+            if new_name and new_name != image.name:
+                self.history.push(SetOverlayProperty(image.uid, "name", image.name, new_name))
+                image.name = new_name
+                self.update_image_list_item(image)
 
     def bring_images_to_top(self):
         #####将所有叠加图片置顶#####
-        if not self.background_image:
-            return
-
-        # 清除所有叠加图片
-        for img in self.draggable_images:
-            self.canvas.delete(img.canvas_id)
-
-        # 重新创建所有叠加图片
-        for img in self.draggable_images:
-            # 创建新的可拖动图片
-            new_img = DraggableImage(
-                self.canvas, img.original_image,
-                self.bg_scale_x, self.bg_scale_y,
-                self.bg_x, self.bg_y,
-                img.name, img.bg_coord_x, img.bg_coord_y
-            )
-            new_img.set_locked(img.is_locked)
-            new_img.set_parent_app(self)
-
-            # 替换旧的图片对象
-            index = self.draggable_images.index(img)
-            self.draggable_images[index] = new_img
-
-        # 确保叠加图片显示在背景图片之上
-        self.canvas.tag_raise("overlay")
+        self.reload_overlay_images()
 
     def add_coordinate_point(self):
         #####添加坐标点#####
@@ -809,45 +2132,16 @@ class ImageCoordinatePicker:
             messagebox.showwarning("警告", "请先加载背景图片")
             return
 
-        # 创建输入对话框
-        input_dialog = tk.Toplevel(self.root)
-        input_dialog.title("添加坐标点")
-        self.center_window(input_dialog, 300, 150)
-        input_dialog.transient(self.root)
-        input_dialog.grab_set()
-
-        # 输入框
-        ttk.Label(input_dialog, text="X坐标:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        x_var = tk.StringVar(value="0")
-        x_entry = ttk.Entry(input_dialog, textvariable=x_var)
-        x_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        ttk.Label(input_dialog, text="Y坐标:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
-        y_var = tk.StringVar(value="0")
-        y_entry = ttk.Entry(input_dialog, textvariable=y_var)
-        y_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        # 确定按钮
-        def confirm():
-            try:
-                x = int(x_var.get())
-                y = int(y_var.get())
-
-                # 添加到点列表
-                self.points.append((x, y))
-                self.coord_list.insert(tk.END, f"({x}, {y})")
-
-                # 在Canvas上绘制点
-                self.draw_point(x, y)
-
-                input_dialog.destroy()
-            except ValueError:
-                messagebox.showerror("错误", "请输入有效的整数坐标")
+        def confirm(x, y):
+            # 添加到点列表
+            self.history.push(InsertPoints(len(self.points), [(x, y)]))
+            self.points.add(x, y)
+            self.coord_list.rows_inserted(len(self.points) - 1)
 
-        ttk.Button(input_dialog, text="确定", command=confirm).grid(row=2, column=0, columnspan=2, pady=10)
+            # 在Canvas上绘制点
+            self.draw_point(x, y)
 
-        # 配置权重
-        input_dialog.columnconfigure(1, weight=1)
+        self.show_coordinate_dialog("添加坐标点", 0, 0, confirm)
 
     def on_coord_selected(self, event):
         #####当选择坐标点时#####
@@ -856,7 +2150,7 @@ class ImageCoordinatePicker:
             index = selection[0]
             if index < len(self.points):
                 x, y = self.points[index]
-                self.info_label.config(text=f"选中坐标: ({x}, {y})")
+                self.set_info_text(f"选中坐标: ({x}, {y})")
 
     def edit_selected_point(self):
         #####修改选中的坐标点#####
@@ -872,167 +2166,807 @@ class ImageCoordinatePicker:
         # 获取当前坐标
         current_x, current_y = self.points[index]
 
-        # 创建输入对话框
-        input_dialog = tk.Toplevel(self.root)
-        input_dialog.title("修改坐标点")
-        self.center_window(input_dialog, 300, 150)
-        input_dialog.transient(self.root)
-        input_dialog.grab_set()
-
-        # 输入框
-        ttk.Label(input_dialog, text="X坐标:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
-        x_var = tk.StringVar(value=str(current_x))
-        x_entry = ttk.Entry(input_dialog, textvariable=x_var)
-        x_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        ttk.Label(input_dialog, text="Y坐标:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
-        y_var = tk.StringVar(value=str(current_y))
-        y_entry = ttk.Entry(input_dialog, textvariable=y_var)
-        y_entry.grid(row=1, column=1, padx=5, pady=5, sticky=tk.W + tk.E)
-
-        # 确定按钮
-        def confirm():
-            try:
-                x = int(x_var.get())
-                y = int(y_var.get())
-
-                # 更新点列表
-                self.points[index] = (x, y)
-                self.coord_list.delete(index)
-                self.coord_list.insert(index, f"({x}, {y})")
+        def confirm(x, y):
+            # 更新点列表
+            if (x, y) != (current_x, current_y):
+                self.history.push(SetPoint(index, (current_x, current_y), (x, y)))
+            self.set_point(index, x, y)
 
-                # 重新绘制所有点
-                self.canvas.delete("point")
-                self.canvas.delete("point_text")
-                self.redraw_points()
+        self.show_coordinate_dialog("修改坐标点", current_x, current_y, confirm)
 
-                input_dialog.destroy()
-            except ValueError:
-                messagebox.showerror("错误", "请输入有效的整数坐标")
+    def name_selected_point(self):
+        #####设置选中坐标点的名称(留空表示删除名称)#####
+        selection = self.coord_list.curselection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择一个坐标点")
+            return
 
-        ttk.Button(input_dialog, text="确定", command=confirm).grid(row=2, column=0, columnspan=2, pady=10)
+        index = selection[0]
+        if index >= len(self.points):
+            return
 
-        # 配置权重
-        input_dialog.columnconfigure(1, weight=1)
+        old_label = self.points.label(index)
+        label = simpledialog.askstring("命名坐标点", "请输入坐标点名称(留空删除名称):", initialvalue=old_label)
+        if label is None:
+            return
+        label = label.strip()
+        if label != old_label:
+            self.history.push(SetPointLabel(index, old_label, label))
+            self.set_point_label(index, label)
 
     def canvas_clicked(self, event):
         #####Canvas点击事件#####
         if self.current_mode == "overlay":
             return
 
-        # 检查是否点击了背景图片区域
-        if (self.background_image and
-                self.bg_x <= event.x < self.bg_x + self.bg_photo.width() and
-                self.bg_y <= event.y < self.bg_y + self.bg_photo.height()):
-
-            # 计算原始图片上的坐标(使用四舍五入减少误差)
-            x = int(round((event.x - self.bg_x) * self.bg_scale_x))
-            y = int(round((event.y - self.bg_y) * self.bg_scale_y))
-
-            # 限制坐标在图片范围内
-            x = max(0, min(x, self.background_image.width - 1))
-            y = max(0, min(y, self.background_image.height - 1))
+        # 检查是否点击了背景图片区域，并计算原始图片上的坐标
+        pixel = self.canvas_to_image_pixel(event.x, event.y) if self.background_image else None
+        if pixel is not None:
+            x, y = pixel
 
             # 添加到点列表
-            self.points.append((x, y))
-            self.coord_list.insert(tk.END, f"({x}, {y})")
+            self.history.push(InsertPoints(len(self.points), [(x, y)]))
+            self.points.add(x, y)
+            self.coord_list.rows_inserted(len(self.points) - 1)
 
             # 获取像素颜色
-            rgb = self.background_image.getpixel((x, y))
-            if isinstance(rgb, int):  # 灰度图像处理
-                rgb = (rgb, rgb, rgb)
-            self.info_label.config(text=f"坐标: ({x}, {y}), RGB: {rgb}")
+            rgb = self.sample_color(x, y)
+            self.set_info_text(f"坐标: ({x}, {y}), RGB: {rgb}")
 
             # 在Canvas上绘制点
             self.draw_point(x, y)
 
-            # 确保背景图片始终在底层
-            self.canvas.tag_lower(self.bg_image_id)
+    def point_canvas_coords(self, orig_x, orig_y):
+        #####转换坐标到Canvas上的位置(使用四舍五入减少误差)#####
+        canvas_x = background_to_canvas(orig_x, self.bg_x, self.bg_scale_x)
+        canvas_y = background_to_canvas(orig_y, self.bg_y, self.bg_scale_y)
+        return canvas_x, canvas_y
 
-    def draw_point(self, orig_x, orig_y):
-        #####在Canvas上绘制一个点#####
-        # 转换坐标到Canvas上的位置(使用四舍五入减少误差)
-        canvas_x = self.bg_x + int(round(orig_x / self.bg_scale_x))
-        canvas_y = self.bg_y + int(round(orig_y / self.bg_scale_y))
+    def create_point_items(self, orig_x, orig_y, label="", canvas_coords=None):
+        #####创建一个点的圆点与文本元素(不调整图层)，canvas_coords为已经换算好的画布坐标#####
+        canvas_x, canvas_y = canvas_coords or self.point_canvas_coords(orig_x, orig_y)
 
         # 绘制点
-        radius = 3
-        self.canvas.create_oval(
-            canvas_x - radius, canvas_y - radius,
-            canvas_x + radius, canvas_y + radius,
+        oval_id = self.canvas.create_oval(
+            canvas_x - POINT_RADIUS, canvas_y - POINT_RADIUS,
+            canvas_x + POINT_RADIUS, canvas_y + POINT_RADIUS,
             fill="red", outline="red", tags=("point", "overlay")
         )
 
         # 绘制坐标文本
-        self.canvas.create_text(
+        text_id = self.canvas.create_text(
             canvas_x + 10, canvas_y - 10,
-            text=f"({orig_x}, {orig_y})",
+            text=self.point_text(orig_x, orig_y, label),
             fill="black", anchor=tk.NW, tags=("point_text", "overlay")
         )
+        return oval_id, text_id
+
+    @instrument("draw_point", paint=True)
+    def draw_point(self, orig_x, orig_y):
+        #####在Canvas上绘制一个点#####
+        # 新元素本身位于最上层，只需把圆点放到所有坐标文本之下
+        oval_id, text_id = self.create_point_items(orig_x, orig_y)
+        self.canvas.tag_lower(oval_id, "point_text")
+        self.point_items.append((oval_id, text_id))
+
+    def draw_points(self, start=0):
+        #####批量绘制第start行起的所有点(画布坐标一次换算)，最后统一调整一次图层顺序#####
+        canvas_xs, canvas_ys = self.points.to_canvas(self.bg_x, self.bg_y, self.bg_scale_x, self.bg_scale_y, start)
+        labels = self.points.labels_by_index(start)
+        create_point_items = self.create_point_items
+        self.point_items.extend(
+            create_point_items(x, y, labels.get(offset, ""), canvas_coords)
+            for offset, ((x, y), canvas_coords) in enumerate(zip(self.points[start:], zip(canvas_xs, canvas_ys)))
+        )
+        self.layers.restack()
+
+    def add_points(self, points, labels=None):
+        #####批量添加坐标点(及其名称)到列表和画布#####
+        if not points:
+            return
+        start = len(self.points)
+        self.points.extend(points, labels)
+        self.coord_list.rows_inserted(start, len(self.points) - start)
+        self.draw_points(start)
+
+    def move_point_items(self, index, orig_x, orig_y):
+        #####只更新单个点的画布元素#####
+        if index >= len(self.point_items):
+            return
+        oval_id, text_id = self.point_items[index]
+        canvas_x, canvas_y = self.point_canvas_coords(orig_x, orig_y)
+        self.canvas.coords(
+            oval_id,
+            canvas_x - POINT_RADIUS, canvas_y - POINT_RADIUS,
+            canvas_x + POINT_RADIUS, canvas_y + POINT_RADIUS
+        )
+        self.canvas.coords(text_id, canvas_x + 10, canvas_y - 10)
+        self.canvas.itemconfigure(text_id, text=self.point_text(orig_x, orig_y, self.points.label(index)))
 
-        # 确保点和文本在叠加图片之上
-        self.canvas.tag_raise("point")
-        self.canvas.tag_raise("point_text")
+    def delete_point_items(self, index):
+        #####只删除单个点的画布元素#####
+        if index < len(self.point_items):
+            self.canvas.delete(*self.point_items.pop(index))
 
-        # 确保背景图片始终在底层
-        self.canvas.tag_lower(self.bg_image_id)
+    def delete_all_point_items(self):
+        #####删除画布上所有点的元素#####
+        self.canvas.delete("point")
+        self.canvas.delete("point_text")
+        self.point_items = []
 
     def redraw_points(self):
-        #####重新绘制所有点#####
-        for x, y in self.points:
-            self.draw_point(x, y)
+        #####重新绘制所有点(仅坐标获取模式)#####
+        self.delete_all_point_items()
+        if self.current_mode == "coordinate":
+            self.draw_points()
+
+    def reposition_point_items(self):
+        #####缩放或平移后按新的画布坐标移动已有的点元素，元素与坐标点不对应时重新绘制#####
+        if self.current_mode != "coordinate" or len(self.point_items) != len(self.points):
+            self.redraw_points()
+            return
+        canvas_xs, canvas_ys = self.points.to_canvas(self.bg_x, self.bg_y, self.bg_scale_x, self.bg_scale_y)
+        coords = self.canvas.coords
+        for (oval_id, text_id), canvas_x, canvas_y in zip(self.point_items, canvas_xs, canvas_ys):
+            coords(
+                oval_id,
+                canvas_x - POINT_RADIUS, canvas_y - POINT_RADIUS,
+                canvas_x + POINT_RADIUS, canvas_y + POINT_RADIUS
+            )
+            coords(text_id, canvas_x + 10, canvas_y - 10)
 
     def canvas_mouse_move(self, event):
         #####Canvas鼠标移动事件#####
-        # 如果在叠加图片模式下，不显示背景坐标信息
+        self.motion_events_total += 1
+
+        # 叠加图片模式下不显示背景坐标信息，只记录用于悬停高亮的背景坐标
         if self.current_mode == "overlay":
-            mode_text = "叠加图片"
-            self.info_label.config(text=f"模式: {mode_text}")
+            if not self.background_image:
+                return
+            status_key = ("overlay", (
+                canvas_to_background(event.x, self.bg_x, self.bg_scale_x),
+                canvas_to_background(event.y, self.bg_y, self.bg_scale_y)
+            ))
+        elif self.background_image:
+            # 检查鼠标是否在背景图片区域内，并计算原始图片上的坐标
+            pixel = self.canvas_to_image_pixel(event.x, event.y)
+            if pixel is not None:
+                status_key = ("pixel", pixel, self.sample_size_var.get())
+            else:
+                status_key = ("outside",)
+        else:
             return
 
-        if self.background_image:
-            # 检查鼠标是否在背景图片区域内
-            if (self.bg_x <= event.x < self.bg_x + self.bg_photo.width() and
-                    self.bg_y <= event.y < self.bg_y + self.bg_photo.height()):
+        # 映射到同一个原图像素的事件直接丢弃
+        if status_key == self.last_status_key:
+            self.motion_events_dropped += 1
+            return
+        self.last_status_key = status_key
+
+        # 状态栏最多每帧刷新一次，只显示最新的状态
+        self.pending_status_key = status_key
+        if self.status_update_job is None:
+            self.status_update_job = self.root.after(STATUS_UPDATE_INTERVAL_MS, self.flush_status_update)
+
+    @instrument("flush_status_update", paint=True)
+    def flush_status_update(self):
+        #####把最新的鼠标位置信息写入状态栏#####
+        self.status_update_job = None
+        status_key, self.pending_status_key = self.pending_status_key, None
+        if status_key is None:
+            return
 
-                # 计算原始图片上的坐标(使用四舍五入减少误差)
-                x = int(round((event.x - self.bg_x) * self.bg_scale_x))
-                y = int(round((event.y - self.bg_y) * self.bg_scale_y))
+        if status_key[0] == "overlay":
+            mode_text = "叠加图片"
+            self.update_hover(status_key[1])
+            if self.hover_target is not None:
+                image = self.hover_target[1]
+                x, y = image.get_bg_coordinates()
+                self.info_label.config(text=f"模式: {mode_text} - {image.name} ({x}, {y})")
+            else:
+                self.info_label.config(text=f"模式: {mode_text}")
+            return
 
-                # 限制坐标在图片范围内
-                x = max(0, min(x, self.background_image.width - 1))
-                y = max(0, min(y, self.background_image.height - 1))
+        mode_text = "坐标获取" if self.current_mode == "coordinate" else "叠加图片"
+        self.update_hover(status_key[1] if status_key[0] == "pixel" else None)
+        if status_key[0] == "pixel":
+            x, y = status_key[1]
 
-                # 获取像素颜色
-                rgb = self.background_image.getpixel((x, y))
-                if isinstance(rgb, int):  # 灰度图像处理
-                    rgb = (rgb, rgb, rgb)
+            # 获取像素颜色
+            rgb = self.sample_color(x, y)
+            self.info_label.config(text=f"坐标: ({x}, {y}), RGB: {rgb} - 模式: {mode_text}")
+        else:
+            self.info_label.config(text=f"坐标: (0, 0) - 模式: {mode_text}")
+
+    def grid_size(self):
+        #####当前的网格尺寸(背景像素)，关闭时为0#####
+        value = self.grid_size_var.get()
+        return int(value) if value.isdigit() else 0
+
+    def begin_snap(self, dragged):
+        #####拖动开始时由未拖动的叠加图片与背景生成排好序的吸附线#####
+        if self.snap_var.get():
+            boxes = [
+                (img.bg_coord_x, img.bg_coord_y, img.source.width, img.source.height)
+                for img in self.draggable_images if img not in dragged
+            ]
+            self.snap_lines = SnapLines.from_boxes(boxes, *self.background_image.size)
+        elif self.grid_size():
+            # 只启用网格时没有候选线
+            self.snap_lines = SnapLines()
+        else:
+            self.snap_lines = None
+
+    def snap_image_position(self, image, x, y):
+        #####返回吸附后的背景坐标，并在画布上显示参考线#####
+        if self.snap_lines is None:
+            return x, y
+        tolerance = SNAP_DISTANCE * max(self.bg_scale_x, self.bg_scale_y)
+        x, y, guide_x, guide_y = self.snap_lines.snap(
+            x, y, image.source.width, image.source.height, tolerance, self.grid_size()
+        )
 
-                mode_text = "坐标获取" if self.current_mode == "coordinate" else "叠加图片"
-                self.info_label.config(text=f"坐标: ({x}, {y}), RGB: {rgb} - 模式: {mode_text}")
+        canvas_width, canvas_height = self.canvas_size
+        vertical, horizontal = self.guide_items
+        if guide_x is None:
+            self.canvas.itemconfigure(vertical, state=tk.HIDDEN)
+        else:
+            canvas_x = background_to_canvas(guide_x, self.bg_x, self.bg_scale_x)
+            self.canvas.coords(vertical, canvas_x, 0, canvas_x, canvas_height)
+            self.canvas.itemconfigure(vertical, state=tk.NORMAL)
+        if guide_y is None:
+            self.canvas.itemconfigure(horizontal, state=tk.HIDDEN)
+        else:
+            canvas_y = background_to_canvas(guide_y, self.bg_y, self.bg_scale_y)
+            self.canvas.coords(horizontal, 0, canvas_y, canvas_width, canvas_y)
+            self.canvas.itemconfigure(horizontal, state=tk.NORMAL)
+        return x, y
+
+    def end_snap(self):
+        #####拖动结束时隐藏参考线#####
+        self.snap_lines = None
+        for item in self.guide_items:
+            self.canvas.itemconfigure(item, state=tk.HIDDEN)
+
+    def index_overlay(self, image):
+        #####更新叠加图片在空间索引中的包围盒(背景坐标)#####
+        x, y = image.get_bg_coordinates()
+        width, height = image.source.size
+        self.overlay_grid.update(image, (x, y, x + width - 1, y + height - 1))
+
+    def drop_stale_point_hover(self):
+        #####坐标点被删除或重新编号后，隐藏指向已失效点id的悬停高亮#####
+        target = self.hover_target
+        if target is not None and target[0] == "point" and (
+                target[2] != self.points.generation or not self.points.contains_id(target[1])):
+            self.set_hover(None)
+
+    def nearest_point(self, x, y):
+        #####返回背景坐标(x, y)附近PICK_RADIUS画布像素内最近的坐标点id(索引随编辑逐点更新)#####
+        return self.points.nearest_id(x, y, PICK_RADIUS * max(self.bg_scale_x, self.bg_scale_y))
+
+    def topmost_overlay_at(self, x, y):
+        #####返回背景坐标(x, y)处最上层的叠加图片#####
+        candidates = self.overlay_grid.query_point(x, y)
+        if len(candidates) > 1:
+            # 只有重叠时才需要查询画布上的叠放顺序
+            z_order = self.overlay_z_order()
+            return max(candidates, key=lambda image: z_order.get(image.canvas_id, -1))
+        return next(iter(candidates), None)
+
+    def update_hover(self, position):
+        #####按鼠标所在的背景坐标更新悬停高亮#####
+        target = None
+        if position is not None:
+            if self.current_mode == "coordinate":
+                point_id = self.nearest_point(*position)
+                if point_id is not None:
+                    target = ("point", point_id, self.points.generation)
             else:
-                mode_text = "坐标获取" if self.current_mode == "coordinate" else "叠加图片"
-                self.info_label.config(text=f"坐标: (0, 0) - 模式: {mode_text}")
+                image = self.topmost_overlay_at(*position)
+                if image is not None:
+                    target = ("overlay", image)
+        if target != self.hover_target:
+            self.set_hover(target)
+
+    def set_hover(self, target):
+        #####显示或隐藏悬停高亮框，target为("point", 点id, 编号代数)、("overlay", 图片)或None#####
+        self.hover_target = target
+        if target is None:
+            self.canvas.itemconfigure(self.hover_item, state=tk.HIDDEN)
+            return
+
+        if target[0] == "point":
+            canvas_x, canvas_y = self.point_canvas_coords(*self.points.point(target[1]))
+            radius = POINT_RADIUS + 3
+            box = (canvas_x - radius, canvas_y - radius, canvas_x + radius, canvas_y + radius)
+        else:
+            box = target[1].canvas_box()
+        self.canvas.coords(self.hover_item, *box)
+        self.canvas.itemconfigure(self.hover_item, state=tk.NORMAL)
+        self.canvas.tag_raise(self.hover_item)
+
+    def on_band_start(self, event):
+        #####Shift+按下开始框选坐标点或叠加图片#####
+        if not self.background_image:
+            return
+        # 叠加图片模式下Shift+单击图片由图片自身切换选中状态
+        if self.current_mode == "overlay" and self.topmost_overlay_at(
+                canvas_to_background(event.x, self.bg_x, self.bg_scale_x),
+                canvas_to_background(event.y, self.bg_y, self.bg_scale_y)) is not None:
+            return
+        self.band_start = (event.x, event.y)
+        self.band_item = self.canvas.create_rectangle(
+            event.x, event.y, event.x, event.y, outline=HOVER_COLOR, dash=(4, 2), tags=("hover",)
+        )
+
+    def on_band_drag(self, event):
+        #####拖动时更新框选框#####
+        if self.band_start is not None:
+            self.canvas.coords(self.band_item, *self.band_start, event.x, event.y)
+
+    def on_band_end(self, event):
+        #####松开时选中框内的坐标点或叠加图片，几乎没有拖动时选中最近的坐标点#####
+        if self.band_start is None:
+            return
+        start_x, start_y = self.band_start
+        self.canvas.delete(self.band_item)
+        self.band_start = None
+        self.band_item = None
+
+        if self.current_mode == "overlay":
+            images = ()
+            if abs(event.x - start_x) >= BAND_MIN_SIZE or abs(event.y - start_y) >= BAND_MIN_SIZE:
+                images = self.overlay_grid.query_rect(
+                    canvas_to_background(start_x, self.bg_x, self.bg_scale_x),
+                    canvas_to_background(start_y, self.bg_y, self.bg_scale_y),
+                    canvas_to_background(event.x, self.bg_x, self.bg_scale_x),
+                    canvas_to_background(event.y, self.bg_y, self.bg_scale_y)
+                )
+            self.set_image_selection(images)
+            self.set_info_text(f"选中 {len(self.selected_images)} 张叠加图片")
+            return
+
+        if abs(event.x - start_x) < BAND_MIN_SIZE and abs(event.y - start_y) < BAND_MIN_SIZE:
+            point_id = self.nearest_point(
+                canvas_to_background(event.x, self.bg_x, self.bg_scale_x),
+                canvas_to_background(event.y, self.bg_y, self.bg_scale_y)
+            )
+            self.select_points([] if point_id is None else [self.points.index_of(point_id)])
+            return
+
+        indices = self.points.rows_in_rect(
+            canvas_to_background(start_x, self.bg_x, self.bg_scale_x),
+            canvas_to_background(start_y, self.bg_y, self.bg_scale_y),
+            canvas_to_background(event.x, self.bg_x, self.bg_scale_x),
+            canvas_to_background(event.y, self.bg_y, self.bg_scale_y)
+        )
+        self.select_points(indices)
+
+    def select_points(self, indices):
+        #####在坐标点列表中选中一组坐标点(连续的行合并为一次调用)#####
+        indices = sorted(indices)
+        self.coord_list.selection_clear(0, tk.END)
+        for first, last in iter_index_runs(indices):
+            self.coord_list.selection_set(first, last)
+        if len(indices) == 1:
+            self.coord_list.see(indices[0])
+            x, y = self.points[indices[0]]
+            self.set_info_text(f"选中坐标: ({x}, {y})")
+        elif indices:
+            self.coord_list.see(indices[0])
+            self.set_info_text(f"选中 {len(indices)} 个坐标点")
+
+    def set_info_text(self, text):
+        #####直接设置状态栏文本，并丢弃尚未刷新的鼠标位置信息#####
+        if self.status_update_job is not None:
+            self.root.after_cancel(self.status_update_job)
+            self.status_update_job = None
+        self.pending_status_key = None
+        self.last_status_key = None
+        self.info_label.config(text=text)
+
+    def motion_event_stats(self):
+        #####返回鼠标移动事件的处理统计(总数与丢弃数)#####
+        return {
+            "total": self.motion_events_total,
+            "dropped": self.motion_events_dropped,
+        }
+
+    def sample_color(self, x, y):
+        #####按当前取色范围读取原图颜色#####
+        radius = int(self.sample_size_var.get().split("x")[0]) // 2
+        return self.pixel_sampler.sample(x, y, radius)
 
     def clear_points(self):
         #####清除所有点#####
-        self.points = []
-        self.coord_list.delete(0, tk.END)
-        self.canvas.delete("point")
-        self.canvas.delete("point_text")
+        if self.points:
+            self.history.push(DeletePoints(0, self.points, self.points.labels_by_index()))
+        self.points.clear()
+        self.drop_stale_point_hover()
+        self.coord_list.reset()
+        self.delete_all_point_items()
 
     def remove_selected_point(self):
         #####删除选中的坐标点#####
         selection = self.coord_list.curselection()
-        if selection:
+        if len(selection) > 1:
+            # 多选时一次性删除，并记录为一条历史
+            indices = [index for index in selection if index < len(self.points)]
+            labels = self.points.labels_by_index()
+            self.history.push(DeletePointIndices(
+                indices, [self.points[index] for index in indices],
+                {offset: labels[index] for offset, index in enumerate(indices) if index in labels}
+            ))
+            self.delete_point_indices(indices)
+        elif selection:
             index = selection[0]
-            self.coord_list.delete(index)
             if index < len(self.points):
+                self.history.push(DeletePoints(
+                    index, [self.points[index]], self.points.labels_by_index(index, index + 1)
+                ))
                 del self.points[index]
-            # 重新绘制所有点
-            self.canvas.delete("point")
-            self.canvas.delete("point_text")
-            self.redraw_points()
+                self.drop_stale_point_hover()
+                self.coord_list.rows_deleted(index)
+            # 只删除该点的画布元素
+            self.delete_point_items(index)
+
+    def undo(self, event=None):
+        #####撤销最近的操作#####
+        if any(img.is_dragging for img in self.draggable_images):
+            return
+        if self.pending_restore is not None:
+            self.set_info_text("正在重新读取叠加图片，请稍候再撤销")
+            return
+        command = self.history.undo(self)
+        if self.pending_restore is not None:
+            self.pending_restore["command"] = command
+        self.set_info_text(f"已撤销: {command.label}" if command else "没有可撤销的操作")
+
+    def redo(self, event=None):
+        #####重做最近撤销的操作#####
+        if any(img.is_dragging for img in self.draggable_images):
+            return
+        if self.pending_restore is not None:
+            self.set_info_text("正在重新读取叠加图片，请稍候再重做")
+            return
+        command = self.history.redo(self)
+        if self.pending_restore is not None:
+            self.pending_restore["command"] = command
+        self.set_info_text(f"已重做: {command.label}" if command else "没有可重做的操作")
+
+    def find_overlay(self, uid):
+        #####按项目id查找叠加图片#####
+        return self.overlays_by_uid.get(uid)
+
+    def overlay_z_order(self):
+        #####叠加图片在画布上从下到上的序号: Canvas ID -> 序号#####
+        return {item: z for z, item in enumerate(self.canvas.find_withtag("draggable"))}
+
+    def overlay_records(self, images):
+        #####生成叠加图片的历史记录(id, 路径, 名称, x, y, 锁定, 列表行号, 图层序号)#####
+        z_order = self.overlay_z_order()
+        return [
+            (img.uid, img.source_path, img.name, img.bg_coord_x, img.bg_coord_y, img.is_locked,
+             img.list_index, z_order.get(img.canvas_id, 0))
+            for img in images
+        ]
+
+    def record_added_overlays(self, images):
+        #####把一次加载的所有叠加图片记录为一条历史#####
+        if images:
+            self.history.push(AddOverlays(self.overlay_records(images.values())))
+
+    def rebuild_image_list(self):
+        #####按draggable_images的顺序重建叠加图片列表#####
+        self.reindex_images()
+        self.image_listbox.reset()
+        self.set_image_selection(())
+
+    def move_overlays(self, moves):
+        #####历史记录: 批量移动叠加图片[(id, x, y)]#####
+        found = ((self.find_overlay(uid), x, y) for uid, x, y in moves)
+        self.move_images([(image, x, y) for image, x, y in found if image is not None])
+
+    def set_overlay_property(self, uid, name, value):
+        #####历史记录: 修改叠加图片的名称或锁定状态#####
+        image = self.find_overlay(uid)
+        if image is None:
+            return
+        if name == "locked":
+            image.set_locked(value)
+            if image.list_index == self.selected_image_index:
+                self.update_lock_button(image)
+        else:
+            image.name = value
+            self.update_image_list_item(image)
+
+    def remove_overlays(self, uids):
+        #####历史记录: 删除叠加图片#####
+        uids = set(uids)
+        for image in [img for img in self.draggable_images if img.uid in uids]:
+            self.delete_overlay(image)
+        if self.current_mode == "overlay":
+            self.update_coord_list_from_images()
+
+    def restore_overlays(self, records):
+        #####历史记录: 按源文件重新读取叠加图片，并恢复id、列表位置、图层顺序和锁定状态#####
+        entries = [(record[1], record[2], (record[3], record[4])) for record in records]
+        # 读取是异步的，完成前阻止其他撤销/重做，避免后续记录引用尚未恢复的图片id
+        pending = self.pending_restore = {"command": None}
+
+        def on_loaded(images):
+            if self.pending_restore is pending:
+                self.pending_restore = None
+
+            # 有文件读取失败时撤回已加载的图片并把记录放回历史，失败原因由load_overlay_files统一提示
+            if len(images) < len(records):
+                for image in images.values():
+                    self.delete_overlay(image)
+                if pending["command"] is not None:
+                    self.history.revert(pending["command"])
+                self.set_info_text(f"{len(records) - len(images)} 张叠加图片无法读取，操作未执行")
+                return
+
+            # 按原来的行号从小到大插回列表
+            for index in sorted(images, key=lambda i: records[i][6]):
+                uid, _, _, _, _, locked, list_index, _ = records[index]
+                image = images[index]
+                del self.overlays_by_uid[image.uid]
+                image.uid = uid
+                self.overlays_by_uid[uid] = image
+                image.set_locked(locked)
+                self.draggable_images.remove(image)
+                self.draggable_images.insert(min(list_index, len(self.draggable_images)), image)
+            self.rebuild_image_list()
+
+            # 新图片位于最上层，按原来的图层序号从小到大依次放回
+            for index in sorted(images, key=lambda i: records[i][7]):
+                stacked = self.canvas.find_withtag("draggable")
+                z = records[index][7]
+                if z < len(stacked) and stacked[z] != images[index].canvas_id:
+                    self.canvas.tag_lower(images[index].canvas_id, stacked[z])
+
+        self.load_overlay_files(entries, on_loaded=on_loaded)
+
+    def insert_points(self, index, points, labels=None):
+        #####历史记录: 在index处插入坐标点，labels为{在points中的序号: 名称}#####
+        if index >= len(self.points):
+            self.add_points(points, labels)
+            return
+        self.points.insert(index, points, labels)
+        self.coord_list.rows_inserted(index, len(points))
+        if self.current_mode == "coordinate":
+            labels = labels or {}
+            self.point_items[index:index] = [self.create_point_items(x, y, labels.get(offset, ""))
+                                             for offset, (x, y) in enumerate(points)]
+            self.layers.restack()
+
+    def delete_points(self, index, count):
+        #####历史记录: 删除从index开始的count个坐标点#####
+        if index == 0 and count >= len(self.points):
+            self.points.clear()
+            self.drop_stale_point_hover()
+            self.coord_list.reset()
+            self.delete_all_point_items()
+            return
+        del self.points[index:index + count]
+        self.drop_stale_point_hover()
+        self.coord_list.rows_deleted(index, index + count - 1)
+        items = self.point_items[index:index + count]
+        del self.point_items[index:index + count]
+        for item_ids in items:
+            self.canvas.delete(*item_ids)
+
+    def delete_point_indices(self, indices):
+        #####历史记录: 一次性删除多个(不一定连续的)坐标点#####
+        removed = set(indices)
+        self.points.delete_indices(removed)
+        self.drop_stale_point_hover()
+        for first, last in reversed(list(iter_index_runs(sorted(removed)))):
+            self.coord_list.rows_deleted(first, last)
+        if self.point_items:
+            self.canvas.delete(*(item for index in removed if index < len(self.point_items)
+                                 for item in self.point_items[index]))
+            self.point_items = [items for index, items in enumerate(self.point_items) if index not in removed]
+
+    def insert_point_indices(self, indices, points, labels=None):
+        #####历史记录: 把坐标点放回删除前的行号(indices为升序的最终行号)，labels为{在points中的序号: 名称}#####
+        self.points.insert_indices(indices, points, labels)
+        self.coord_list.reset()
+        self.redraw_points()
+
+    def set_point(self, index, x, y):
+        #####修改一个坐标点并只更新该行与该点的画布元素#####
+        if index >= len(self.points):
+            return
+        self.points[index] = (x, y)
+        self.coord_list.rows_changed(index)
+        self.move_point_items(index, x, y)
+        if self.hover_target is not None and self.hover_target[:2] == ("point", self.points.id_at(index)):
+            self.set_hover(self.hover_target)
+
+    def set_point_label(self, index, label):
+        #####修改一个坐标点的名称并只更新该行与该点的文本#####
+        if index >= len(self.points):
+            return
+        self.points.set_label(index, label)
+        self.coord_list.rows_changed(index)
+        if index < len(self.point_items):
+            x, y = self.points[index]
+            self.canvas.itemconfigure(self.point_items[index][1], text=self.point_text(x, y, label))
+
+    def build_layout(self):
+        #####把当前背景、坐标点和叠加图片导出为与界面无关的布局模型#####
+        overlays = [
+            OverlayItem(
+                img.name, img.bg_coord_x, img.bg_coord_y,
+                img.source.width, img.source.height, img.source_path
+            )
+            for img in self.draggable_images
+        ]
+        name = os.path.splitext(os.path.basename(self.background_path))[0] if self.background_path else None
+        return Layout(
+            self.background_image.width, self.background_image.height,
+            self.points, overlays, self.background_path, name
+        )
+
+    def export_renpy_screen(self):
+        #####把当前布局导出为Ren'Py的screen代码#####
+        if not self.background_image:
+            messagebox.showinfo("提示", "没有数据可导出")
+            return
+
+        image_prefix = simpledialog.askstring(" ", "请输入图片路径前缀:", initialvalue=self.renpy_image_prefix)
+        if image_prefix is None:
+            return
+        self.renpy_image_prefix = image_prefix
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".rpy",
+            filetypes=[("Ren'Py脚本", "*.rpy")]
+        )
+        if file_path:
+            try:
+                from renpy_export import RenpyExportOptions, write_screens
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    write_screens([self.build_layout()], f, RenpyExportOptions(image_prefix=image_prefix))
+                messagebox.showinfo("成功", f"screen代码已保存到: {file_path}")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出时出错: {str(e)}")
+
+    def import_renpy_screen(self):
+        #####从Ren'Py项目中选择一个screen，把其中的图片按实际位置加载为叠加图片#####
+        if not self.background_image:
+            messagebox.showwarning("警告", "请先加载背景图片")
+            return
+
+        project_dir = filedialog.askdirectory(title="选择Ren'Py项目目录")
+        if not project_dir:
+            return
+
+        # 后台线程扫描项目(只解析修改过的文件)，界面线程通过after()取回进度
+        from renpy_import import RenpyScreenIndex
+        index = RenpyScreenIndex(project_dir)
+        result_queue = queue.Queue()
+
+        def scan():
+            try:
+                index.refresh(lambda done, total: result_queue.put(("progress", done, total)))
+                result_queue.put(("done", None, None))
+            except Exception as e:
+                result_queue.put(("error", str(e), None))
+
+        # 创建选择对话框
+        dialog = tk.Toplevel(self.root)
+        dialog.title("导入Ren'Py screen")
+        self.center_window(dialog, 360, 420)
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        status_var = tk.StringVar(value="正在扫描项目...")
+        ttk.Label(dialog, textvariable=status_var).grid(row=0, column=0, columnspan=2, padx=10, pady=(10, 5), sticky=tk.W)
+
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(dialog, textvariable=search_var, state=tk.DISABLED)
+        search_entry.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky=tk.W + tk.E)
+
+        screen_listbox = tk.Listbox(dialog, activestyle="none")
+        screen_listbox.grid(row=2, column=0, padx=(10, 0), pady=5, sticky=tk.NSEW)
+        scrollbar = ttk.Scrollbar(dialog, orient=tk.VERTICAL, command=screen_listbox.yview)
+        scrollbar.grid(row=2, column=1, padx=(0, 10), pady=5, sticky=tk.N + tk.S)
+        screen_listbox.config(yscrollcommand=scrollbar.set)
+
+        def update_results(*_):
+            # 列表框只显示前RENPY_SEARCH_LIMIT个匹配项，避免上千个screen拖慢对话框
+            names = index.search(search_var.get(), RENPY_SEARCH_LIMIT + 1)
+            screen_listbox.delete(0, tk.END)
+            screen_listbox.insert(tk.END, *names[:RENPY_SEARCH_LIMIT])
+            if names:
+                screen_listbox.selection_set(0)
+            total = len(index.sorted_names)
+            if len(names) > RENPY_SEARCH_LIMIT:
+                status_var.set(f"共 {total} 个screen，仅显示前 {RENPY_SEARCH_LIMIT} 个匹配项")
+            else:
+                status_var.set(f"共 {total} 个screen，匹配 {len(names)} 个")
+
+        def confirm(*_):
+            selection = screen_listbox.curselection()
+            if not selection:
+                return
+            name = screen_listbox.get(selection[0])
+            try:
+                layout, unresolved = index.load_screen(name, *self.background_image.size, self.background_path)
+            except Exception as e:
+                messagebox.showerror("错误", f"读取screen时出错: {str(e)}")
+                return
+            dialog.destroy()
+
+            # renpy_export写出的坐标点注释只在坐标获取模式下导入(叠加图片模式下坐标列表显示的是叠加图片的位置)
+            points = layout.points if self.current_mode == "coordinate" else []
+            skipped_points = len(layout.points) - len(points)
+            if not layout.overlays and not unresolved and not points:
+                if skipped_points:
+                    messagebox.showwarning("警告", f"screen {name} 中的 {skipped_points} 个坐标点请在坐标获取模式下导入")
+                else:
+                    messagebox.showinfo("提示", f"screen {name} 中没有可导入的图片")
+                return
+
+            def on_loaded(images):
+                # 坐标点与叠加图片记录为一条历史，一次撤销即可还原整个导入
+                commands = []
+                if points and self.current_mode == "coordinate":
+                    commands.append(InsertPoints(len(self.points), points))
+                    self.add_points(points)
+                if images:
+                    commands.append(AddOverlays(self.overlay_records(images.values())))
+                if commands:
+                    self.history.push(commands[0] if len(commands) == 1 else CommandGroup(commands))
+                if skipped_points:
+                    self.set_info_text(f"叠加图片模式下不导入坐标点，已跳过 {skipped_points} 个")
+
+            entries = [(overlay.path, overlay.name, (overlay.x, overlay.y)) for overlay in layout.overlays]
+            self.load_overlay_files(entries, [(reference, "未找到图片文件") for reference in unresolved], on_loaded)
+
+        def poll():
+            if not dialog.winfo_exists():
+                return
+            state = None
+            while True:
+                try:
+                    kind, payload, total = result_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    status_var.set(f"正在扫描项目... {payload}/{total}")
+                else:
+                    state = (kind, payload)
+
+            if state is None:
+                self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+            elif state[0] == "error":
+                dialog.destroy()
+                messagebox.showerror("错误", f"扫描项目时出错: {state[1]}")
+            else:
+                search_entry.config(state=tk.NORMAL)
+                search_entry.focus_set()
+                search_var.trace_add("write", update_results)
+                update_results()
+
+        screen_listbox.bind("<Double-Button-1>", confirm)
+        search_entry.bind("<Return>", confirm)
+
+        button_row = ttk.Frame(dialog)
+        button_row.grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Button(button_row, text="导入", command=confirm).grid(row=0, column=0, padx=5)
+        ttk.Button(button_row, text="取消", command=dialog.destroy).grid(row=0, column=1, padx=5)
+
+        # 配置权重
+        dialog.columnconfigure(0, weight=1)
+        dialog.rowconfigure(2, weight=1)
+
+        threading.Thread(target=scan, daemon=True).start()
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
 
     def save_data(self):
         #####保存所有数据(坐标点和叠加图片位置)#####
@@ -1047,21 +2981,7 @@ class ImageCoordinatePicker:
         if file_path:
             try:
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    # 保存背景图片信息
-                    f.write(f"背景图片尺寸: {self.background_image.width} x {self.background_image.height}\n")
-                    f.write("\n")
-
-                    # 保存坐标点
-                    f.write("坐标点(包含叠加图片位置):\n")
-                    for point in self.points:
-                        f.write(f"({point[0]}, {point[1]})\n")
-                    f.write("\n")
-
-                    # 保存叠加图片位置
-                    f.write("叠加图片位置(左上角基准点):\n")
-                    for img in self.draggable_images:
-                        bg_x, bg_y = img.get_bg_coordinates()
-                        f.write(f"{img.name}: ({bg_x}, {bg_y})\n")
+                    write_layout_text(self.build_layout(), f)
 
                 messagebox.showinfo("成功", f"数据已保存到: {file_path}")
             except Exception as e:
@@ -1081,15 +3001,423 @@ class ImageCoordinatePicker:
                 n2(200,400)
                 """
 
-    def on_resize(self, event):
-        #####窗口大小改变时重新显示图片#####
+    def build_project_state(self):
+        #####收集当前的项目状态(只做浅拷贝，比较、序列化与写盘都在后台线程进行)#####
+        state = ProjectState()
+        state.background_path = self.background_path
+        state.width, state.height = self.background_image.size
+        z_order = self.overlay_z_order()
+        for img in self.draggable_images:
+            state.overlays[img.uid] = {
+                "path": img.source_path, "name": img.name, "x": img.bg_coord_x, "y": img.bg_coord_y,
+                "locked": img.is_locked, "z": z_order.get(img.canvas_id, 0)
+            }
+            state.order.append(img.uid)
+        # 未能加载的叠加图片按原来的记录写回
+        for uid, record in self.unloaded_overlays.items():
+            state.overlays[uid] = dict(record)
+            state.order.append(uid)
+        # 界面线程只整块复制原始数组，按行整理与名称换算由自动保存线程完成
+        state.points = self.points.raw_arrays()
+        state.mode = self.current_mode
+        return state
+
+    def autosave_token(self):
+        #####项目状态的变化标记: 历史版本、坐标点的分配与数量、模式和叠加图片的图层顺序#####
+        return (
+            self.project_path, self.background_path, self.current_mode, self.history.version,
+            self.points.generation, len(self.points), len(self.unloaded_overlays),
+            self.canvas.find_withtag("draggable")
+        )
+
+    def autosave_tick(self):
+        #####定时把当前状态交给后台线程保存，界面线程不等待写盘，状态没有变化时跳过#####
         if self.background_image:
-            if self.current_mode == "overlay":
-                self.display_background_image()
-                self.bring_images_to_top()
+            token = self.autosave_token()
+            if token != self.autosave_saved_token:
+                self.autosave.submit(self.project_path or self.recovery_path, self.build_project_state())
+                self.autosave_saved_token = token
+
+        # 同一个保存错误只提示一次
+        error = self.autosave.error
+        if error and error != self.autosave_error:
+            self.set_info_text(f"自动保存失败: {error}")
+        self.autosave_error = error
+        # 保存失败时下次即使没有变化也重新提交
+        if error:
+            self.autosave_saved_token = None
+        self.root.after(AUTOSAVE_INTERVAL_MS, self.autosave_tick)
+
+    def save_project(self):
+        #####保存为项目文件，之后的自动保存都写入该文件#####
+        if not self.background_image:
+            messagebox.showinfo("提示", "没有数据可保存")
+            return
+
+        file_path = self.project_path
+        if not file_path:
+            file_path = filedialog.asksaveasfilename(
+                defaultextension=PROJECT_EXTENSION,
+                filetypes=[("项目文件", "*" + PROJECT_EXTENSION)]
+            )
+            if not file_path:
                 return
+            # 已存在的文件先完整覆盖一次
+            self.autosave.forget(file_path)
+            self.project_path = file_path
+
+        self.autosave.submit(file_path, self.build_project_state())
+        self.autosave_saved_token = self.autosave_token()
+
+        def poll():
+            if not self.autosave.is_idle():
+                self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+            elif self.autosave.error:
+                messagebox.showerror("错误", f"保存项目时出错: {self.autosave.error}")
+            else:
+                self.remember_last_project(file_path)
+                self.set_info_text(f"项目已保存到: {file_path}")
 
-            self.display_background_image()
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+
+    def open_project(self):
+        #####打开项目文件，恢复背景、坐标点以及叠加图片的位置、锁定状态和图层顺序#####
+        file_path = filedialog.askopenfilename(
+            title="选择项目文件",
+            filetypes=[("项目文件", "*" + PROJECT_EXTENSION)]
+        )
+        if file_path:
+            self.open_project_file(file_path)
+
+    def open_project_file(self, file_path, recovered=False):
+        #####打开一个项目文件，recovered为True表示打开的是上次遗留的自动保存，返回是否成功#####
+        try:
+            state = read_project(file_path)
+            if not state.background_path:
+                raise ValueError("项目中没有背景图片")
+            self.open_background_file(state.background_path)
+        except Exception as e:
+            messagebox.showerror("错误", f"无法打开项目: {str(e)}")
+            return False
+        self.restore_project(file_path, state, background_changed(state), recovered)
+        return True
+
+    def recover_autosave(self):
+        #####打开最近一份尚未恢复的自动保存#####
+        files = leftover_recovery_files(default_cache_dir())
+        if not files:
+            messagebox.showinfo("提示", "没有可恢复的自动保存")
+            return
+        self.open_project_file(files[0], recovered=True)
+
+    def offer_recovery(self):
+        #####启动时发现上次遗留的自动保存则询问是否恢复，返回是否开始恢复#####
+        files = leftover_recovery_files(default_cache_dir())
+        if not files:
+            return False
+        answer = messagebox.askyesnocancel(
+            "恢复自动保存",
+            f"发现 {len(files)} 份上次未保存为项目的自动保存。\n\n"
+            "是: 打开最近的一份\n否: 删除这些自动保存\n取消: 保留，之后可用“恢复自动保存”打开"
+        )
+        if answer:
+            return self.open_project_file(files[0], recovered=True)
+        if answer is False:
+            for path in files:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return False
+
+    def open_last_project(self):
+        #####启动后在后台线程读取上次的项目与背景图片，完成后在界面线程恢复#####
+        try:
+            with open(self.last_project_record, 'r', encoding='utf-8') as f:
+                file_path = f.read().strip()
+        except OSError:
+            return
+        if not file_path or not os.path.exists(file_path):
+            return
+
+        # 后台线程读取项目、解码背景并校验背景是否被修改，界面线程通过after()取回结果
+        result_queue = queue.Queue()
+
+        def work():
+            try:
+                state = read_project(file_path)
+                if not state.background_path:
+                    raise ValueError("项目中没有背景图片")
+                image = load_image_file(state.background_path)
+                result_queue.put((state, image, background_changed(state), None))
+            except Exception as e:
+                result_queue.put((None, None, False, e))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.set_info_text(f"正在打开上次的项目: {file_path}")
+
+        def poll():
+            try:
+                state, image, changed, error = result_queue.get_nowait()
+            except queue.Empty:
+                self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+                return
+            # 读取期间已经打开了其他背景或项目时放弃
+            if self.background_image is not None:
+                return
+            if error is not None:
+                self.set_info_text(f"无法打开上次的项目: {error}")
+                return
+            try:
+                self.open_background_file(state.background_path, image)
+            except Exception as e:
+                self.set_info_text(f"无法打开上次的项目: {e}")
+                return
+            self.restore_project(file_path, state, changed)
+            self.set_info_text(f"已打开上次的项目: {file_path}")
+
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+
+    def remember_last_project(self, file_path):
+        #####记录最近打开或保存的项目，下次启动时自动打开#####
+        try:
+            os.makedirs(os.path.dirname(self.last_project_record), exist_ok=True)
+            with open(self.last_project_record, 'w', encoding='utf-8') as f:
+                f.write(file_path)
+        except OSError:
+            pass
+
+    def restore_project(self, file_path, state, changed, recovered=False):
+        #####背景图片打开后恢复项目中的坐标点以及叠加图片的位置、锁定状态和图层顺序#####
+        # recovered为True时恢复的是遗留的自动保存: 之后仍写入本次的恢复文件，恢复的内容写出后删除遗留文件
+        # 叠加图片加载完成前自动保存仍写入恢复文件，避免不完整的状态覆盖项目
+        self.project_path = None
+        if changed:
+            messagebox.showwarning("警告", "背景图片在保存项目后已被修改，坐标可能需要重新确认")
+
+        # 叠加图片模式下的坐标点就是叠加图片的位置，切换模式时会重新生成
+        if state.mode == "coordinate":
+            self.add_points(state.points, state.point_labels)
+
+        records = []
+        failures = []
+        unloaded = []
+        for key in state.order:
+            record = state.overlays[key]
+            if record.get("path"):
+                records.append(record)
+            else:
+                failures.append((record.get("name", ""), "没有源文件路径"))
+                unloaded.append(record)
+        entries = [(record["path"], record.get("name"), (record.get("x", 0), record.get("y", 0))) for record in records]
+
+        def on_loaded(images):
+            # 按保存时的顺序重建列表，加载期间另外添加的图片排在后面
+            restored = [images[index] for index in sorted(images)]
+            others = [img for img in self.draggable_images if img not in restored]
+            self.draggable_images = restored + others
+            self.rebuild_image_list()
+
+            # 按保存时的图层顺序从下到上依次置顶，并恢复锁定状态
+            for index in sorted(images, key=lambda i: records[i].get("z", 0)):
+                self.canvas.tag_raise(images[index].canvas_id, "draggable")
+            for index, img in images.items():
+                img.set_locked(bool(records[index].get("locked")))
+
+            # 未能加载的图片保留原来的记录，之后的自动保存不会把它们从项目中删除
+            unloaded.extend(record for index, record in enumerate(records) if index not in images)
+            self.unloaded_overlays = {next(overlay_ids): record for record in unloaded}
+            if unloaded:
+                self.set_info_text(f"{len(unloaded)} 张叠加图片未能加载，项目中仍保留它们的记录")
+
+            if state.mode == "overlay" and self.current_mode != "overlay":
+                self.toggle_mode()
+
+            if recovered:
+                self.adopt_recovered_file(file_path)
+                return
+
+            # 之后的自动保存写入项目文件(先完整覆盖一次，图片id已经变化)
+            self.autosave.forget(file_path)
+            self.project_path = file_path
+            self.remember_last_project(file_path)
+
+        self.load_overlay_files(entries, failures, on_loaded)
+
+    def adopt_recovered_file(self, file_path):
+        #####把恢复的内容写入本次的恢复文件，写出成功后删除遗留的自动保存#####
+        self.autosave.forget(self.recovery_path)
+        self.autosave.submit(self.recovery_path, self.build_project_state())
+        self.autosave_saved_token = self.autosave_token()
+
+        def poll():
+            if not self.autosave.is_idle():
+                self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+                return
+            if self.autosave.error:
+                self.set_info_text(f"自动保存失败，已保留 {file_path}: {self.autosave.error}")
+                return
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+            self.set_info_text("已恢复上次的自动保存")
+
+        self.root.after(IMPORT_POLL_INTERVAL_MS, poll)
+
+    def toggle_profiling(self, event=None):
+        #####开关性能监视: 统计Tk调用、记录输入到画面刷新的延迟并显示帧时间面板#####
+        if PROFILER.enabled:
+            PROFILER.enabled = False
+            PROFILER.frame_scheduler = None
+            for widget in self.profiled_widgets:
+                widget.tk = widget.tk.tkapp
+            self.profiled_widgets = ()
+            # 恢复all标签上原有的绑定
+            for sequence, previous, func_id in self.profile_bindings:
+                self.root.tk.call("bind", "all", sequence, previous)
+                self.root.deletecommand(func_id)
+            self.profile_bindings = []
+            if self.profile_panel_job is not None:
+                self.root.after_cancel(self.profile_panel_job)
+                self.profile_panel_job = None
+            for item in self.profile_panel_items:
+                self.canvas.itemconfig(item, state=tk.HIDDEN)
+            self.set_info_text("性能监视已关闭")
+            return
+
+        PROFILER.reset()
+        # 替换常用控件的tk属性以统计经过它们的Tk命令(其余控件的命令不计入)
+        self.profiled_widgets = (self.root, self.canvas, self.image_listbox.canvas, self.coord_list.canvas)
+        for widget, label in zip(self.profiled_widgets, ("root", "canvas", "image_list", "coord_list")):
+            widget.tk = TkCallProxy(widget.tk, label)
+
+        def on_input(event):
+            PROFILER.mark_input()
+
+        self.profile_bindings = [(sequence, self.root.bind_all(sequence), self.root.bind_all(sequence, on_input, add="+"))
+                                 for sequence in PROFILE_INPUT_EVENTS]
+        # 绘制类调用结束后在下一次空闲(Tk完成重绘)时记录一帧
+        PROFILER.frame_scheduler = lambda: self.root.after_idle(PROFILER.mark_frame)
+        PROFILER.enabled = True
+        for item in self.profile_panel_items:
+            self.canvas.itemconfig(item, state=tk.NORMAL)
+        self.layers.restack()
+        self.refresh_profile_panel()
+        self.set_info_text("性能监视已开启 (F12关闭，Ctrl+F12导出trace)")
+
+    def refresh_profile_panel(self):
+        #####刷新性能监视面板: 最近的帧时间、输入延迟、每帧Tk调用与耗时最多的调用#####
+        summary = PROFILER.frame_summary()
+        if summary is None:
+            lines = ["帧时间: 暂无(操作界面后开始统计)"]
+        else:
+            avg_interval, max_interval, avg_latency, max_latency, tk_calls = summary
+            lines = [
+                f"帧间隔: 平均 {avg_interval * 1000:.1f} ms  最大 {max_interval * 1000:.1f} ms",
+                f"输入延迟: 平均 {avg_latency * 1000:.1f} ms  最大 {max_latency * 1000:.1f} ms",
+                f"Tk调用: 每帧 {tk_calls:.0f} 次",
+            ]
+        offenders = PROFILER.take_offenders(PROFILE_TOP_COUNT)
+        if offenders:
+            lines.append(f"最近 {PROFILE_PANEL_INTERVAL_MS} ms 耗时最多:")
+            lines.extend(f"  {duration * 1000:7.1f} ms  {name}" for name, duration in offenders)
+
+        rectangle, text = self.profile_panel_items
+        self.canvas.itemconfig(text, text="\n".join(lines))
+        x1, y1, x2, y2 = self.canvas.bbox(text)
+        self.canvas.coords(rectangle, x1 - 4, y1 - 4, x2 + 4, y2 + 4)
+        self.profile_panel_job = self.root.after(PROFILE_PANEL_INTERVAL_MS, self.refresh_profile_panel)
+
+    def dump_profile_trace(self, event=None):
+        #####把性能记录导出为Chrome trace文件(chrome://tracing或Perfetto打开)#####
+        if not PROFILER.events and not PROFILER.frames:
+            messagebox.showinfo("提示", "没有性能记录，请先按F12开启性能监视")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")]
+        )
+        if file_path:
+            try:
+                PROFILER.dump_chrome_trace(file_path)
+                self.set_info_text(f"性能记录已保存到: {file_path}")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出时出错: {str(e)}")
+
+    def on_first_expose(self, event):
+        #####画布第一次需要绘制: 在这次重绘之后的空闲时记录启动耗时#####
+        self.canvas.unbind("<Expose>")
+        self.root.after_idle(self.on_first_frame)
+
+    def on_first_frame(self):
+        #####显示第一帧后报告启动耗时，再开始推迟的启动工作#####
+        self.startup_time = time.perf_counter() - STARTUP_STARTED
+        if self.exit_after_first_frame:
+            # 打包为窗口程序(pythonw)时没有标准输出
+            if sys.stdout is not None:
+                print(f"first_frame_ms {self.startup_time * 1000:.1f}", flush=True)
+            self.on_close()
+            return
+        self.set_info_text(f"坐标: (0, 0) - 模式: 坐标获取 - 启动耗时 {self.startup_time * 1000:.0f} ms")
+        # 后台预先导入PIL，第一次打开图片时不必等待
+        threading.Thread(target=load_imaging, daemon=True).start()
+        # 有上次遗留的自动保存时先询问是否恢复，不恢复时再打开上次的项目
+        if not self.offer_recovery():
+            self.open_last_project()
+
+    def on_close(self):
+        #####关闭窗口前写出最后的状态#####
+        if self.background_image:
+            self.autosave.submit(self.project_path or self.recovery_path, self.build_project_state())
+        self.autosave.stop()
+        if disk_image_cache is not None:
+            disk_image_cache.save_index()
+        self.root.destroy()
+
+    def on_resize(self, event):
+        #####窗口大小改变时调度重绘(合并连续事件)#####
+        # 子控件的<Configure>事件也会传递到根窗口，只处理根窗口自身的事件
+        if event.widget is not self.root or not self.background_image:
+            return
+
+        # 缩放过程中按帧间隔显示低质量预览
+        if self.resize_preview_job is None:
+            self.resize_preview_job = self.root.after(RESIZE_PREVIEW_INTERVAL_MS, self.render_resize_preview)
+
+        # 尺寸稳定后执行一次高质量渲染
+        self.schedule_final_render()
+
+    def schedule_final_render(self):
+        #####推迟高质量渲染，直到窗口尺寸或缩放倍率稳定#####
+        if self.resize_settle_job is not None:
+            self.root.after_cancel(self.resize_settle_job)
+        self.resize_settle_job = self.root.after(RESIZE_SETTLE_DELAY_MS, self.render_resize_final)
+
+    def current_canvas_size(self):
+        #####获取画布当前尺寸#####
+        return self.canvas.winfo_width(), self.canvas.winfo_height()
+
+    def render_resize_preview(self):
+        #####缩放过程中的快速预览渲染#####
+        self.resize_preview_job = None
+        if not self.background_image or self.current_canvas_size() == self.rendered_canvas_size:
+            return
+        self.display_background_image(RESIZE_PREVIEW_FILTER)
+
+    def render_resize_final(self):
+        #####尺寸稳定后的高质量渲染#####
+        self.resize_settle_job = None
+        if self.resize_preview_job is not None:
+            self.root.after_cancel(self.resize_preview_job)
+            self.resize_preview_job = None
+        if not self.background_image:
+            return
+        if (self.current_canvas_size() == self.rendered_canvas_size and
+                self.rendered_resample == RESAMPLE_LANCZOS):
+            return
+        self.display_background_image()
 
 
 if __name__ == "__main__":
@@ -1099,4 +3427,8 @@ if __name__ == "__main__":
     # 绑定窗口大小改变事件
     root.bind("<Configure>", app.on_resize)
 
+    # --startup-time: 显示第一帧后输出启动耗时(毫秒)并退出，供基准测试使用
+    if "--startup-time" in sys.argv[1:]:
+        app.exit_after_first_frame = True
+
     root.mainloop()
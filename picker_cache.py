@@ -0,0 +1,268 @@
+# @title   : picker_cache.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Content-addressed on-disk cache of scaled overlay images shared across sessions.
+# @License : MIT License
+#
+# 叠加图片缩放结果的磁盘缓存，下次启动或重新打开项目时不需要再解码和缩放:
+#     <缓存目录>/scaled/index.json              源文件指纹与各条目的最近使用时间
+#     <缓存目录>/scaled/<前两位>/<key>.raw      16字节文件头(魔数、模式、宽、高) + 原始像素，可直接内存映射
+# 条目按源文件内容的SHA-1、目标尺寸与重采样滤镜寻址，内容相同的文件(复制、改名)共享条目。
+# 源文件按(修改时间, 大小)校验，未变化时不重新计算哈希也不需要解码原图。
+# 总大小超过上限时按最近使用时间淘汰。缓存只是加速手段，读写失败时当作未命中处理。
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from picker_core import default_cache_dir
+from picker_project import file_sha1
+
+# 缓存目录下存放缩放结果的子目录
+CACHE_DIR_NAME = "scaled"
+# 索引文件格式版本，格式变化时递增以丢弃旧索引
+CACHE_INDEX_VERSION = 1
+# 磁盘缓存的大小上限(字节)
+DISK_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 条目文件头: 魔数、模式(ASCII，不足4字节补0)、宽、高
+ENTRY_MAGIC = b"ICPC"
+ENTRY_HEADER = struct.Struct("<4s4sII")
+# 可以存储的像素模式及每像素字节数
+MODE_BANDS = {"L": 1, "LA": 2, "RGB": 3, "RGBA": 4}
+
+
+def entry_key(digest, size, resample):
+    #####由源文件内容哈希、目标尺寸与重采样滤镜生成条目的key#####
+    width, height = size
+    return hashlib.sha1(f"{digest}:{width}x{height}:{int(resample)}".encode("ascii")).hexdigest()
+
+
+class CachedPixels:
+    #####一个条目的内存映射，with结束或close后解除映射#####
+    def __init__(self, file, mapped, mode, size):
+        self.file = file
+        self.mapped = mapped
+        self.mode = mode
+        self.size = size
+        self.data = memoryview(mapped)[ENTRY_HEADER.size:]
+
+    def close(self):
+        #####解除映射并关闭文件#####
+        self.data.release()
+        self.mapped.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DiskImageCache:
+    #####按内容寻址的缩放图片磁盘缓存，可在多个线程中同时读写#####
+    def __init__(self, cache_dir=None, max_bytes=DISK_CACHE_MAX_BYTES):
+        self.directory = os.path.join(cache_dir or default_cache_dir(), CACHE_DIR_NAME)
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.sources = {}  # 规范化的绝对路径 -> [修改时间, 大小, SHA-1, 宽, 高]
+        self.entries = {}  # key -> [字节数, 最近使用时间]
+        self.total_bytes = 0
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load_index()
+
+    def load_index(self):
+        #####读取索引，索引丢失或格式不符时扫描目录重建条目列表#####
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if isinstance(data, dict) and data.get("version") == CACHE_INDEX_VERSION:
+            self.sources = data.get("sources", {})
+            self.entries = data.get("entries", {})
+        else:
+            self.sources = {}
+            self.entries = self.scan_entries()
+            self.dirty = bool(self.entries)
+        self.total_bytes = sum(nbytes for nbytes, _ in self.entries.values())
+
+    def scan_entries(self):
+        #####从磁盘上的条目文件重建条目列表(以修改时间作为最近使用时间)#####
+        entries = {}
+        for directory, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                if file_name.endswith(".raw"):
+                    try:
+                        stat = os.stat(os.path.join(directory, file_name))
+                    except OSError:
+                        continue
+                    entries[file_name[:-4]] = [stat.st_size, stat.st_mtime]
+        return entries
+
+    def save_index(self):
+        #####写出索引(先写临时文件再替换)，没有变化时不写#####
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps({"version": CACHE_INDEX_VERSION, "sources": self.sources, "entries": self.entries})
+            self.dirty = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            with self.lock:
+                self.dirty = True
+
+    def source_key(self, path):
+        #####源文件在索引中的key#####
+        return os.path.normcase(os.path.abspath(path))
+
+    def source_info(self, path):
+        #####返回已登记的源文件(SHA-1, 宽, 高)，文件不存在或修改时间、大小变化时返回None#####
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self.lock:
+            record = self.sources.get(self.source_key(path))
+        if record is None or record[0] != stat.st_mtime or record[1] != stat.st_size:
+            return None
+        return record[2], record[3], record[4]
+
+    def register_source(self, path, width, height):
+        #####登记源文件的内容哈希与尺寸，文件未变化时沿用已计算的哈希，返回SHA-1#####
+        stat = os.stat(path)
+        key = self.source_key(path)
+        with self.lock:
+            record = self.sources.get(key)
+        if record is not None and record[0] == stat.st_mtime and record[1] == stat.st_size:
+            digest = record[2]
+        else:
+            digest = file_sha1(path)
+        with self.lock:
+            self.sources[key] = [stat.st_mtime, stat.st_size, digest, width, height]
+            self.dirty = True
+        return digest
+
+    def entry_path(self, key):
+        #####条目文件的路径(按key的前两位分散到子目录)#####
+        return os.path.join(self.directory, key[:2], key + ".raw")
+
+    def get(self, key):
+        #####把条目映射到内存并返回CachedPixels，不存在或已损坏时返回None#####
+        path = self.entry_path(key)
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            with self.lock:
+                self.misses += 1
+                self.forget(key)
+            return None
+
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            file.close()
+            mapped = None
+        if mapped is not None:
+            if len(mapped) >= ENTRY_HEADER.size:
+                magic, mode, width, height = ENTRY_HEADER.unpack_from(mapped)
+                mode = mode.rstrip(b"\0").decode("ascii", "replace")
+                bands = MODE_BANDS.get(mode)
+                if magic == ENTRY_MAGIC and bands and len(mapped) == ENTRY_HEADER.size + width * height * bands:
+                    with self.lock:
+                        self.hits += 1
+                        self.touch(key, len(mapped))
+                    return CachedPixels(file, mapped, mode, (width, height))
+            mapped.close()
+            file.close()
+
+        # 损坏的条目(例如写入中途断电)直接删除
+        with self.lock:
+            self.misses += 1
+            self.forget(key)
+        self.remove_file(path)
+        return None
+
+    def put(self, key, mode, size, data):
+        #####写入一个条目(先写临时文件再替换)，超过上限时淘汰最久未使用的条目，返回是否写入#####
+        if mode not in MODE_BANDS:
+            return False
+        path = self.entry_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        width, height = size
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(ENTRY_HEADER.pack(ENTRY_MAGIC, mode.encode("ascii"), width, height))
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # 例如Windows上其他线程正映射着同一条目
+            self.remove_file(temp_path)
+            return False
+
+        with self.lock:
+            self.touch(key, ENTRY_HEADER.size + len(data))
+            victims = self.select_victims(key)
+        for victim in victims:
+            self.remove_file(self.entry_path(victim))
+        return True
+
+    def touch(self, key, nbytes):
+        #####登记或更新条目的大小与最近使用时间(调用者持有锁)#####
+        old = self.entries.get(key)
+        if old is not None:
+            self.total_bytes -= old[0]
+        self.entries[key] = [nbytes, time.time()]
+        self.total_bytes += nbytes
+        self.dirty = True
+
+    def forget(self, key):
+        #####从索引中删除条目(调用者持有锁)#####
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old[0]
+            self.dirty = True
+
+    def select_victims(self, keep):
+        #####按最近使用时间选出需要淘汰的条目并从索引中删除(调用者持有锁)，keep为刚写入的条目#####
+        if self.total_bytes <= self.max_bytes:
+            return []
+        victims = []
+        for key in sorted(self.entries, key=lambda item: self.entries[item][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key != keep:
+                self.forget(key)
+                victims.append(key)
+        return victims
+
+    def remove_file(self, path):
+        #####删除文件，失败时忽略#####
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        #####返回缓存统计信息#####
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
@@ -0,0 +1,718 @@
+# @title   : picker_core.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Tk-free layout model, coordinate maths and command-line tools of ImageCoordinatePicker.
+# @License : MIT License
+#
+# 本模块不依赖tkinter与PIL，可以在没有图形界面的构建服务器上批量校验、变换和导出布局:
+#     python picker_core.py validate layouts/*.txt
+#     python picker_core.py transform --scale-to 2560x1440 -o out/ layouts/*.json
+#     python picker_core.py export --format json -o out/ layouts/*.txt
+#     python picker_core.py renpy --prefix gui/ -o screens.rpy layouts/*.txt
+
+import argparse
+import bisect
+import json
+import os
+import re
+import sys
+
+# 导入坐标时后台线程每次读取的字节数
+IMPORT_CHUNK_BYTES = 256 * 1024
+
+# 坐标行格式: "x,y"、"x，y"、"x y" 以及保存数据时写出的 "(x, y)"
+COORDINATE_LINE_PATTERN = re.compile(
+    r"^[ \t]*\(?[ \t]*([+-]?\d+)[ \t]*(?:[，,][ \t]*|[ \t]+)([+-]?\d+)(?=[ \t]*(?:[)，,\s]|$))",
+    re.MULTILINE
+)
+
+# 坐标的取值范围(坐标点以32位有符号整数保存)
+COORDINATE_MIN = -2 ** 31
+COORDINATE_MAX = 2 ** 31 - 1
+
+# 空间网格索引的默认单元格边长(背景像素)
+SPATIAL_CELL_SIZE = 64
+
+# 文本布局文件(保存数据)中的各部分标题
+TEXT_SIZE_PREFIX = "背景图片尺寸:"
+TEXT_POINTS_HEADER = "坐标点(包含叠加图片位置):"
+TEXT_OVERLAYS_HEADER = "叠加图片位置(左上角基准点):"
+BACKGROUND_SIZE_PATTERN = re.compile(r"背景图片尺寸:\s*(\d+)\s*[xX×]\s*(\d+)")
+OVERLAY_LINE_PATTERN = re.compile(r"^(.*?):?\s*\(\s*([+-]?\d+)\s*[，,]\s*([+-]?\d+)\s*\)\s*$")
+# 列表筛选中的坐标范围条件，例如 x:100-200、y:50~、x:~300、x:-20..20、y:64(等于)
+ROW_FILTER_RANGE_PATTERN = re.compile(r"^([xXyY])[:：]([+-]?\d+)?(~|\.\.|-)?([+-]?\d+)?$")
+
+
+def default_cache_dir():
+    #####用户缓存目录(Windows: %LOCALAPPDATA%，macOS: ~/Library/Caches，其他: $XDG_CACHE_HOME)#####
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "ImageCoordinatePicker")
+
+
+def is_valid_coordinate(x, y):
+    #####检查坐标是否在可以保存的范围内#####
+    return COORDINATE_MIN <= x <= COORDINATE_MAX and COORDINATE_MIN <= y <= COORDINATE_MAX
+
+
+def check_coordinates(points):
+    #####检查坐标点都在可以保存的范围内，超出时抛出ValueError，返回points#####
+    for x, y in points:
+        if not is_valid_coordinate(x, y):
+            raise ValueError(f"坐标超出范围({COORDINATE_MIN}~{COORDINATE_MAX}): ({x}, {y})")
+    return points
+
+
+def parse_coordinate_text(text):
+    #####批量解析文本中的所有坐标行，无法解析的行直接跳过，坐标超出范围时抛出ValueError#####
+    return check_coordinates([(int(x), int(y)) for x, y in COORDINATE_LINE_PATTERN.findall(text)])
+
+
+def iter_coordinate_chunks(file_path, cancel_event=None, chunk_size=IMPORT_CHUNK_BYTES):
+    #####按块流式读取坐标文件，逐块产出(坐标点列表, 已读取字节数)#####
+    read_bytes = 0
+    remainder = b""
+    with open(file_path, 'rb') as f:
+        while cancel_event is None or not cancel_event.is_set():
+            chunk = f.read(chunk_size)
+            if not chunk:
+                # 最后一行可能没有换行符
+                if remainder:
+                    yield parse_coordinate_text(remainder.decode('utf-8-sig')), read_bytes
+                return
+
+            read_bytes += len(chunk)
+            chunk = remainder + chunk
+
+            # 只解析到最后一个完整行，剩余部分与下一块拼接
+            cut = chunk.rfind(b"\n") + 1
+            remainder = chunk[cut:]
+            if cut:
+                yield parse_coordinate_text(chunk[:cut].decode('utf-8-sig')), read_bytes
+
+
+def scaled_size(width, height, scale_x, scale_y):
+    #####按背景缩放比例计算图片在画布上的尺寸(使用四舍五入减少误差)#####
+    return int(round(width / scale_x)), int(round(height / scale_y))
+
+
+def background_to_canvas(value, canvas_origin, scale):
+    #####背景坐标转换为画布坐标(使用四舍五入减少误差)#####
+    return canvas_origin + int(round(value / scale))
+
+
+def canvas_to_background(value, canvas_origin, scale):
+    #####画布坐标转换为背景坐标(使用四舍五入减少误差)#####
+    return int(round((value - canvas_origin) * scale))
+
+
+class SpatialGrid:
+    #####均匀网格空间索引: 按包围盒(x0, y0, x1, y1)把条目登记到覆盖的单元格#####
+    # 查询只访问与查询范围相交的单元格，耗时与布局中的条目总数无关
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> 条目集合
+        self.boxes = {}  # 条目 -> 包围盒
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, key):
+        return key in self.boxes
+
+    def cell_range(self, box):
+        #####包围盒覆盖的单元格范围(含两端)#####
+        size = self.cell_size
+        return int(box[0] // size), int(box[1] // size), int(box[2] // size), int(box[3] // size)
+
+    def insert(self, key, box):
+        #####登记条目，已存在时替换其包围盒#####
+        if key in self.boxes:
+            self.remove(key)
+        self.boxes[key] = box
+        col0, row0, col1, row1 = self.cell_range(box)
+        cells = self.cells
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = cells.get((col, row))
+                if cell is None:
+                    cells[(col, row)] = {key}
+                else:
+                    cell.add(key)
+
+    def remove(self, key):
+        #####移除条目，不存在时忽略#####
+        box = self.boxes.pop(key, None)
+        if box is None:
+            return
+        col0, row0, col1, row1 = self.cell_range(box)
+        for col in range(col0, col1 + 1):
+            for row in range(row0, row1 + 1):
+                cell = self.cells.get((col, row))
+                if cell is not None:
+                    cell.discard(key)
+                    if not cell:
+                        del self.cells[(col, row)]
+
+    def update(self, key, box):
+        #####更新条目的包围盒，覆盖的单元格不变时只替换包围盒#####
+        old = self.boxes.get(key)
+        if old is not None and self.cell_range(old) == self.cell_range(box):
+            self.boxes[key] = box
+        else:
+            self.insert(key, box)
+
+    def clear(self):
+        #####清空索引#####
+        self.cells = {}
+        self.boxes = {}
+
+    def query_rect(self, x0, y0, x1, y1):
+        #####返回包围盒与矩形相交的所有条目#####
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        col0, row0, col1, row1 = self.cell_range((x0, y0, x1, y1))
+
+        # 查询范围比已有单元格还多时直接遍历已有单元格
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > len(self.cells):
+            cells = [cell for (col, row), cell in self.cells.items()
+                     if col0 <= col <= col1 and row0 <= row <= row1]
+        else:
+            cells = [self.cells[(col, row)] for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)
+                     if (col, row) in self.cells]
+
+        found = set()
+        boxes = self.boxes
+        for cell in cells:
+            for key in cell:
+                if key not in found:
+                    box = boxes[key]
+                    if box[0] <= x1 and box[2] >= x0 and box[1] <= y1 and box[3] >= y0:
+                        found.add(key)
+        return found
+
+    def query_point(self, x, y):
+        #####返回包围盒包含该点的所有条目#####
+        return self.query_rect(x, y, x, y)
+
+    def nearest(self, x, y, max_distance):
+        #####返回与(x, y)距离不超过max_distance的最近条目，没有时返回None#####
+        best = None
+        best_distance = max_distance
+        for key in self.query_rect(x - max_distance, y - max_distance, x + max_distance, y + max_distance):
+            box = self.boxes[key]
+            dx = max(box[0] - x, 0, x - box[2])
+            dy = max(box[1] - y, 0, y - box[3])
+            distance = (dx * dx + dy * dy) ** 0.5
+            if distance <= best_distance:
+                best, best_distance = key, distance
+        return best
+
+
+def nearest_line(lines, value, tolerance):
+    #####在升序的线坐标中二分查找与value距离不超过tolerance的最近一条，没有时返回None#####
+    index = bisect.bisect_left(lines, value)
+    best = None
+    for candidate in lines[max(index - 1, 0):index + 1]:
+        if abs(candidate - value) <= tolerance and (best is None or abs(candidate - value) < abs(best - value)):
+            best = candidate
+    return best
+
+
+def snap_axis(lines, start, size, tolerance, grid=0):
+    #####按起点、中点、终点吸附到最近的线，返回(吸附后的起点, 参考线坐标或None)#####
+    # 对齐其他图片或背景的线优先，否则吸附到网格(网格不显示参考线)
+    best_delta = None
+    guide = None
+    for offset in (0, size // 2, size):
+        value = start + offset
+        line = nearest_line(lines, value, tolerance)
+        if line is not None and (best_delta is None or abs(line - value) < abs(best_delta)):
+            best_delta = line - value
+            guide = line
+    if best_delta is not None:
+        return start + best_delta, guide
+    if grid > 0:
+        return (start + grid // 2) // grid * grid, None
+    return start, None
+
+
+class SnapLines:
+    #####拖动吸附的候选线(背景坐标)，拖动开始时排序一次，之后每次查询只需二分查找#####
+    def __init__(self, xs=(), ys=()):
+        self.xs = sorted(set(xs))
+        self.ys = sorted(set(ys))
+
+    @classmethod
+    def from_boxes(cls, boxes, width, height):
+        #####由其他叠加图片的(x, y, 宽, 高)与背景尺寸生成左/中/右与上/中/下的候选线#####
+        xs = [0, width // 2, width]
+        ys = [0, height // 2, height]
+        for x, y, box_width, box_height in boxes:
+            xs += (x, x + box_width // 2, x + box_width)
+            ys += (y, y + box_height // 2, y + box_height)
+        return cls(xs, ys)
+
+    def snap(self, x, y, width, height, tolerance, grid=0):
+        #####吸附一个矩形，返回(x, y, 竖直参考线, 水平参考线)#####
+        x, guide_x = snap_axis(self.xs, x, width, tolerance, grid)
+        y, guide_y = snap_axis(self.ys, y, height, tolerance, grid)
+        return x, y, guide_x, guide_y
+
+
+def align_boxes(boxes, mode, bounds=None):
+    #####对齐一组(x, y, 宽, 高)，返回新的(x, y)列表#####
+    # mode: left/center/right/top/middle/bottom；bounds为参照范围(x0, y0, x1, y1)，默认为这组矩形的外接矩形
+    if bounds is None:
+        bounds = (
+            min(x for x, _, _, _ in boxes), min(y for _, y, _, _ in boxes),
+            max(x + width for x, _, width, _ in boxes), max(y + height for _, y, _, height in boxes)
+        )
+    x0, y0, x1, y1 = bounds
+    positions = []
+    for x, y, width, height in boxes:
+        if mode == "left":
+            x = x0
+        elif mode == "center":
+            x = (x0 + x1 - width) // 2
+        elif mode == "right":
+            x = x1 - width
+        elif mode == "top":
+            y = y0
+        elif mode == "middle":
+            y = (y0 + y1 - height) // 2
+        elif mode == "bottom":
+            y = y1 - height
+        else:
+            raise ValueError(f"未知的对齐方式: {mode}")
+        positions.append((x, y))
+    return positions
+
+
+def distribute_boxes(boxes, axis):
+    #####沿水平(horizontal)或竖直(vertical)方向等距分布，首尾不动，返回与输入顺序相同的新(x, y)列表#####
+    positions = [(x, y) for x, y, _, _ in boxes]
+    if len(boxes) < 3:
+        return positions
+    start, size = (0, 2) if axis == "horizontal" else (1, 3)
+    order = sorted(range(len(boxes)), key=lambda i: boxes[i][start])
+    first, last = boxes[order[0]], boxes[order[-1]]
+    span = last[start] + last[size] - first[start]
+    gap = (span - sum(box[size] for box in boxes)) / (len(boxes) - 1)
+
+    cursor = first[start]
+    for index in order:
+        value = int(round(cursor))
+        positions[index] = (value, positions[index][1]) if start == 0 else (positions[index][0], value)
+        cursor += boxes[index][size] + gap
+    return positions
+
+
+class RowFilter:
+    #####列表的筛选条件: 名称中包含的文本，以及x、y坐标的闭区间(None表示不限)#####
+    def __init__(self, text="", x_range=(None, None), y_range=(None, None)):
+        self.text = text.casefold()
+        self.x_range = x_range
+        self.y_range = y_range
+
+    @classmethod
+    def parse(cls, query):
+        #####解析筛选文本，例如 "x:100-200 y:50~ 按钮"，坐标条件以外的部分作为名称#####
+        words = []
+        ranges = {"x": (None, None), "y": (None, None)}
+        for token in query.split():
+            match = ROW_FILTER_RANGE_PATTERN.match(token)
+            if match is None or (match.group(2) is None and match.group(4) is None):
+                words.append(token)
+                continue
+            axis, low, separator, high = match.groups()
+            low = int(low) if low is not None else None
+            high = int(high) if high is not None else None
+            if separator is None:
+                high = low
+            ranges[axis.lower()] = (low, high)
+        return cls(" ".join(words), ranges["x"], ranges["y"])
+
+    def is_empty(self):
+        #####没有任何条件时返回True#####
+        return not self.text and self.x_range == (None, None) and self.y_range == (None, None)
+
+    def matches(self, name, x, y):
+        #####检查一行(名称, x, y)是否满足条件#####
+        if self.text and self.text not in name.casefold():
+            return False
+        for value, (low, high) in ((x, self.x_range), (y, self.y_range)):
+            if low is not None and value < low or high is not None and value > high:
+                return False
+        return True
+
+
+class OverlayItem:
+    #####布局中的一张叠加图片(位置为背景坐标系下的左上角)#####
+    def __init__(self, name, x, y, width=None, height=None, path=None):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.path = path
+
+    def to_dict(self):
+        #####转换为可写入JSON的字典#####
+        data = {"name": self.name, "x": self.x, "y": self.y}
+        if self.width is not None and self.height is not None:
+            data["width"] = self.width
+            data["height"] = self.height
+        if self.path:
+            data["path"] = self.path
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        #####从字典创建叠加图片#####
+        return cls(
+            str(data["name"]), int(data["x"]), int(data["y"]),
+            data.get("width"), data.get("height"), data.get("path")
+        )
+
+
+class Layout:
+    #####一个界面的布局: 背景尺寸、坐标点与叠加图片#####
+    def __init__(self, width, height, points=None, overlays=None, background_path=None, name=None):
+        self.width = width
+        self.height = height
+        self.points = list(points) if points is not None else []
+        self.overlays = list(overlays) if overlays is not None else []
+        self.background_path = background_path
+        self.name = name
+
+    def to_dict(self):
+        #####转换为可写入JSON的字典#####
+        background = {"width": self.width, "height": self.height}
+        if self.background_path:
+            background["path"] = self.background_path
+        data = {
+            "background": background,
+            "points": [[x, y] for x, y in self.points],
+            "overlays": [overlay.to_dict() for overlay in self.overlays],
+        }
+        if self.name:
+            data["name"] = self.name
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        #####从字典创建布局#####
+        background = data["background"]
+        return cls(
+            int(background["width"]), int(background["height"]),
+            check_coordinates([(int(x), int(y)) for x, y in data.get("points", [])]),
+            [OverlayItem.from_dict(item) for item in data.get("overlays", [])],
+            background.get("path"), data.get("name")
+        )
+
+    def validate(self):
+        #####检查布局，返回问题描述列表(空列表表示没有问题)#####
+        problems = []
+        if self.width <= 0 or self.height <= 0:
+            problems.append(f"背景尺寸无效: {self.width} x {self.height}")
+            return problems
+
+        # 负坐标在Ren'Py中是合法的(界面元素可以部分移出画面)，只检查完全看不见的叠加图片
+        seen_names = set()
+        for overlay in self.overlays:
+            if overlay.name in seen_names:
+                problems.append(f"叠加图片名称重复: {overlay.name}")
+            seen_names.add(overlay.name)
+
+            # 不知道尺寸时只能判断左上角是否已超出右边缘或下边缘
+            outside = overlay.x >= self.width or overlay.y >= self.height
+            if overlay.width is not None and overlay.height is not None:
+                outside = outside or overlay.x + overlay.width <= 0 or overlay.y + overlay.height <= 0
+            if outside:
+                problems.append(f"叠加图片 {overlay.name} ({overlay.x}, {overlay.y}) 完全位于背景之外")
+
+            if overlay.path and not os.path.isfile(overlay.path):
+                problems.append(f"叠加图片 {overlay.name} 的源文件不存在: {overlay.path}")
+        return problems
+
+    def transformed(self, scale_x=1.0, scale_y=1.0, offset_x=0, offset_y=0):
+        #####返回缩放并平移后的新布局(坐标使用四舍五入)#####
+        def transform_x(value):
+            return int(round(value * scale_x)) + offset_x
+
+        def transform_y(value):
+            return int(round(value * scale_y)) + offset_y
+
+        overlays = [
+            OverlayItem(
+                overlay.name, transform_x(overlay.x), transform_y(overlay.y),
+                None if overlay.width is None else int(round(overlay.width * scale_x)),
+                None if overlay.height is None else int(round(overlay.height * scale_y)),
+                overlay.path
+            )
+            for overlay in self.overlays
+        ]
+        return Layout(
+            int(round(self.width * scale_x)), int(round(self.height * scale_y)),
+            [(transform_x(x), transform_y(y)) for x, y in self.points],
+            overlays, self.background_path, self.name
+        )
+
+    def scaled_to(self, width, height):
+        #####按新的背景分辨率等比换算布局#####
+        return self.transformed(width / self.width, height / self.height)
+
+
+def write_layout_text(layout, f):
+    #####按"保存数据"的文本格式写出布局#####
+    # 保存背景图片信息
+    f.write(f"{TEXT_SIZE_PREFIX} {layout.width} x {layout.height}\n")
+    f.write("\n")
+
+    # 保存坐标点
+    f.write(f"{TEXT_POINTS_HEADER}\n")
+    for x, y in layout.points:
+        f.write(f"({x}, {y})\n")
+    f.write("\n")
+
+    # 保存叠加图片位置
+    f.write(f"{TEXT_OVERLAYS_HEADER}\n")
+    for overlay in layout.overlays:
+        f.write(f"{overlay.name}: ({overlay.x}, {overlay.y})\n")
+
+
+def read_layout_text(f):
+    #####读取"保存数据"写出的文本布局#####
+    width = height = 0
+    points = []
+    overlays = []
+    section = None
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(TEXT_SIZE_PREFIX):
+            match = BACKGROUND_SIZE_PATTERN.match(line)
+            if match:
+                width, height = int(match.group(1)), int(match.group(2))
+            continue
+        if line == TEXT_POINTS_HEADER:
+            section = "points"
+            continue
+        if line == TEXT_OVERLAYS_HEADER:
+            section = "overlays"
+            continue
+
+        if section == "points":
+            points.extend(parse_coordinate_text(line))
+        elif section == "overlays":
+            match = OVERLAY_LINE_PATTERN.match(line)
+            if match:
+                overlays.append(OverlayItem(match.group(1).strip(), int(match.group(2)), int(match.group(3))))
+    return Layout(width, height, points, overlays)
+
+
+def load_layout(path):
+    #####按扩展名读取布局文件(.json、项目文件.icpproj或保存数据的.txt)#####
+    if path.lower().endswith(".icpproj"):
+        from picker_project import read_project
+
+        layout = read_project(path).to_layout()
+        if not layout.name:
+            layout.name = os.path.splitext(os.path.basename(path))[0]
+        return layout
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if path.lower().endswith(".json"):
+            layout = Layout.from_dict(json.load(f))
+        else:
+            layout = read_layout_text(f)
+    if not layout.name:
+        layout.name = os.path.splitext(os.path.basename(path))[0]
+    return layout
+
+
+def save_layout(layout, path):
+    #####按扩展名写出布局文件(.json或保存数据的.txt)#####
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.lower().endswith(".json"):
+            json.dump(layout.to_dict(), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        else:
+            write_layout_text(layout, f)
+
+
+def parse_size(text):
+    #####解析"宽x高"形式的尺寸参数#####
+    match = re.fullmatch(r"\s*(\d+)\s*[xX×]\s*(\d+)\s*", text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"无效的尺寸: {text}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_offset(text):
+    #####解析"dx,dy"形式的平移参数#####
+    points = parse_coordinate_text(text)
+    if not points:
+        raise argparse.ArgumentTypeError(f"无效的平移量: {text}")
+    return points[0]
+
+
+def output_path(input_path, output_dir, extension):
+    #####输出文件路径: 输出目录 + 原文件名 + 新扩展名#####
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, base + extension)
+
+
+def default_extension(path):
+    #####未指定输出格式时的扩展名: .json输入保持json，其余(.txt、项目文件.icpproj)写成txt#####
+    return ".json" if path.lower().endswith(".json") else ".txt"
+
+
+def convert_layouts(paths, convert):
+    #####逐个处理布局文件，单个文件出错时报告并继续，返回出错的文件数#####
+    failed = 0
+    for path in paths:
+        try:
+            convert(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            failed += 1
+            print(f"{path}: 无法处理: {e}", file=sys.stderr)
+    if failed:
+        print(f"共 {len(paths)} 个布局，{failed} 个处理失败", file=sys.stderr)
+    return failed
+
+
+def command_validate(args):
+    #####validate子命令: 校验布局文件#####
+    failed = 0
+    for path in args.layouts:
+        try:
+            problems = load_layout(path).validate()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            problems = [f"无法读取: {e}"]
+        if problems:
+            failed += 1
+            print(f"{path}: {len(problems)} 个问题")
+            for problem in problems:
+                print(f"  - {problem}")
+        elif not args.quiet:
+            print(f"{path}: OK")
+    print(f"共 {len(args.layouts)} 个布局，{failed} 个存在问题", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def command_transform(args):
+    #####transform子命令: 缩放/平移布局并写出#####
+    os.makedirs(args.output, exist_ok=True)
+    offset_x, offset_y = args.offset
+
+    def transform(path):
+        layout = load_layout(path)
+        if args.scale_to:
+            layout = layout.scaled_to(*args.scale_to)
+        layout = layout.transformed(offset_x=offset_x, offset_y=offset_y)
+        extension = "." + args.format if args.format else default_extension(path)
+        save_layout(layout, output_path(path, args.output, extension))
+
+    return 1 if convert_layouts(args.layouts, transform) else 0
+
+
+def command_export(args):
+    #####export子命令: 转换布局文件格式#####
+    os.makedirs(args.output, exist_ok=True)
+
+    def export(path):
+        save_layout(load_layout(path), output_path(path, args.output, "." + args.format))
+
+    return 1 if convert_layouts(args.layouts, export) else 0
+
+
+def command_renpy(args):
+    #####renpy子命令: 把所有布局流式写成一个.rpy文件(先写临时文件，全部布局处理成功后才替换输出文件)#####
+    from renpy_export import RenpyExportOptions, write_screens
+    from renpy_import import round_trip_problems
+
+    options = RenpyExportOptions(
+        image_prefix=args.prefix, default_action=args.action,
+        include_background=not args.no_background, include_points=not args.no_points
+    )
+    temp_path = args.output + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+
+        def export(path):
+            # 每个布局只读取一次，--check时先检查生成的代码能否被renpy_import原样读回
+            layout = load_layout(path)
+            if args.check:
+                problems = round_trip_problems(layout, options)
+                for problem in problems:
+                    print(f"{path}: {problem}", file=sys.stderr)
+                if problems:
+                    raise ValueError(f"{len(problems)} 处无法原样导入")
+            if f.tell():
+                f.write("\n")
+            write_screens((layout,), f, options)
+
+        failed = convert_layouts(args.layouts, export)
+
+    if failed:
+        os.remove(temp_path)
+        return 1
+    os.replace(temp_path, args.output)
+    print(f"已写出 {len(args.layouts)} 个screen到 {args.output}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    #####构建命令行参数解析器#####
+    parser = argparse.ArgumentParser(
+        prog="picker_core",
+        description="ImageCoordinatePicker 布局的无界面批处理工具"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    validate_parser = subparsers.add_parser("validate", help="校验布局文件")
+    validate_parser.add_argument("layouts", nargs="+", help="布局文件(.txt或.json)")
+    validate_parser.add_argument("-q", "--quiet", action="store_true", help="只输出存在问题的布局")
+    validate_parser.set_defaults(handler=command_validate)
+
+    transform_parser = subparsers.add_parser("transform", help="缩放或平移布局")
+    transform_parser.add_argument("layouts", nargs="+", help="布局文件(.txt或.json)")
+    transform_parser.add_argument("-o", "--output", required=True, help="输出目录")
+    transform_parser.add_argument("--scale-to", type=parse_size, help="新的背景分辨率，例如 2560x1440")
+    transform_parser.add_argument("--offset", type=parse_offset, default=(0, 0), help="平移量，例如 10,-20")
+    transform_parser.add_argument("--format", choices=("txt", "json"), help="输出格式，默认.json输入写成json，其余写成txt")
+    transform_parser.set_defaults(handler=command_transform)
+
+    export_parser = subparsers.add_parser("export", help="转换布局文件格式")
+    export_parser.add_argument("layouts", nargs="+", help="布局文件(.txt或.json)")
+    export_parser.add_argument("-o", "--output", required=True, help="输出目录")
+    export_parser.add_argument("--format", choices=("txt", "json"), default="json", help="输出格式")
+    export_parser.set_defaults(handler=command_export)
+
+    renpy_parser = subparsers.add_parser("renpy", help="生成Ren'Py screen代码")
+    renpy_parser.add_argument("layouts", nargs="+", help="布局文件(.txt或.json)，每个布局生成一个screen")
+    renpy_parser.add_argument("-o", "--output", required=True, help="输出的.rpy文件")
+    renpy_parser.add_argument("--prefix", default="gui/", help="图片路径前缀，默认 gui/")
+    renpy_parser.add_argument("--action", default="NullAction()", help="imagebutton的默认action")
+    renpy_parser.add_argument("--no-background", action="store_true", help="不输出背景图片")
+    renpy_parser.add_argument("--no-points", action="store_true", help="不输出坐标点注释")
+    renpy_parser.add_argument("--check", action="store_true", help="写出前检查生成的screen能否原样导入")
+    renpy_parser.set_defaults(handler=command_renpy)
+    return parser
+
+
+def main(argv=None):
+    #####命令行入口#####
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
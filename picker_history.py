@@ -0,0 +1,324 @@
+# @title   : picker_history.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Command-based undo/redo history of ImageCoordinatePicker.
+# @License : MIT License
+#
+# 每条历史记录只保存操作前后的差异(坐标、名称、图片路径)，不保存坐标点列表或图片的快照:
+# 叠加图片以项目id引用，删除后撤销时按源文件路径重新读取，所以每条记录的大小与图片尺寸无关。
+# 历史总大小超过上限时丢弃最早的记录。
+# 记录通过应用对象的以下方法执行:
+#     move_overlays(moves)                  set_overlay_property(uid, name, value)
+#     remove_overlays(uids)                 restore_overlays(records)
+#     insert_points(index, points, labels)  delete_points(index, count)
+#     insert_point_indices(indices, points, labels)
+#     delete_point_indices(indices)
+#     set_point(index, x, y)                set_point_label(index, label)
+# 坐标点的名称(labels)以{在points中的序号: 名称}保存，只记录有名称的点。
+
+import sys
+from array import array
+from collections import deque
+
+# 撤销历史的内存上限(字节)
+HISTORY_MAX_BYTES = 16 * 1024 * 1024
+
+
+def pack_points(points):
+    #####把坐标点列表压缩为扁平的整数数组#####
+    return array('i', [value for point in points for value in point])
+
+
+def unpack_points(values):
+    #####把扁平的整数数组还原为坐标点列表#####
+    return list(zip(values[0::2], values[1::2]))
+
+
+class Command:
+    #####历史记录基类#####
+    __slots__ = ()
+    label = ""
+    # 只涉及坐标点的记录在坐标点列表被替换时失效
+    touches_points = False
+
+    def undo(self, app):
+        raise NotImplementedError
+
+    def redo(self, app):
+        raise NotImplementedError
+
+    def nbytes(self):
+        #####估算记录占用的内存#####
+        return sys.getsizeof(self)
+
+
+class MoveOverlays(Command):
+    #####移动一张或多张叠加图片，moves为(id, 原x, 原y, 新x, 新y)#####
+    __slots__ = ("moves",)
+    label = "移动叠加图片"
+
+    def __init__(self, moves):
+        self.moves = tuple(moves)
+
+    def undo(self, app):
+        app.move_overlays([(uid, old_x, old_y) for uid, old_x, old_y, _, _ in self.moves])
+
+    def redo(self, app):
+        app.move_overlays([(uid, new_x, new_y) for uid, _, _, new_x, new_y in self.moves])
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.moves) + 120 * len(self.moves)
+
+
+class SetOverlayProperty(Command):
+    #####修改叠加图片的名称或锁定状态#####
+    __slots__ = ("uid", "name", "old", "new")
+    label = "修改叠加图片"
+
+    def __init__(self, uid, name, old, new):
+        self.uid = uid
+        self.name = name
+        self.old = old
+        self.new = new
+
+    def undo(self, app):
+        app.set_overlay_property(self.uid, self.name, self.old)
+
+    def redo(self, app):
+        app.set_overlay_property(self.uid, self.name, self.new)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.old) + sys.getsizeof(self.new)
+
+
+class AddOverlays(Command):
+    #####添加一张或多张叠加图片，records为(id, 路径, 名称, x, y, 锁定, 列表行号, 图层序号)#####
+    __slots__ = ("records",)
+    label = "添加叠加图片"
+
+    def __init__(self, records):
+        self.records = tuple(records)
+
+    def undo(self, app):
+        app.remove_overlays([record[0] for record in self.records])
+
+    def redo(self, app):
+        app.restore_overlays(self.records)
+
+    def nbytes(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self.records)
+        for record in self.records:
+            size += sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record)
+        return size
+
+
+class RemoveOverlays(AddOverlays):
+    #####删除一张或多张叠加图片#####
+    __slots__ = ()
+    label = "删除叠加图片"
+
+    def undo(self, app):
+        AddOverlays.redo(self, app)
+
+    def redo(self, app):
+        AddOverlays.undo(self, app)
+
+
+def labels_nbytes(labels):
+    #####估算坐标点名称占用的内存#####
+    if not labels:
+        return 0
+    return sys.getsizeof(labels) + sum(sys.getsizeof(label) for label in labels.values())
+
+
+class InsertPoints(Command):
+    #####在index处插入一个或多个坐标点(点击、添加、批量导入)#####
+    __slots__ = ("index", "values", "labels")
+    label = "添加坐标点"
+    touches_points = True
+
+    def __init__(self, index, points, labels=None):
+        self.index = index
+        self.values = pack_points(points)
+        self.labels = labels or None
+
+    def undo(self, app):
+        app.delete_points(self.index, len(self.values) // 2)
+
+    def redo(self, app):
+        app.insert_points(self.index, unpack_points(self.values), self.labels)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.values) + labels_nbytes(self.labels)
+
+
+class DeletePoints(InsertPoints):
+    #####删除从index开始的一个或多个坐标点(删除、清除)#####
+    __slots__ = ()
+    label = "删除坐标点"
+
+    def undo(self, app):
+        InsertPoints.redo(self, app)
+
+    def redo(self, app):
+        InsertPoints.undo(self, app)
+
+
+class DeletePointIndices(Command):
+    #####一次性删除多个不连续的坐标点(框选后删除)#####
+    __slots__ = ("indices", "values", "labels")
+    label = "删除坐标点"
+    touches_points = True
+
+    def __init__(self, indices, points, labels=None):
+        self.indices = array('i', indices)
+        self.values = pack_points(points)
+        self.labels = labels or None
+
+    def undo(self, app):
+        app.insert_point_indices(list(self.indices), unpack_points(self.values), self.labels)
+
+    def redo(self, app):
+        app.delete_point_indices(list(self.indices))
+
+    def nbytes(self):
+        return (sys.getsizeof(self) + sys.getsizeof(self.indices) + sys.getsizeof(self.values)
+                + labels_nbytes(self.labels))
+
+
+class SetPoint(Command):
+    #####修改一个坐标点#####
+    __slots__ = ("index", "old_x", "old_y", "new_x", "new_y")
+    label = "修改坐标点"
+    touches_points = True
+
+    def __init__(self, index, old, new):
+        self.index = index
+        self.old_x, self.old_y = old
+        self.new_x, self.new_y = new
+
+    def undo(self, app):
+        app.set_point(self.index, self.old_x, self.old_y)
+
+    def redo(self, app):
+        app.set_point(self.index, self.new_x, self.new_y)
+
+
+class SetPointLabel(Command):
+    #####修改一个坐标点的名称(空字符串表示没有名称)#####
+    __slots__ = ("index", "old", "new")
+    label = "命名坐标点"
+    touches_points = True
+
+    def __init__(self, index, old, new):
+        self.index = index
+        self.old = old
+        self.new = new
+
+    def undo(self, app):
+        app.set_point_label(self.index, self.old)
+
+    def redo(self, app):
+        app.set_point_label(self.index, self.new)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.old) + sys.getsizeof(self.new)
+
+
+class CommandGroup(Command):
+    #####把多条记录作为一次操作撤销和重做#####
+    __slots__ = ("commands", "touches_points")
+
+    def __init__(self, commands):
+        self.commands = tuple(commands)
+        self.touches_points = any(command.touches_points for command in self.commands)
+
+    @property
+    def label(self):
+        return self.commands[0].label if self.commands else ""
+
+    def undo(self, app):
+        for command in reversed(self.commands):
+            command.undo(app)
+
+    def redo(self, app):
+        for command in self.commands:
+            command.redo(app)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.commands) + sum(command.nbytes() for command in self.commands)
+
+
+class History:
+    #####撤销/重做栈，总大小按字节限制#####
+    def __init__(self, max_bytes=HISTORY_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.undo_stack = deque()  # (记录, 字节数)
+        self.redo_stack = []
+        self.total_bytes = 0
+        self.version = 0  # 每次记录、撤销、重做或清空时加1，自动保存据此跳过没有变化的状态
+
+    def push(self, command):
+        #####记录一个已经执行的操作，并清空重做栈#####
+        for _, size in self.redo_stack:
+            self.total_bytes -= size
+        self.redo_stack = []
+        self.version += 1
+        size = command.nbytes()
+        self.undo_stack.append((command, size))
+        self.total_bytes += size
+        # 超出上限时丢弃最早的记录(至少保留最新的一条)
+        while self.total_bytes > self.max_bytes and len(self.undo_stack) > 1:
+            self.total_bytes -= self.undo_stack.popleft()[1]
+
+    def last(self):
+        #####最近一条可撤销的记录，没有时返回None#####
+        return self.undo_stack[-1][0] if self.undo_stack else None
+
+    def amend(self, command):
+        #####用合并后的记录替换最近一条记录(如连续的方向键微移)#####
+        if self.undo_stack:
+            self.total_bytes -= self.undo_stack.pop()[1]
+        self.push(command)
+
+    def undo(self, app):
+        #####撤销最近的操作，返回该记录，没有可撤销的操作时返回None#####
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.version += 1
+        entry[0].undo(app)
+        self.redo_stack.append(entry)
+        return entry[0]
+
+    def redo(self, app):
+        #####重做最近撤销的操作，返回该记录，没有可重做的操作时返回None#####
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.version += 1
+        entry[0].redo(app)
+        self.undo_stack.append(entry)
+        return entry[0]
+
+    def revert(self, command):
+        #####撤销/重做未能完成时把记录放回原来的栈，使其可以再次执行#####
+        self.version += 1
+        if self.redo_stack and self.redo_stack[-1][0] is command:
+            self.undo_stack.append(self.redo_stack.pop())
+        elif self.undo_stack and self.undo_stack[-1][0] is command:
+            self.redo_stack.append(self.undo_stack.pop())
+
+    def discard_point_commands(self):
+        #####坐标点列表被整体替换后丢弃所有坐标点记录#####
+        self.undo_stack = deque(entry for entry in self.undo_stack if not entry[0].touches_points)
+        self.redo_stack = [entry for entry in self.redo_stack if not entry[0].touches_points]
+        self.total_bytes = sum(size for _, size in self.undo_stack) + sum(size for _, size in self.redo_stack)
+
+    def clear(self):
+        #####清空历史#####
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.total_bytes = 0
+        self.version += 1
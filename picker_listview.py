@@ -0,0 +1,595 @@
+# @title   : picker_listview.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Virtualized list view with filtering for very large coordinate and overlay lists.
+# @License : MIT License
+#
+# 列表本身不保存任何行的文本，只为可见的行创建画布元素，绘制时才向数据源取文本:
+#     count()             行数
+#     row_text(index)     第index行显示的文本
+#     row_fields(index)   第index行用于筛选的(名称, x, y)
+#     filter_rows(filter) 可选，一次返回满足RowFilter的升序行号(数据源可以用数组批量筛选)
+# 数据变化后调用 rows_inserted / rows_deleted / rows_changed / reset 通知列表，重绘合并到下一次空闲时执行。
+# 选择相关的方法与tk.Listbox相同(size、curselection、selection_set、selection_clear、selection_anchor、index、see)，
+# 用户改变选择时产生<<ListboxSelect>>事件。选中的行保存为RowRanges区间，curselection返回它的副本。
+
+import tkinter as tk
+from array import array
+from bisect import bisect_left, bisect_right
+from tkinter import font as tkfont
+from tkinter import ttk
+
+from picker_core import RowFilter
+from picker_points import load_numpy
+
+# 输入筛选文本后等待多久再筛选(毫秒)，连续输入只筛选一次
+FILTER_DELAY_MS = 150
+# 选中行的背景色与文字颜色
+SELECT_BACKGROUND = "#0078d7"
+SELECT_FOREGROUND = "white"
+# 每格滚轮滚动的行数
+WHEEL_ROWS = 3
+# 鼠标事件state中的修饰键位
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+# 有筛选条件时，一次插入或修改不超过这么多行就只检查这些行，否则重新筛选全部数据(数据源可以批量筛选)
+FILTER_INCREMENTAL_MAX_ROWS = 256
+# 平移的行号达到这么多时使用numpy(已安装时)批量计算
+NUMPY_MIN_SHIFT = 2048
+
+
+def shifted(values, delta):
+    #####整数数组的每一项加上delta，行数较多且安装了numpy时批量计算#####
+    numpy = load_numpy() if len(values) >= NUMPY_MIN_SHIFT else None
+    if numpy is None:
+        return array('i', map(delta.__add__, values))
+    result = array('i')
+    result.frombytes((numpy.frombuffer(values, dtype=numpy.int32) + delta).astype(numpy.int32).tobytes())
+    return result
+
+
+class RowRanges:
+    #####升序且互不相邻的行号区间[start, end)，保存在两个整数数组中: 全选一百万行也只占一个区间#####
+    def __init__(self, starts=(), ends=()):
+        self.starts = array('i', starts)
+        self.ends = array('i', ends)
+
+    @classmethod
+    def from_rows(cls, rows):
+        #####由升序的行号生成区间#####
+        ranges = cls()
+        starts, ends = ranges.starts, ranges.ends
+        for row in rows:
+            if ends and ends[-1] == row:
+                ends[-1] = row + 1
+            else:
+                starts.append(row)
+                ends.append(row + 1)
+        return ranges
+
+    def copy(self):
+        #####复制一份(只复制区间数组)#####
+        return RowRanges(self.starts, self.ends)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def __len__(self):
+        return sum(self.ends) - sum(self.starts)
+
+    def __contains__(self, row):
+        index = bisect_right(self.starts, row) - 1
+        return index >= 0 and row < self.ends[index]
+
+    def __iter__(self):
+        for start, end in zip(self.starts, self.ends):
+            yield from range(start, end)
+
+    def __getitem__(self, index):
+        #####第index个选中的行号(只用于取第一个或最后一个等少量访问)#####
+        if index < 0:
+            index += len(self)
+        for start, end in zip(self.starts, self.ends):
+            if index < end - start:
+                return start + index
+            index -= end - start
+        raise IndexError("row index out of range")
+
+    def ranges(self):
+        #####按顺序返回(首行, 末行)#####
+        return [(start, end - 1) for start, end in zip(self.starts, self.ends)]
+
+    def clear(self):
+        #####清空#####
+        del self.starts[:]
+        del self.ends[:]
+
+    def add(self, start, end):
+        #####加入[start, end)，与重叠或相邻的区间合并#####
+        if start >= end:
+            return
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = array('i', (start,))
+        self.ends[first:last] = array('i', (end,))
+
+    def remove(self, start, end):
+        #####移除[start, end)，区间被切开时保留两侧的部分#####
+        if start >= end:
+            return
+        first = bisect_right(self.ends, start)
+        last = bisect_left(self.starts, end)
+        if first >= last:
+            return
+        starts, ends = array('i'), array('i')
+        if self.starts[first] < start:
+            starts.append(self.starts[first])
+            ends.append(start)
+        if self.ends[last - 1] > end:
+            starts.append(end)
+            ends.append(self.ends[last - 1])
+        self.starts[first:last] = starts
+        self.ends[first:last] = ends
+
+    def toggle(self, row):
+        #####切换一行的选中状态#####
+        if row in self:
+            self.remove(row, row + 1)
+        else:
+            self.add(row, row + 1)
+
+    def insert(self, index, count):
+        #####在index处插入了count行: 之后的行号后移，新行不选中#####
+        first = bisect_left(self.ends, index + 1)
+        if first < len(self.starts) and self.starts[first] < index:
+            # 插入位置落在区间内部时把区间切成两段
+            self.starts.insert(first + 1, index)
+            self.ends.insert(first + 1, self.ends[first])
+            self.ends[first] = index
+            first += 1
+        self.shift(first, count)
+
+    def delete(self, first_row, last_row):
+        #####删除了first_row~last_row行: 移除这些行，之后的行号前移#####
+        count = last_row - first_row + 1
+        self.remove(first_row, last_row + 1)
+        first = bisect_left(self.starts, last_row + 1)
+        self.shift(first, -count)
+        # 删除后原来被隔开的两个区间可能首尾相接
+        if 0 < first < len(self.starts) and self.ends[first - 1] == self.starts[first]:
+            self.ends[first - 1] = self.ends[first]
+            del self.starts[first]
+            del self.ends[first]
+
+    def shift(self, first, delta):
+        #####把第first个及之后的区间整体移动delta行#####
+        if first < len(self.starts):
+            self.starts[first:] = shifted(self.starts[first:], delta)
+            self.ends[first:] = shifted(self.ends[first:], delta)
+
+
+class VirtualListView(ttk.Frame):
+    #####虚拟化列表: 筛选框 + 只绘制可见行的画布 + 滚动条#####
+    def __init__(self, master, count, row_text, row_fields, filter_rows=None, height=10, width=40):
+        super().__init__(master)
+        self.count = count
+        self.row_text = row_text
+        self.row_fields = row_fields
+        self.filter_rows = filter_rows
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.top = 0  # 第一个可见行(筛选后的视图行号)
+        self.selected = RowRanges()  # 选中行的数据行号区间
+        self.anchor = -1  # 选择锚点(最近一次点击的数据行号)
+        self.active = -1  # 键盘移动的当前行(数据行号)
+        self.drag_view_row = None  # 拖动选择时鼠标所在的视图行号
+        self.filter_query = ""
+        self.filtered = None  # 筛选后显示的数据行号(升序)，None表示显示全部
+        self.row_filter = None  # 生成filtered的筛选条件
+        self.pool = []  # 可见行的(背景矩形, 文本)元素，按位置从上到下
+        self.row_width = width * self.font.measure("0")
+        self.redraw_job = None
+        self.filter_job = None
+
+        # 筛选框: 名称文本与坐标范围，例如 "x:100-200 y:50~ 按钮"
+        search_frame = ttk.Frame(self)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 2))
+        ttk.Label(search_frame, text="筛选:").grid(row=0, column=0, padx=(0, 5))
+        self.filter_var = tk.StringVar(self)
+        self.filter_entry = ttk.Entry(search_frame, textvariable=self.filter_var)
+        self.filter_entry.grid(row=0, column=1, sticky=(tk.W, tk.E))
+        self.filter_var.trace_add("write", lambda *args: self.schedule_filter())
+        self.match_label = ttk.Label(search_frame, text="")
+        self.match_label.grid(row=0, column=2, padx=(5, 0))
+        ttk.Button(search_frame, text="定位选中", command=self.see_selection).grid(row=0, column=3, padx=(5, 0))
+        search_frame.columnconfigure(1, weight=1)
+
+        self.canvas = tk.Canvas(self, width=self.row_width, height=height * self.row_height, bg="white",
+                                highlightthickness=1, takefocus=1)
+        self.canvas.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.canvas.bind("<Configure>", self.on_configure)
+        self.canvas.bind("<ButtonPress-1>", self.on_press)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self.on_release)
+        # 滚轮(Windows/macOS使用MouseWheel，X11使用Button-4/5)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", lambda event: self.scroll_rows(-WHEEL_ROWS))
+        self.canvas.bind("<Button-5>", lambda event: self.scroll_rows(WHEEL_ROWS))
+        # 键盘导航，返回break以免触发根窗口上的方向键微移
+        self.canvas.bind("<Up>", lambda event: self.move_selection(-1, event))
+        self.canvas.bind("<Down>", lambda event: self.move_selection(1, event))
+        self.canvas.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows(), event))
+        self.canvas.bind("<Next>", lambda event: self.move_selection(self.visible_rows(), event))
+        self.canvas.bind("<Home>", lambda event: self.move_selection(-self.view_count(), event))
+        self.canvas.bind("<End>", lambda event: self.move_selection(self.view_count(), event))
+        self.canvas.bind("<Left>", lambda event: "break")
+        self.canvas.bind("<Right>", lambda event: "break")
+        self.canvas.bind("<Control-a>", self.select_all)
+
+        self.ensure_pool()
+
+    # ---- 视图行与数据行的换算 ----
+
+    def view_count(self):
+        #####当前显示的行数(筛选后)#####
+        return len(self.filtered) if self.filtered is not None else self.count()
+
+    def view_to_row(self, view_row):
+        #####视图行号转换为数据行号#####
+        return self.filtered[view_row] if self.filtered is not None else view_row
+
+    def row_to_view(self, row):
+        #####数据行号转换为视图行号，被筛选掉时返回-1#####
+        if self.filtered is None:
+            return row if 0 <= row < self.count() else -1
+        position = bisect_left(self.filtered, row)
+        return position if position < len(self.filtered) and self.filtered[position] == row else -1
+
+    def visible_rows(self):
+        #####可见区域能完整显示的行数#####
+        height = self.canvas.winfo_height()
+        if height <= 1:
+            height = int(self.canvas.cget("height"))
+        return max(1, height // self.row_height)
+
+    # ---- 绘制 ----
+
+    def ensure_pool(self):
+        #####按可见高度补足行元素(多一行用于显示不完整的最后一行)#####
+        needed = self.visible_rows() + 1
+        while len(self.pool) < needed:
+            y = len(self.pool) * self.row_height
+            rectangle = self.canvas.create_rectangle(0, y, self.row_width, y + self.row_height,
+                                                     fill=SELECT_BACKGROUND, outline="", state=tk.HIDDEN)
+            text = self.canvas.create_text(4, y + 1, anchor=tk.NW, font=self.font, state=tk.HIDDEN)
+            self.pool.append((rectangle, text))
+
+    def on_configure(self, event):
+        #####画布尺寸变化时调整行元素并重绘#####
+        if event.width != self.row_width:
+            self.row_width = event.width
+            for index, (rectangle, _) in enumerate(self.pool):
+                y = index * self.row_height
+                self.canvas.coords(rectangle, 0, y, self.row_width, y + self.row_height)
+        self.ensure_pool()
+        self.redraw()
+
+    def schedule_redraw(self):
+        #####在下一次空闲时重绘(合并多次数据变化)#####
+        if self.redraw_job is None:
+            self.redraw_job = self.after_idle(self.redraw)
+
+    def redraw(self):
+        #####只更新可见行的文本与选中状态，并同步滚动条#####
+        if self.redraw_job is not None:
+            self.after_cancel(self.redraw_job)
+            self.redraw_job = None
+        total = self.view_count()
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, total - visible))
+        for offset, (rectangle, text) in enumerate(self.pool):
+            view_row = self.top + offset
+            if view_row >= total:
+                self.canvas.itemconfig(rectangle, state=tk.HIDDEN)
+                self.canvas.itemconfig(text, state=tk.HIDDEN)
+                continue
+            row = self.view_to_row(view_row)
+            selected = row in self.selected
+            self.canvas.itemconfig(rectangle, state=tk.NORMAL if selected else tk.HIDDEN)
+            self.canvas.itemconfig(text, text=self.row_text(row), state=tk.NORMAL,
+                                   fill=SELECT_FOREGROUND if selected else "black")
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # ---- 滚动 ----
+
+    def yview(self, *args):
+        #####滚动条回调: moveto比例，或scroll行数/页数#####
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self.view_count())
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.top += amount * self.visible_rows() if args[2] == "pages" else amount
+        self.redraw()
+
+    def scroll_rows(self, amount):
+        #####滚动若干行#####
+        self.top += amount
+        self.redraw()
+
+    def on_wheel(self, event):
+        #####滚轮滚动(Windows每格为120，macOS为较小的值)#####
+        steps = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.scroll_rows(-steps * WHEEL_ROWS)
+
+    def see(self, index):
+        #####滚动到数据行index可见(被筛选掉时不滚动)#####
+        view_row = self.row_to_view(index)
+        if view_row < 0:
+            return
+        visible = self.visible_rows()
+        if view_row < self.top:
+            self.top = view_row
+        elif view_row >= self.top + visible:
+            self.top = view_row - visible + 1
+        self.schedule_redraw()
+
+    def see_selection(self):
+        #####跳转到第一个选中的行，该行被筛选掉时先清除筛选#####
+        if not self.selected:
+            return
+        first = self.selected[0]
+        if self.row_to_view(first) < 0:
+            self.filter_var.set("")
+            self.apply_filter()
+        self.see(first)
+        self.canvas.focus_set()
+
+    # ---- 与tk.Listbox相同的选择接口 ----
+
+    def size(self):
+        #####数据行数#####
+        return self.count()
+
+    def curselection(self):
+        #####升序的选中行号(RowRanges副本，支持len、下标、遍历与in)#####
+        return self.selected.copy()
+
+    def selection_includes(self, index):
+        #####行index是否被选中#####
+        return index in self.selected
+
+    def selection_clear(self, first, last=None):
+        #####取消first~last行的选中状态(last为END时到末尾)#####
+        if first == 0 and last == tk.END:
+            self.selected.clear()
+        else:
+            last = self.index(last) if last is not None else first
+            self.selected.remove(first, last + 1)
+        self.schedule_redraw()
+
+    def selection_set(self, first, last=None):
+        #####选中first~last行#####
+        last = self.index(last) if last is not None else first
+        self.selected.add(first, min(last, self.count() - 1) + 1)
+        self.schedule_redraw()
+
+    select_set = selection_set
+
+    def selection_anchor(self, index):
+        #####设置选择锚点#####
+        self.anchor = self.active = index
+
+    def index(self, index):
+        #####把ANCHOR、END或行号转换为行号#####
+        if index == tk.ANCHOR:
+            return self.anchor
+        if index == tk.END:
+            return self.count()
+        return int(index)
+
+    # ---- 数据变化通知 ----
+
+    def rows_inserted(self, index, count=1):
+        #####数据源在index处插入了count行#####
+        self.selected.insert(index, count)
+        if self.anchor >= index:
+            self.anchor += count
+        if self.active >= index:
+            self.active += count
+        if self.filtered is not None:
+            # 平移插入位置之后已筛选的行号，只检查新插入的行；一次插入很多行时交给数据源重新筛选
+            position = bisect_left(self.filtered, index)
+            self.filtered[position:] = shifted(self.filtered[position:], count)
+            if count <= FILTER_INCREMENTAL_MAX_ROWS:
+                self.filtered[position:position] = self.matching_rows(index, index + count)
+            else:
+                self.schedule_filter()
+        self.data_changed()
+
+    def rows_deleted(self, first, last=None):
+        #####数据源删除了first~last行#####
+        last = first if last is None else last
+        count = last - first + 1
+        self.selected.delete(first, last)
+        if self.anchor > last:
+            self.anchor -= count
+        elif self.anchor >= first:
+            self.anchor = -1
+        if self.active > last:
+            self.active -= count
+        elif self.active >= first:
+            self.active = -1
+        if self.filtered is not None:
+            # 删除的行不需要重新检查，之后的行号前移
+            first_position = bisect_left(self.filtered, first)
+            last_position = bisect_right(self.filtered, last)
+            self.filtered[first_position:] = shifted(self.filtered[last_position:], -count)
+        self.data_changed()
+
+    def rows_changed(self, first, last=None):
+        #####数据源first~last行的内容变化#####
+        last = first if last is None else last
+        if self.filtered is not None:
+            # 只重新检查变化的行是否仍满足筛选条件
+            if last - first < FILTER_INCREMENTAL_MAX_ROWS:
+                first_position = bisect_left(self.filtered, first)
+                last_position = bisect_right(self.filtered, last)
+                self.filtered[first_position:last_position] = self.matching_rows(first, last + 1)
+            else:
+                self.schedule_filter()
+        self.data_changed()
+
+    def reset(self):
+        #####数据源被整体替换: 清空选择并回到顶部#####
+        self.selected.clear()
+        self.anchor = self.active = -1
+        self.top = 0
+        if self.filtered is not None:
+            # 原来的行号已经失效，立即重新筛选
+            self.apply_filter()
+        self.schedule_redraw()
+
+    def data_changed(self):
+        #####数据变化后更新匹配数并重绘#####
+        if self.filtered is not None:
+            self.match_label.config(text=f"{len(self.filtered)}/{self.count()}")
+        self.schedule_redraw()
+
+    # ---- 筛选 ----
+
+    def schedule_filter(self):
+        #####推迟筛选，连续输入或连续的数据变化只筛选一次#####
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+        self.filter_job = self.after(FILTER_DELAY_MS, self.apply_filter)
+
+    def apply_filter(self):
+        #####按筛选框的文本生成显示的行号#####
+        if self.filter_job is not None:
+            self.after_cancel(self.filter_job)
+            self.filter_job = None
+        query = self.filter_var.get()
+        if query != self.filter_query:
+            self.filter_query = query
+            self.top = 0
+        row_filter = RowFilter.parse(query)
+        if row_filter.is_empty():
+            self.filtered = self.row_filter = None
+            self.match_label.config(text="")
+        else:
+            self.row_filter = row_filter
+            if self.filter_rows is not None:
+                self.filtered = array('i', self.filter_rows(row_filter))
+            else:
+                self.filtered = self.matching_rows(0, self.count())
+            self.match_label.config(text=f"{len(self.filtered)}/{self.count()}")
+        self.redraw()
+
+    def matching_rows(self, start, end):
+        #####逐行检查start~end-1行，返回满足当前筛选条件的行号#####
+        row_filter, row_fields = self.row_filter, self.row_fields
+        return array('i', (row for row in range(start, end) if row_filter.matches(*row_fields(row))))
+
+    # ---- 鼠标与键盘选择 ----
+
+    def view_row_at(self, y):
+        #####画布y坐标处的视图行号(限制在有效范围内)，没有行时返回None#####
+        total = self.view_count()
+        if not total:
+            return None
+        return max(0, min(total - 1, self.top + int(y // self.row_height)))
+
+    def select_view_range(self, first, last):
+        #####只选中视图行first~last(顺序不限)#####
+        if first > last:
+            first, last = last, first
+        if self.filtered is None:
+            self.selected = RowRanges((first,), (last + 1,))
+        else:
+            self.selected = RowRanges.from_rows(self.filtered[first:last + 1])
+
+    def notify_selection(self):
+        #####用户改变了选择: 重绘并产生<<ListboxSelect>>事件#####
+        self.redraw()
+        self.event_generate("<<ListboxSelect>>")
+
+    def on_press(self, event):
+        #####单击选中一行，Ctrl+单击切换，Shift+单击从锚点选到当前行#####
+        self.canvas.focus_set()
+        view_row = self.top + int(event.y // self.row_height)
+        if view_row >= self.view_count():
+            return
+        row = self.view_to_row(view_row)
+        anchor_view = self.row_to_view(self.anchor)
+        if event.state & SHIFT_MASK and anchor_view >= 0:
+            self.select_view_range(anchor_view, view_row)
+        elif event.state & CONTROL_MASK:
+            self.selected.toggle(row)
+            self.anchor = row
+        else:
+            self.selected = RowRanges((row,), (row + 1,))
+            self.anchor = row
+        self.active = row
+        self.drag_view_row = view_row
+        self.notify_selection()
+
+    def on_drag(self, event):
+        #####按住拖动时从锚点选到鼠标所在行，拖出边界时自动滚动#####
+        if self.drag_view_row is None:
+            return
+        if event.y < 0:
+            self.top -= 1
+        elif event.y > self.canvas.winfo_height():
+            self.top += 1
+        view_row = self.view_row_at(event.y)
+        anchor_view = self.row_to_view(self.anchor)
+        if view_row is None or anchor_view < 0 or view_row == self.drag_view_row:
+            self.redraw()
+            return
+        self.drag_view_row = view_row
+        self.active = self.view_to_row(view_row)
+        self.select_view_range(anchor_view, view_row)
+        self.notify_selection()
+
+    def on_release(self, event):
+        #####结束拖动选择#####
+        self.drag_view_row = None
+
+    def move_selection(self, amount, event):
+        #####方向键/翻页键移动选中行，按住Shift时从锚点扩展选择#####
+        total = self.view_count()
+        if total:
+            current = self.row_to_view(self.active)
+            view_row = max(0, min(total - 1, current + amount)) if current >= 0 else 0
+            self.active = self.view_to_row(view_row)
+            anchor_view = self.row_to_view(self.anchor)
+            if event.state & SHIFT_MASK and anchor_view >= 0:
+                self.select_view_range(anchor_view, view_row)
+            else:
+                self.anchor = self.active
+                self.selected = RowRanges((self.active,), (self.active + 1,))
+            self.see(self.active)
+            self.notify_selection()
+        return "break"
+
+    def select_all(self, event=None):
+        #####Ctrl+A选中所有显示的行#####
+        total = self.view_count()
+        if total:
+            self.select_view_range(0, total - 1)
+            self.notify_selection()
+        return "break"
@@ -0,0 +1,659 @@
+# @title   : picker_points.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Compact array-backed coordinate point store of ImageCoordinatePicker.
+# @License : MIT License
+#
+# 坐标点按id存放在整数数组中，不为每个点创建元组:
+#     xs, ys   array('i')  下标为点id
+#     alive    bytearray   下标为点id，删除后写为0(坐标的任何取值都是合法的，不用坐标做删除标记)
+#     order    array('i')  列表中从上到下的点id，删除的id留在原位作为标记
+#     blocks   array('i')  order每1024个位置中未删除的点数
+#     labels   {id: 名称}   只保存有名称的点
+# 每个点占13字节，一百万个点约13 MB(列表加元组约需100 MB以上)。
+# 在末尾追加与删除只修改标记和一个块计数。order中有删除标记时，行号与位置的换算先按块计数的累加和
+# 二分定位块，再在块内(最多1024个位置)逐个数，一百万个点约需几十微秒；按id查行号使用位置表
+# (id -> order中的位置)，在中间插入行后需要时重建一次。整体读取行顺序时得到去掉标记的副本并缓存到下次修改，
+# 只有在中间插入行时才真正清除标记。点id不会重用，已删除的id超过一半时按行顺序重新编号并释放数组(generation加1)，所以点id只在generation不变时保持不变。
+# 按行号访问与list of tuples相同(len、下标、切片、迭代)，批量换算画布坐标时有NumPy则使用NumPy。
+# 悬停和框选使用的网格索引(PointGrid)按点id登记，第一次查询时建立，之后随增删改逐个更新，
+# 每个单元格只保存一个id数组(每个点4字节)，坐标从存储中读取。
+
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from picker_core import SPATIAL_CELL_SIZE
+
+# 已删除的id占全部id的比例超过此值时压缩数组
+COMPACT_DEAD_RATIO = 0.5
+# id总数少于此值时不压缩
+COMPACT_MIN_IDS = 1024
+# 行顺序按此长度分块统计未删除的点数，按行号查找时先定位块再在块内逐个数
+ORDER_BLOCK = 1024
+# 点数少于此值时不使用NumPy(转换数组的开销大于逐点计算)
+NUMPY_MIN_POINTS = 2048
+
+# 懒加载的NumPy模块，False表示尚未尝试导入，None表示不可用
+numpy_module = False
+
+
+def load_numpy():
+    #####第一次需要时导入NumPy，不可用时返回None#####
+    global numpy_module
+    if numpy_module is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        numpy_module = numpy
+    return numpy_module
+
+
+class PackedPoints:
+    #####坐标点的只读快照(扁平的x、y数组)，可以交给后台线程保存#####
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values) // 2
+
+    def __getitem__(self, index):
+        values = self.values
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [(values[row * 2], values[row * 2 + 1]) for row in range(start, stop, step)]
+            chunk = values[start * 2:stop * 2]
+            return list(zip(chunk[0::2], chunk[1::2]))
+        if index < 0:
+            index += len(self)
+        return values[index * 2], values[index * 2 + 1]
+
+    def __iter__(self):
+        values = self.values
+        return zip(values[0::2], values[1::2])
+
+
+def pack_rows(xs, ys, order, labels):
+    #####按行顺序把点复制为扁平数组，返回(PackedPoints, {行号: 名称})#####
+    numpy = load_numpy() if len(order) >= NUMPY_MIN_POINTS else None
+    if numpy is not None:
+        ids = numpy.frombuffer(order, dtype=numpy.int32)
+        flat = numpy.empty(len(ids) * 2, dtype=numpy.int32)
+        flat[0::2] = numpy.frombuffer(xs, dtype=numpy.int32)[ids]
+        flat[1::2] = numpy.frombuffer(ys, dtype=numpy.int32)[ids]
+        values = array('i', flat.tobytes())
+        if labels:
+            rows = numpy.flatnonzero(numpy.isin(ids, numpy.fromiter(labels, dtype=numpy.int32, count=len(labels))))
+            labels = {int(row): labels[int(ids[row])] for row in rows}
+        del ids, flat
+        return PackedPoints(values), labels or {}
+
+    values = array('i', bytes(8 * len(order)))
+    values[0::2] = array('i', [xs[point_id] for point_id in order])
+    values[1::2] = array('i', [ys[point_id] for point_id in order])
+    if labels:
+        labels = {row: labels[point_id] for row, point_id in enumerate(order) if point_id in labels}
+    return PackedPoints(values), labels or {}
+
+
+class PointArrays:
+    #####界面线程上复制的原始数组(只做C层面的整块复制)，由后台线程调用pack()整理为按行顺序的快照#####
+    def __init__(self, store):
+        self.xs = array('i', store.xs)
+        self.ys = array('i', store.ys)
+        self.order = array('i', store.order)
+        self.alive = bytearray(store.alive) if store.dead_rows else None
+        self.labels = dict(store.labels)
+
+    def pack(self):
+        #####返回(PackedPoints, {行号: 名称})，order中已删除的id在这里去掉#####
+        order = self.order
+        if self.alive is not None:
+            numpy = load_numpy() if len(order) >= NUMPY_MIN_POINTS else None
+            if numpy is not None:
+                ids = numpy.frombuffer(order, dtype=numpy.int32)
+                alive = numpy.frombuffer(self.alive, dtype=numpy.uint8)
+                order = array('i', ids[alive[ids] == 1].tobytes())
+                del ids, alive
+            else:
+                alive = self.alive
+                order = array('i', [point_id for point_id in order if alive[point_id]])
+        return pack_rows(self.xs, self.ys, order, self.labels)
+
+
+class PointGrid:
+    #####按点id登记坐标点的均匀网格索引，每个单元格的id存放在整数数组中#####
+    def __init__(self, store, cell_size=SPATIAL_CELL_SIZE):
+        self.store = store
+        self.cell_size = cell_size
+        self.cells = {}  # (列, 行) -> array('i')点id
+        self.rebuild()
+
+    def rebuild(self):
+        #####按存储中现有的点重新建立索引#####
+        cells = {}
+        size = self.cell_size
+        xs, ys = self.store.xs, self.store.ys
+        for point_id in self.store.live_order():
+            key = (xs[point_id] // size, ys[point_id] // size)
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = array('i', (point_id,))
+            else:
+                cell.append(point_id)
+        self.cells = cells
+
+    def add(self, point_id):
+        #####登记一个点(坐标从存储中读取)#####
+        size = self.cell_size
+        key = (self.store.xs[point_id] // size, self.store.ys[point_id] // size)
+        cell = self.cells.get(key)
+        if cell is None:
+            self.cells[key] = array('i', (point_id,))
+        else:
+            cell.append(point_id)
+
+    def discard(self, point_id, x, y):
+        #####移除登记在(x, y)所在单元格的点#####
+        key = (x // self.cell_size, y // self.cell_size)
+        cell = self.cells.get(key)
+        if cell is None:
+            return
+        try:
+            cell.remove(point_id)
+        except ValueError:
+            return
+        if not cell:
+            del self.cells[key]
+
+    def move(self, point_id, old_x, old_y):
+        #####点从(old_x, old_y)移动到存储中的新坐标，单元格不变时不需要修改#####
+        size = self.cell_size
+        if (old_x // size, old_y // size) != (self.store.xs[point_id] // size, self.store.ys[point_id] // size):
+            self.discard(point_id, old_x, old_y)
+            self.add(point_id)
+
+    def query_rect(self, x0, y0, x1, y1):
+        #####返回坐标在矩形内(含边界)的点id列表#####
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        size = self.cell_size
+        col0, row0, col1, row1 = int(x0 // size), int(y0 // size), int(x1 // size), int(y1 // size)
+
+        # 查询范围比已有单元格还多时直接遍历已有单元格
+        if (col1 - col0 + 1) * (row1 - row0 + 1) > len(self.cells):
+            keys = [key for key in self.cells if col0 <= key[0] <= col1 and row0 <= key[1] <= row1]
+        else:
+            keys = [(col, row) for col in range(col0, col1 + 1) for row in range(row0, row1 + 1)
+                    if (col, row) in self.cells]
+
+        found = []
+        xs, ys = self.store.xs, self.store.ys
+        for key in keys:
+            cell = self.cells[key]
+            if col0 < key[0] < col1 and row0 < key[1] < row1:
+                # 完全位于矩形内部的单元格不需要逐点比较
+                found.extend(cell)
+            else:
+                found.extend(point_id for point_id in cell
+                             if x0 <= xs[point_id] <= x1 and y0 <= ys[point_id] <= y1)
+        return found
+
+    def nearest(self, x, y, max_distance):
+        #####返回与(x, y)距离不超过max_distance的最近点id，没有时返回None#####
+        best = None
+        best_distance = max_distance * max_distance
+        xs, ys = self.store.xs, self.store.ys
+        for point_id in self.query_rect(x - max_distance, y - max_distance, x + max_distance, y + max_distance):
+            dx = xs[point_id] - x
+            dy = ys[point_id] - y
+            distance = dx * dx + dy * dy
+            if distance <= best_distance:
+                best, best_distance = point_id, distance
+        return best
+
+    def nbytes(self):
+        #####估算单元格数组占用的内存#####
+        return sum(len(cell) for cell in self.cells.values()) * 4
+
+
+class PointStore:
+    #####以整数数组保存的坐标点，按行号访问的接口与坐标点元组列表相同#####
+    def __init__(self, points=()):
+        self.xs = array('i')
+        self.ys = array('i')
+        self.alive = bytearray()
+        self.order = array('i')
+        self.labels = {}
+        self.count = 0
+        self.dead_rows = 0  # order中已删除(尚未清除)的id数量
+        self.blocks = array('i')  # order每ORDER_BLOCK个位置中未删除的id数量
+        self.block_sums = None  # blocks的累加和，按行号查找位置时建立
+        self.positions = None  # 点id -> 在order中的位置，第一次按id查找行号时建立
+        self.live_cache = None  # 去掉已删除id后的行顺序(只读)，按行整体读取时建立
+        self.generation = 0  # 点id被重新分配(压缩、清空)的次数
+        self.grid = None  # 网格索引，第一次查询时建立
+        self.extend(points)
+
+    # ---- 按id访问 ----
+
+    def add(self, x, y, label=None):
+        #####在末尾添加一个点，返回点id#####
+        point_id = len(self.xs)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.alive.append(1)
+        self.append_rows(array('i', (point_id,)))
+        if label:
+            self.labels[point_id] = label
+        if self.grid is not None:
+            self.grid.add(point_id)
+        return point_id
+
+    def remove_id(self, point_id):
+        #####按id删除一个点(order中只留下标记)，id不存在时返回False#####
+        if not self.mark_deleted(point_id):
+            return False
+        self.compact_if_sparse()
+        return True
+
+    def mark_deleted(self, point_id, position=None):
+        #####把id标记为已删除(不压缩)，position为其在order中的位置(未知时按id查找)，id不存在时返回False#####
+        if not self.contains_id(point_id):
+            return False
+        if position is None:
+            position = self.position_of_id(point_id)
+        self.alive[point_id] = 0
+        self.labels.pop(point_id, None)
+        self.count -= 1
+        self.dead_rows += 1
+        self.blocks[position // ORDER_BLOCK] -= 1
+        self.block_sums = None
+        self.live_cache = None
+        if self.grid is not None:
+            self.grid.discard(point_id, self.xs[point_id], self.ys[point_id])
+        return True
+
+    def contains_id(self, point_id):
+        #####检查id对应的点是否存在#####
+        return 0 <= point_id < len(self.alive) and self.alive[point_id] == 1
+
+    def point(self, point_id):
+        #####按id返回(x, y)#####
+        return self.xs[point_id], self.ys[point_id]
+
+    def move_id(self, point_id, x, y):
+        #####按id修改坐标#####
+        old_x, old_y = self.xs[point_id], self.ys[point_id]
+        self.xs[point_id] = x
+        self.ys[point_id] = y
+        if self.grid is not None:
+            self.grid.move(point_id, old_x, old_y)
+
+    # ---- 行号与order中位置的换算 ----
+
+    def append_rows(self, new_ids):
+        #####在order末尾追加新id，块计数与位置表随之增长#####
+        order, blocks = self.order, self.blocks
+        start = len(order)
+        order.extend(new_ids)
+        end = len(order)
+        if self.positions is not None:
+            self.positions.extend(range(start, end))
+        # 新位置都是有效的点，逐块累加
+        for block in range(start // ORDER_BLOCK, (end - 1) // ORDER_BLOCK + 1):
+            if block == len(blocks):
+                blocks.append(0)
+            blocks[block] += min(end, (block + 1) * ORDER_BLOCK) - max(start, block * ORDER_BLOCK)
+        self.count += end - start
+        self.block_sums = None
+        self.live_cache = None
+
+    def reset_rows(self, order):
+        #####用不含已删除id的order替换行顺序，重新计算块计数，位置表在下次需要时重建#####
+        self.order = order
+        self.dead_rows = 0
+        full, rest = divmod(len(order), ORDER_BLOCK)
+        self.blocks = array('i', [ORDER_BLOCK]) * full
+        if rest:
+            self.blocks.append(rest)
+        self.block_sums = None
+        self.positions = None
+        self.live_cache = None
+
+    def purge_rows(self):
+        #####从order中清除已删除的id(之后按行插入时才调用，或被live_order的结果代替)#####
+        if self.dead_rows:
+            self.reset_rows(array('i', self.live_order()))
+
+    def position(self, row):
+        #####第row行在order中的位置(已删除的id仍占位)#####
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError("坐标点行号超出范围")
+        if not self.dead_rows:
+            return row
+        if self.block_sums is None:
+            self.block_sums = list(accumulate(self.blocks))
+        block = bisect_right(self.block_sums, row)
+        remaining = row - (self.block_sums[block - 1] if block else 0)
+        alive, order = self.alive, self.order
+        position = block * ORDER_BLOCK
+        while True:
+            if alive[order[position]]:
+                if not remaining:
+                    return position
+                remaining -= 1
+            position += 1
+
+    def position_of_id(self, point_id):
+        #####点id在order中的位置，位置表在第一次使用时建立#####
+        if self.positions is None:
+            numpy = load_numpy() if len(self.order) >= NUMPY_MIN_POINTS else None
+            if numpy is not None:
+                positions = numpy.zeros(len(self.xs), dtype=numpy.int32)
+                positions[numpy.frombuffer(self.order, dtype=numpy.int32)] = numpy.arange(
+                    len(self.order), dtype=numpy.int32)
+                self.positions = array('i', positions.tobytes())
+                del positions
+            else:
+                positions = array('i', bytes(4 * len(self.xs)))
+                for position, order_id in enumerate(self.order):
+                    positions[order_id] = position
+                self.positions = positions
+        return self.positions[point_id]
+
+    def row_of_position(self, position):
+        #####order中的位置对应的行号#####
+        if not self.dead_rows:
+            return position
+        if self.block_sums is None:
+            self.block_sums = list(accumulate(self.blocks))
+        block = position // ORDER_BLOCK
+        row = self.block_sums[block - 1] if block else 0
+        alive, order = self.alive, self.order
+        return row + sum(alive[order[index]] for index in range(block * ORDER_BLOCK, position))
+
+    # ---- 按行号访问 ----
+
+    def live_order(self):
+        #####按行顺序的点id(只读，去掉已删除的id，结果缓存到下次修改)#####
+        if not self.dead_rows:
+            return self.order
+        if self.live_cache is None:
+            order = self.order
+            numpy = load_numpy() if len(order) >= NUMPY_MIN_POINTS else None
+            if numpy is not None:
+                ids = numpy.frombuffer(order, dtype=numpy.int32)
+                alive = numpy.frombuffer(self.alive, dtype=numpy.uint8)
+                self.live_cache = array('i', ids[alive[ids] == 1].tobytes())
+                del ids, alive
+            else:
+                alive = self.alive
+                self.live_cache = array('i', [point_id for point_id in order if alive[point_id]])
+        return self.live_cache
+
+    def id_at(self, index):
+        #####第index行的点id#####
+        return self.order[self.position(index)]
+
+    def index_of(self, point_id):
+        #####点id所在的行号，不存在时返回-1#####
+        if not self.contains_id(point_id):
+            return -1
+        return self.row_of_position(self.position_of_id(point_id))
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __getitem__(self, index):
+        xs, ys = self.xs, self.ys
+        if isinstance(index, slice):
+            return [(xs[point_id], ys[point_id]) for point_id in self.live_order()[index]]
+        point_id = self.id_at(index)
+        return xs[point_id], ys[point_id]
+
+    def __setitem__(self, index, point):
+        self.move_id(self.id_at(index), *point)
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice):
+            position = self.position(index)
+            self.mark_deleted(self.order[position], position)
+            self.compact_if_sparse()
+            return
+        self.purge_rows()
+        order = self.order
+        removed = order[index]
+        alive, labels, grid = self.alive, self.labels, self.grid
+        for point_id in removed:
+            alive[point_id] = 0
+            labels.pop(point_id, None)
+            if grid is not None:
+                grid.discard(point_id, self.xs[point_id], self.ys[point_id])
+        self.count -= len(removed)
+        del order[index]
+        self.reset_rows(order)
+        self.compact_if_sparse()
+
+    def __iter__(self):
+        xs, ys = self.xs, self.ys
+        for point_id in self.live_order():
+            yield xs[point_id], ys[point_id]
+
+    def label(self, index):
+        #####第index行的名称，没有名称时返回""#####
+        return self.labels.get(self.id_at(index), "")
+
+    def set_label(self, index, label):
+        #####设置第index行的名称，空字符串表示删除名称#####
+        point_id = self.id_at(index)
+        if label:
+            self.labels[point_id] = label
+        else:
+            self.labels.pop(point_id, None)
+
+    def labels_by_index(self, start=0, stop=None):
+        #####[start, stop)行中有名称的点: {行号 - start: 名称}#####
+        if not self.labels:
+            return {}
+        stop = self.count if stop is None else min(stop, self.count)
+        labels = self.labels
+        # 少量行按行号查找，不需要整理整个行顺序
+        if stop - start <= ORDER_BLOCK:
+            found = ((row, self.id_at(row)) for row in range(start, stop))
+            return {row - start: labels[point_id] for row, point_id in found if point_id in labels}
+        order = self.live_order()
+        return {row - start: labels[order[row]] for row in range(start, stop) if order[row] in labels}
+
+    # ---- 批量修改 ----
+
+    def append_values(self, points):
+        #####把点的坐标追加到xs、ys(不修改行顺序)#####
+        values = array('i', [value for point in points for value in point])
+        self.xs.extend(values[0::2])
+        self.ys.extend(values[1::2])
+        self.alive.extend(b"\x01" * (len(values) // 2))
+
+    def extend(self, points, labels=None):
+        #####在末尾添加多个点，labels为{相对行号: 名称}#####
+        self.insert(self.count, points, labels)
+
+    def insert(self, index, points, labels=None):
+        #####在第index行之前插入多个点，labels为{相对行号: 名称}#####
+        first_id = len(self.xs)
+        self.append_values(points)
+        added = len(self.xs) - first_id
+        if not added:
+            return
+        new_ids = array('i', range(first_id, first_id + added))
+        if index >= self.count:
+            self.append_rows(new_ids)
+        else:
+            # 插入到中间时行位置整体移动，先清除已删除的id
+            self.purge_rows()
+            order = self.order
+            order[index:index] = new_ids
+            self.reset_rows(order)
+            self.count += added
+        self.index_new_ids(first_id)
+        if labels:
+            self.labels.update((first_id + offset, label) for offset, label in labels.items()
+                               if label and 0 <= offset < added)
+
+    def delete_indices(self, indices):
+        #####一次删除多个(不一定连续的)行#####
+        # 先换算全部位置: 删除只留标记，但之后的行号会随之变化
+        order = self.order
+        for position in [self.position(index) for index in indices]:
+            self.mark_deleted(order[position], position)
+        self.compact_if_sparse()
+
+    def insert_indices(self, indices, points, labels=None):
+        #####把点放回各自的最终行号(indices为升序)，labels为{在points中的序号: 名称}#####
+        order = self.live_order()
+        first_id = len(self.xs)
+        self.append_values(points)
+        restored = dict(zip(indices, range(first_id, len(self.xs))))
+        remaining = iter(order)
+        total = len(order) + len(restored)
+        self.reset_rows(array('i', [restored[index] if index in restored else next(remaining)
+                                    for index in range(total)]))
+        self.count += len(restored)
+        self.index_new_ids(first_id)
+        if labels:
+            self.labels.update((first_id + offset, label) for offset, label in labels.items()
+                               if label and 0 <= offset < len(restored))
+
+    def index_new_ids(self, first_id):
+        #####把first_id之后新分配的id登记到已建立的网格索引#####
+        if self.grid is not None:
+            add = self.grid.add
+            for point_id in range(first_id, len(self.xs)):
+                add(point_id)
+
+    def compact_if_sparse(self):
+        #####已删除的id过多时按行顺序重新编号，释放已删除点占用的空间，返回是否压缩#####
+        total = len(self.xs)
+        if total < COMPACT_MIN_IDS or total - self.count <= total * COMPACT_DEAD_RATIO:
+            return False
+        order = self.live_order()
+        xs, ys, labels = self.xs, self.ys, self.labels
+        self.xs = array('i', [xs[point_id] for point_id in order])
+        self.ys = array('i', [ys[point_id] for point_id in order])
+        self.alive = bytearray(b"\x01") * len(order)
+        if labels:
+            self.labels = {row: labels[point_id] for row, point_id in enumerate(order) if point_id in labels}
+        self.reset_rows(array('i', range(len(order))))
+        self.positions = array('i', self.order)
+        self.generation += 1
+        self.grid = None
+        return True
+
+    def replace(self, points):
+        #####用新的坐标点替换全部内容(重新分配id)#####
+        self.clear()
+        self.extend(points)
+
+    def clear(self):
+        #####删除全部坐标点并释放数组#####
+        self.xs = array('i')
+        self.ys = array('i')
+        self.alive = bytearray()
+        self.labels = {}
+        self.count = 0
+        self.reset_rows(array('i'))
+        self.generation += 1
+        self.grid = None
+
+    def snapshot(self):
+        #####按行顺序复制为扁平数组的只读快照#####
+        return pack_rows(self.xs, self.ys, self.live_order(), None)[0]
+
+    def raw_arrays(self):
+        #####整块复制原始数组(界面线程上只需几毫秒)，按行整理留给后台线程#####
+        return PointArrays(self)
+
+    # ---- 批量计算 ----
+
+    def spatial_index(self):
+        #####返回网格索引，尚未建立或id被重新分配后重新建立#####
+        if self.grid is None:
+            self.grid = PointGrid(self)
+        return self.grid
+
+    def nearest_id(self, x, y, max_distance):
+        #####与背景坐标(x, y)距离不超过max_distance的最近点id，没有时返回None#####
+        return self.spatial_index().nearest(x, y, max_distance)
+
+    def rows_in_rect(self, x0, y0, x1, y1):
+        #####坐标在矩形内的点的升序行号#####
+        ids = self.spatial_index().query_rect(x0, y0, x1, y1)
+        if not ids:
+            return []
+        if len(ids) == 1:
+            return [self.index_of(ids[0])]
+        wanted = set(ids)
+        return [row for row, point_id in enumerate(self.live_order()) if point_id in wanted]
+
+    def to_canvas(self, origin_x, origin_y, scale_x, scale_y, start=0):
+        #####第start行起所有点的画布坐标(与background_to_canvas相同的四舍五入)，返回(x列表, y列表)#####
+        order = self.live_order()
+        numpy = load_numpy() if len(order) - start >= NUMPY_MIN_POINTS else None
+        if numpy is not None:
+            ids = numpy.frombuffer(order, dtype=numpy.int32)[start:]
+            xs = numpy.frombuffer(self.xs, dtype=numpy.int32)[ids]
+            ys = numpy.frombuffer(self.ys, dtype=numpy.int32)[ids]
+            canvas_xs = (numpy.rint(xs / scale_x).astype(numpy.int64) + origin_x).tolist()
+            canvas_ys = (numpy.rint(ys / scale_y).astype(numpy.int64) + origin_y).tolist()
+            # 释放对数组缓冲区的引用，之后数组才能继续增长
+            del ids, xs, ys
+            return canvas_xs, canvas_ys
+        xs, ys = self.xs, self.ys
+        ids = order[start:]
+        return ([origin_x + int(round(xs[point_id] / scale_x)) for point_id in ids],
+                [origin_y + int(round(ys[point_id] / scale_y)) for point_id in ids])
+
+    def filter_rows(self, row_filter):
+        #####返回满足RowFilter的升序行号，名称条件只检查有名称的点#####
+        order = self.live_order()
+        if row_filter.text:
+            text = row_filter.text
+            rows = [row for row, label in self.labels_by_index().items() if text in label.casefold()]
+            rows.sort()
+        else:
+            rows = None
+        x_low, x_high = row_filter.x_range
+        y_low, y_high = row_filter.y_range
+        numpy = load_numpy() if rows is None and len(order) >= NUMPY_MIN_POINTS else None
+        if numpy is not None:
+            ids = numpy.frombuffer(order, dtype=numpy.int32)
+            xs = numpy.frombuffer(self.xs, dtype=numpy.int32)[ids]
+            ys = numpy.frombuffer(self.ys, dtype=numpy.int32)[ids]
+            mask = numpy.ones(len(ids), dtype=bool)
+            for values, low, high in ((xs, x_low, x_high), (ys, y_low, y_high)):
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values <= high
+            result = numpy.flatnonzero(mask).tolist()
+            del ids, xs, ys
+            return result
+        xs, ys = self.xs, self.ys
+        return [
+            row for row in (rows if rows is not None else range(len(order)))
+            if (x_low is None or xs[order[row]] >= x_low) and (x_high is None or xs[order[row]] <= x_high)
+            and (y_low is None or ys[order[row]] >= y_low) and (y_high is None or ys[order[row]] <= y_high)
+        ]
+
+    def nbytes(self):
+        #####估算数组占用的内存(不含名称)#####
+        size = (len(self.xs) + len(self.ys) + len(self.order)) * self.xs.itemsize + len(self.alive)
+        return size + (self.grid.nbytes() if self.grid is not None else 0)
@@ -0,0 +1,185 @@
+# @title   : picker_profile.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Optional hot-path profiling, frame-time and Tk call instrumentation for ImageCoordinatePicker.
+# @License : MIT License
+#
+# 关闭时每次调用只多一次标志判断；开启后记录:
+#     - 被@instrument标记的函数每次调用的耗时(按名称与类别汇总，类别如 pil/tk/app)
+#     - 输入事件到其后第一次绘制完成(绘制类调用之后的空闲)之间的延迟，以及帧间隔
+#     - 经过TkCallProxy的Tk命令次数(按控件与子命令统计，例如 "canvas coords")
+# 记录可以导出为Chrome trace格式(chrome://tracing 或 https://ui.perfetto.dev 打开)。
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+
+# 保留的调用记录条数(超出后丢弃最早的记录)
+TRACE_MAX_EVENTS = 200000
+# 保留的帧记录数量
+FRAME_HISTORY = 240
+
+
+class Profiler:
+    #####收集调用耗时、帧时间与Tk调用次数#####
+    def __init__(self, max_events=TRACE_MAX_EVENTS):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=max_events)  # (名称, 类别, 开始时间, 耗时, 线程id)
+        self.stats = {}  # 名称 -> [次数, 总耗时, 最大耗时]
+        self.recent = Counter()  # 上次取出排行后各名称的累计耗时
+        self.frames = deque(maxlen=FRAME_HISTORY)  # (时间, 帧间隔, 输入延迟或None, 本帧Tk调用次数)
+        self.tk_calls = Counter()
+        self.frame_tk_calls = 0
+        self.pending_input = None  # 尚未刷新到画面的最早输入事件时间
+        self.last_frame = None
+        # 界面设置的回调: 绘制类调用之后在下一次空闲时调用mark_frame
+        self.frame_scheduler = None
+        self.frame_scheduled = False
+
+    def reset(self):
+        #####清空所有记录#####
+        with self.lock:
+            self.origin = time.perf_counter()
+            self.events.clear()
+            self.stats = {}
+            self.recent.clear()
+            self.frames.clear()
+            self.tk_calls.clear()
+            self.frame_tk_calls = 0
+            self.pending_input = None
+            self.last_frame = None
+            self.frame_scheduled = False
+
+    def record(self, name, category, start, duration):
+        #####记录一次调用(可以在后台线程中调用)#####
+        with self.lock:
+            self.events.append((name, category, start, duration, threading.get_ident()))
+            entry = self.stats.get(name)
+            if entry is None:
+                self.stats[name] = [1, duration, duration]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                if duration > entry[2]:
+                    entry[2] = duration
+            self.recent[name] += duration
+
+    def count_tk_call(self, key):
+        #####记录一次Tk命令#####
+        if self.enabled:
+            self.tk_calls[key] += 1
+            self.frame_tk_calls += 1
+
+    def painted(self):
+        #####绘制类调用结束后请求在下一次空闲(画面刷新)时记录一帧#####
+        if self.frame_scheduler is not None and not self.frame_scheduled:
+            self.frame_scheduled = True
+            self.frame_scheduler()
+
+    def mark_input(self):
+        #####记录输入事件的时间，只保留尚未刷新的最早一次#####
+        if self.pending_input is None:
+            self.pending_input = time.perf_counter()
+
+    def mark_frame(self):
+        #####在一次空闲处理(画面刷新)后调用，记录帧间隔与输入延迟#####
+        now = time.perf_counter()
+        interval = now - self.last_frame if self.last_frame is not None else 0.0
+        latency = now - self.pending_input if self.pending_input is not None else None
+        self.frames.append((now, interval, latency, self.frame_tk_calls))
+        self.last_frame = now
+        self.pending_input = None
+        self.frame_tk_calls = 0
+        self.frame_scheduled = False
+        return latency
+
+    def take_offenders(self, count=5):
+        #####返回上次调用以来累计耗时最多的count项[(名称, 耗时)]，并重新开始统计#####
+        with self.lock:
+            offenders = self.recent.most_common(count)
+            self.recent.clear()
+        return offenders
+
+    def frame_summary(self):
+        #####最近的帧: (平均帧间隔, 最大帧间隔, 平均输入延迟, 最大输入延迟, 平均每帧Tk调用)，没有帧时返回None#####
+        frames = [frame for frame in self.frames if frame[1] > 0]
+        if not frames:
+            return None
+        intervals = [frame[1] for frame in frames]
+        latencies = [frame[2] for frame in frames if frame[2] is not None]
+        return (
+            sum(intervals) / len(intervals), max(intervals),
+            sum(latencies) / len(latencies) if latencies else 0.0, max(latencies, default=0.0),
+            sum(frame[3] for frame in frames) / len(frames)
+        )
+
+    def chrome_trace(self):
+        #####生成Chrome trace格式的字典(时间单位为微秒)#####
+        with self.lock:
+            events = list(self.events)
+            frames = list(self.frames)
+            tk_calls = dict(self.tk_calls)
+        trace = [
+            {"name": name, "cat": category, "ph": "X", "pid": 1, "tid": thread,
+             "ts": (start - self.origin) * 1e6, "dur": duration * 1e6}
+            for name, category, start, duration, thread in events
+        ]
+        for now, interval, latency, calls in frames:
+            args = {"interval_ms": interval * 1000, "tk_calls": calls}
+            if latency is not None:
+                args["latency_ms"] = latency * 1000
+            trace.append({"name": "frame", "cat": "frame", "ph": "i", "s": "g", "pid": 1, "tid": 0,
+                          "ts": (now - self.origin) * 1e6, "args": args})
+        return {"traceEvents": trace, "displayTimeUnit": "ms", "otherData": {"tk_calls": tk_calls}}
+
+    def dump_chrome_trace(self, path):
+        #####把记录写成Chrome trace文件#####
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# 全局的性能记录器，默认关闭
+PROFILER = Profiler()
+
+
+def instrument(name, category="app", paint=False):
+    #####装饰器: 性能记录开启时记录函数每次调用的耗时，paint为True表示调用会改变画面(之后记录一帧)#####
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PROFILER.record(name, category, start, time.perf_counter() - start)
+                if paint:
+                    PROFILER.painted()
+        return wrapper
+    return decorator
+
+
+class TkCallProxy:
+    #####替换控件的tk属性，统计经过该控件发出的Tk命令，其余属性原样转发#####
+    def __init__(self, tkapp, label, profiler=PROFILER):
+        self.tkapp = tkapp
+        self.label = label
+        self.profiler = profiler
+
+    def call(self, *args):
+        # 控件命令的第一个参数是控件路径，统计其后的子命令
+        if args and isinstance(args[0], str) and args[0].startswith("."):
+            key = f"{self.label} {args[1]}" if len(args) > 1 else self.label
+        else:
+            key = f"{self.label} {args[0]}" if args else self.label
+        self.profiler.count_tk_call(key)
+        return self.tkapp.call(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.tkapp, name)
@@ -0,0 +1,361 @@
+# @title   : picker_project.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Append-only project files with incremental background autosave for ImageCoordinatePicker.
+# @License : MIT License
+#
+# 项目文件是UTF-8的JSON Lines日志，第一行是文件头，之后每行是一条记录:
+#     {"format": "ImageCoordinatePicker project", "version": 1}
+#     {"op": "background", "path": "bg.png", "sha1": "...", "width": 1920, "height": 1080}
+#     {"op": "overlay", "id": 3, "path": "logo.png", "name": "logo", "x": 120, "y": 80, "locked": false, "z": 0}
+#     {"op": "overlay", "id": 3, "x": 140}          <- 之后只写出变化的字段
+#     {"op": "remove", "id": 3}
+#     {"op": "order", "ids": [5, 4]}
+#     {"op": "points", "start": 0, "xy": [10, 20, 30, 40]}   <- 截断到start后追加
+#     {"op": "labels", "labels": {"0": "开始"}}                <- 坐标点名称(按行号)，每次整体替换
+#     {"op": "mode", "mode": "overlay"}
+# 读取时按顺序重放记录。自动保存只追加与上次保存相比变化的记录，日志增长到一定大小后
+# 在后台线程中压缩为完整快照(先写临时文件再替换)。崩溃时写了一半的最后一行会被忽略。
+
+import hashlib
+import json
+import os
+import threading
+
+PROJECT_FORMAT = "ImageCoordinatePicker project"
+PROJECT_VERSION = 1
+PROJECT_EXTENSION = ".icpproj"
+# 叠加图片记录中的字段(不含id)
+OVERLAY_FIELDS = ("path", "name", "x", "y", "locked", "z")
+# 比较坐标点列表时每次比较的切片长度
+POINTS_COMPARE_CHUNK = 4096
+# 每条坐标点记录最多包含的点数，避免单次序列化长时间占用解释器
+POINTS_RECORD_CHUNK = 10000
+# 追加的日志超过此大小且超过上次快照的大小时压缩
+COMPACT_MIN_BYTES = 1024 * 1024
+# 计算背景图片哈希时每次读取的字节数
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_sha1(path):
+    #####分块计算文件的SHA-1#####
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def flat_prefix_length(first, second):
+    #####比较两个扁平整数数组，返回相同前缀的元素个数(只在不同时二分查找)#####
+    length = min(len(first), len(second))
+    if first[:length] == second[:length]:
+        return length
+    # 前low个元素相同，[low, high)中有不同的元素
+    low, high = 0, length
+    while high - low > 1:
+        middle = (low + high) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def common_prefix_length(first, second):
+    #####按切片比较两个坐标点列表，返回相同前缀的长度，两个都是扁平数组快照时直接比较数组#####
+    first_values = getattr(first, "values", None)
+    second_values = getattr(second, "values", None)
+    if first_values is not None and second_values is not None:
+        return flat_prefix_length(first_values, second_values) // 2
+    length = min(len(first), len(second))
+    start = 0
+    while start < length:
+        end = min(start + POINTS_COMPARE_CHUNK, length)
+        if first[start:end] != second[start:end]:
+            # 只在不同的切片内逐项查找
+            while first[start] == second[start]:
+                start += 1
+            return start
+        start = end
+    return length
+
+
+def encode_record(record):
+    #####把一条记录编码为一行紧凑的JSON#####
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class ProjectState:
+    #####项目的完整状态: 背景、叠加图片(按id)、列表顺序、坐标点及其名称与模式#####
+    def __init__(self):
+        self.background_path = None
+        self.background_sha1 = None
+        self.width = 0
+        self.height = 0
+        self.overlays = {}  # id -> {字段: 值}
+        self.order = []  # 叠加图片列表中的顺序(id列表)
+        self.points = []
+        self.point_labels = {}  # 行号 -> 坐标点名称
+        self.mode = "coordinate"
+
+    def background_record(self):
+        #####背景图片记录#####
+        return {
+            "op": "background", "path": self.background_path, "sha1": self.background_sha1,
+            "width": self.width, "height": self.height
+        }
+
+    def resolve_points(self):
+        #####把界面线程复制的原始点数组(PointArrays)整理为按行顺序的快照与名称，在后台线程中调用#####
+        if hasattr(self.points, "pack"):
+            self.points, self.point_labels = self.points.pack()
+
+    def labels_record(self):
+        #####坐标点名称记录(JSON的键只能是字符串)#####
+        return {"op": "labels", "labels": {str(row): label for row, label in sorted(self.point_labels.items())}}
+
+    def apply(self, record):
+        #####重放一条记录#####
+        op = record.get("op")
+        if op == "background":
+            self.background_path = record.get("path")
+            self.background_sha1 = record.get("sha1")
+            self.width = record.get("width", 0)
+            self.height = record.get("height", 0)
+        elif op == "overlay":
+            overlay = self.overlays.setdefault(record["id"], {})
+            overlay.update((key, record[key]) for key in OVERLAY_FIELDS if key in record)
+            if record["id"] not in self.order:
+                self.order.append(record["id"])
+        elif op == "remove":
+            self.overlays.pop(record["id"], None)
+            if record["id"] in self.order:
+                self.order.remove(record["id"])
+        elif op == "order":
+            self.order = [key for key in record["ids"] if key in self.overlays]
+        elif op == "points":
+            xy = record.get("xy", [])
+            del self.points[record["start"]:]
+            self.points.extend(zip(xy[0::2], xy[1::2]))
+        elif op == "labels":
+            self.point_labels = {int(row): label for row, label in record.get("labels", {}).items()}
+        elif op == "mode":
+            self.mode = record["mode"]
+        else:
+            raise ValueError(f"未知的项目记录: {op}")
+
+    def iter_records(self):
+        #####逐条产出描述完整状态的记录(用于压缩)#####
+        yield self.background_record()
+        for key in self.order:
+            record = {"op": "overlay", "id": key}
+            record.update(self.overlays[key])
+            yield record
+        yield from iter_points_records(self.points, 0)
+        if self.point_labels:
+            yield self.labels_record()
+        if self.mode != "coordinate":
+            yield {"op": "mode", "mode": self.mode}
+
+    def iter_changes(self, saved):
+        #####逐条产出从saved到当前状态所需的记录#####
+        if (self.background_path, self.background_sha1, self.width, self.height) != (
+                saved.background_path, saved.background_sha1, saved.width, saved.height):
+            yield self.background_record()
+
+        for key in saved.order:
+            if key not in self.overlays:
+                yield {"op": "remove", "id": key}
+        for key in self.order:
+            old = saved.overlays.get(key, {})
+            changed = {field: value for field, value in self.overlays[key].items() if old.get(field) != value}
+            if changed or key not in saved.overlays:
+                record = {"op": "overlay", "id": key}
+                record.update(changed)
+                yield record
+        # 新增的图片按顺序追加，顺序只在其他情况下变化时才需要记录
+        kept = [key for key in saved.order if key in self.overlays]
+        if self.order != kept + [key for key in self.order if key not in saved.overlays]:
+            yield {"op": "order", "ids": self.order}
+
+        start = common_prefix_length(saved.points, self.points)
+        if start != len(saved.points) or start != len(self.points):
+            yield from iter_points_records(self.points, start)
+        if self.point_labels != saved.point_labels:
+            yield self.labels_record()
+
+        if self.mode != saved.mode:
+            yield {"op": "mode", "mode": self.mode}
+
+    def to_layout(self):
+        #####转换为与界面无关的布局模型#####
+        from picker_core import Layout, OverlayItem
+
+        overlays = [
+            OverlayItem(overlay.get("name", ""), overlay.get("x", 0), overlay.get("y", 0), path=overlay.get("path"))
+            for overlay in (self.overlays[key] for key in self.order)
+        ]
+        name = os.path.splitext(os.path.basename(self.background_path))[0] if self.background_path else None
+        return Layout(self.width, self.height, list(self.points), overlays, self.background_path, name)
+
+
+def iter_points_records(points, start):
+    #####从start开始把坐标点分段写成记录，没有点时写出一条截断记录#####
+    if start >= len(points):
+        yield {"op": "points", "start": start, "xy": []}
+        return
+    for chunk_start in range(start, len(points), POINTS_RECORD_CHUNK):
+        chunk = points[chunk_start:chunk_start + POINTS_RECORD_CHUNK]
+        yield {"op": "points", "start": chunk_start, "xy": [value for point in chunk for value in point]}
+
+
+def read_project(path):
+    #####读取项目文件并重放所有记录，返回ProjectState#####
+    state = ProjectState()
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != PROJECT_FORMAT:
+        raise ValueError("不是有效的项目文件")
+    if header.get("version", 0) > PROJECT_VERSION:
+        raise ValueError(f"项目文件版本过新: {header.get('version')}")
+
+    last = len(lines) - 1
+    for number, line in enumerate(lines[1:], 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # 写入中途崩溃只会损坏最后一行
+            if number == last or (number == last - 1 and not lines[last].strip()):
+                break
+            raise ValueError(f"项目文件第 {number + 1} 行已损坏")
+        state.apply(record)
+    return state
+
+
+class ProjectWriter:
+    #####向一个项目文件追加变化，必要时压缩为完整快照#####
+    def __init__(self, path):
+        self.path = path
+        self.saved = None  # 上次写入后的状态，None表示需要写出完整快照
+        self.snapshot_bytes = 0
+        self.journal_bytes = 0
+
+    def save(self, state):
+        #####保存状态，返回写出的字节数(没有变化时为0)#####
+        state.resolve_points()
+        # 背景图片未变化时沿用已计算的哈希
+        if self.saved is not None and self.saved.background_path == state.background_path:
+            state.background_sha1 = self.saved.background_sha1
+        elif state.background_path and state.background_sha1 is None:
+            try:
+                state.background_sha1 = file_sha1(state.background_path)
+            except OSError:
+                pass
+
+        if self.saved is None or self.journal_bytes > max(COMPACT_MIN_BYTES, self.snapshot_bytes):
+            return self.compact(state)
+
+        data = "".join(encode_record(record) for record in state.iter_changes(self.saved))
+        if data:
+            with open(self.path, 'a', encoding='utf-8', newline='\n') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_bytes += len(data.encode("utf-8"))
+        self.saved = state
+        return len(data)
+
+    def compact(self, state):
+        #####写出完整快照替换原文件(先写临时文件，避免中途失败留下损坏的项目)#####
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        written = 0
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            header = encode_record({"format": PROJECT_FORMAT, "version": PROJECT_VERSION})
+            f.write(header)
+            written += len(header.encode("utf-8"))
+            for record in state.iter_records():
+                line = encode_record(record)
+                f.write(line)
+                written += len(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.saved = state
+        self.snapshot_bytes = written
+        self.journal_bytes = 0
+        return written
+
+
+class AutosaveWorker:
+    #####后台自动保存线程: 只保留最新提交的状态，界面线程提交后立即返回#####
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = None  # (路径, 状态)
+        self.busy = False
+        self.stopped = False
+        self.writers = {}
+        self.error = None
+        self.saved_count = 0  # 已完成的保存次数(包括没有变化的)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, path, state):
+        #####提交要保存的状态，尚未写出的旧状态会被替换#####
+        with self.condition:
+            self.pending = (path, state)
+            self.condition.notify()
+
+    def forget(self, path):
+        #####下次保存到path时重新写出完整快照(如打开项目后图片id已变化)#####
+        with self.condition:
+            self.writers.pop(path, None)
+
+    def is_idle(self):
+        #####没有待保存或正在保存的状态#####
+        with self.condition:
+            return self.pending is None and not self.busy
+
+    def run(self):
+        #####线程主循环#####
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                path, state = self.pending
+                self.pending = None
+                self.busy = True
+                writer = self.writers.setdefault(path, ProjectWriter(path))
+
+            try:
+                writer.save(state)
+                error = None
+            except Exception as e:
+                # 写入失败时下次重新写出完整快照
+                writer.saved = None
+                error = str(e)
+
+            with self.condition:
+                self.error = error
+                self.saved_count += 1
+                self.busy = False
+                self.condition.notify_all()
+
+    def stop(self, timeout=None):
+        #####写完已提交的状态后结束线程#####
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
@@ -0,0 +1,126 @@
+# @title   : renpy_export.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Generates Ren'Py screen language code from ImageCoordinatePicker layouts.
+# @License : MIT License
+#
+# 把布局直接转换为Ren'Py的screen代码，例如:
+#     screen main_menu():
+#         add "gui/main_menu.png"
+#         add "gui/logo.png" pos (120, 80)
+#         imagebutton:
+#             auto "gui/start_%s.png"
+#             pos (860, 540)
+#             action NullAction()
+
+import os
+import re
+
+# 默认模板，使用str.format的命名字段
+SCREEN_TEMPLATE = "screen {screen_name}():\n"
+BACKGROUND_TEMPLATE = "    add \"{image}\"\n"
+ADD_TEMPLATE = "    add \"{image}\" pos ({x}, {y})\n"
+IMAGEBUTTON_TEMPLATE = (
+    "    imagebutton:\n"
+    "        {image_property} \"{image}\"\n"
+    "        pos ({x}, {y})\n"
+    "        action {action}\n"
+)
+POINT_TEMPLATE = "    # 坐标点 {index}: ({x}, {y})\n"
+
+# 名称匹配此正则的叠加图片生成imagebutton，其余生成add
+DEFAULT_BUTTON_PATTERN = r"(?i)(button|btn|_idle$)"
+# 以这些后缀结尾的图片使用imagebutton的auto属性(如 start_idle.png -> start_%s.png)
+AUTO_STATE_SUFFIXES = ("_idle", "_hover", "_insensitive", "_selected_idle", "_selected_hover")
+
+
+class RenpyExportOptions:
+    #####Ren'Py导出选项: 图片路径前缀、模板与按钮识别规则#####
+    def __init__(self, image_prefix="gui/", button_pattern=DEFAULT_BUTTON_PATTERN,
+                 default_action="NullAction()", include_background=True, include_points=True,
+                 screen_template=SCREEN_TEMPLATE, background_template=BACKGROUND_TEMPLATE,
+                 add_template=ADD_TEMPLATE, imagebutton_template=IMAGEBUTTON_TEMPLATE,
+                 point_template=POINT_TEMPLATE):
+        self.image_prefix = image_prefix
+        self.button_pattern = re.compile(button_pattern) if button_pattern else None
+        self.default_action = default_action
+        self.include_background = include_background
+        self.include_points = include_points
+        self.screen_template = screen_template
+        self.background_template = background_template
+        self.add_template = add_template
+        self.imagebutton_template = imagebutton_template
+        self.point_template = point_template
+
+
+def screen_identifier(name):
+    #####把布局名称转换为合法的Ren'Py screen名称#####
+    identifier = re.sub(r"\W", "_", name or "").strip("_")
+    if not identifier:
+        identifier = "layout"
+    if identifier[0].isdigit():
+        identifier = "screen_" + identifier
+    return identifier
+
+
+def image_reference(path, name, prefix):
+    #####生成screen中引用图片的路径(Ren'Py统一使用正斜杠)#####
+    # 布局可能来自另一个系统，同时按正斜杠和反斜杠拆分
+    file_name = re.split(r"[\\/]", path)[-1] if path else name + ".png"
+    return (prefix + file_name).replace("\\", "/")
+
+
+def is_button(overlay, options):
+    #####判断叠加图片是否应生成imagebutton#####
+    return options.button_pattern is not None and options.button_pattern.search(overlay.name) is not None
+
+
+def button_image_property(image):
+    #####按文件名后缀决定使用auto还是idle属性#####
+    base, extension = os.path.splitext(image)
+    for suffix in sorted(AUTO_STATE_SUFFIXES, key=len, reverse=True):
+        if base.endswith(suffix):
+            return "auto", base[:-len(suffix)] + "_%s" + extension
+    return "idle", image
+
+
+def iter_screen_code(layout, options=None, screen_name=None):
+    #####逐段生成一个布局对应的screen代码#####
+    options = options or RenpyExportOptions()
+    yield options.screen_template.format(screen_name=screen_identifier(screen_name or layout.name))
+
+    if options.include_background and layout.background_path:
+        image = image_reference(layout.background_path, "background", options.image_prefix)
+        yield options.background_template.format(image=image)
+
+    for overlay in layout.overlays:
+        image = image_reference(overlay.path, overlay.name, options.image_prefix)
+        if is_button(overlay, options):
+            image_property, image = button_image_property(image)
+            yield options.imagebutton_template.format(
+                image_property=image_property, image=image,
+                x=overlay.x, y=overlay.y, name=overlay.name, action=options.default_action
+            )
+        else:
+            yield options.add_template.format(image=image, x=overlay.x, y=overlay.y, name=overlay.name)
+
+    if options.include_points:
+        for index, (x, y) in enumerate(layout.points, 1):
+            yield options.point_template.format(index=index, x=x, y=y)
+
+    # screen中没有任何语句时Ren'Py会报错
+    if not layout.overlays and not (options.include_background and layout.background_path):
+        yield "    pass\n"
+
+
+def write_screens(layouts, f, options=None):
+    #####把多个布局依次写成screen代码，逐个布局流式写出，返回写出的screen数量#####
+    options = options or RenpyExportOptions()
+    count = 0
+    for layout in layouts:
+        if count:
+            f.write("\n")
+        f.writelines(iter_screen_code(layout, options))
+        count += 1
+    return count
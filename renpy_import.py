@@ -0,0 +1,331 @@
+# @title   : renpy_import.py
+# -*- coding:utf-8 -*-
+# @author  : TokitaYitsuki
+# @URL : https://github.com/TokitaYitsuki/ImageCoordinatePicker-To-Renpy
+# @Description: Reads screen definitions from a Ren'Py project so that their layouts can be reopened.
+# @License : MIT License
+#
+# 扫描Ren'Py项目中的.rpy文件，找出screen中的add/imagebutton语句及其pos/xpos/ypos/xypos属性，
+# 并把图片解析为game目录下的实际文件。screen索引按文件的修改时间与大小增量更新并缓存到磁盘，
+# 包含上千个screen的项目也可以快速搜索和打开。
+#
+# 只读取字面量坐标: 容器(frame/hbox/fixed等)造成的相对偏移、anchor/align等属性不会被计算。
+# renpy_export生成的screen可以原样导入: 没有坐标的背景add还原为背景，坐标点注释还原为坐标点。
+
+import hashlib
+import json
+import os
+import re
+
+from picker_core import Layout, OverlayItem, default_cache_dir
+
+# 索引文件格式版本，格式变化时递增以丢弃旧缓存
+INDEX_VERSION = 1
+# Ren'Py会自动把images目录下的图片按文件名定义为图片
+IMAGE_EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg", ".bmp", ".gif", ".avif")
+
+SCREEN_PATTERN = re.compile(r"^(\s*)screen\s+([A-Za-z_]\w*)\s*(?:\([^)]*\))?\s*:")
+IMAGE_DEFINE_PATTERN = re.compile(r"^\s*image\s+([\w ]+?)\s*=\s*(?:Image\()?\s*[\"']([^\"']+)[\"']")
+ADD_PATTERN = re.compile(r"^(\s*)add\s+(\"[^\"]*\"|'[^']*'|[A-Za-z_][\w ]*?)(?=\s|:|$)(.*)$")
+IMAGEBUTTON_PATTERN = re.compile(r"^(\s*)imagebutton\b(.*)$")
+STRING_PROPERTY_PATTERN = re.compile(r"\b(idle|auto|hover|insensitive)\s+(\"[^\"]*\"|'[^']*')")
+NUMBER = r"([+-]?\d+(?:\.\d*)?)"
+PAIR_PROPERTY_PATTERN = re.compile(r"\b(pos|xypos)\s*\(\s*" + NUMBER + r"\s*,\s*" + NUMBER + r"\s*\)")
+SINGLE_PROPERTY_PATTERN = re.compile(r"\b(xpos|ypos)\s+" + NUMBER)
+# renpy_export写出的坐标点注释，例如 # 坐标点 3: (120, 80)
+POINT_COMMENT_PATTERN = re.compile(r"^#\s*坐标点\s*\d+\s*:\s*\(\s*([+-]?\d+)\s*,\s*([+-]?\d+)\s*\)")
+
+
+def parse_number(text):
+    #####Ren'Py中整数为像素，浮点数为相对父容器尺寸的比例#####
+    return float(text) if "." in text else int(text)
+
+
+def indent_width(line):
+    #####计算行首缩进宽度(制表符按4个空格计)#####
+    line = line.expandtabs(4)
+    return len(line) - len(line.lstrip(" "))
+
+
+def unquote(text):
+    #####去掉字符串两端的引号#####
+    return text[1:-1] if text[:1] in ("\"", "'") else text
+
+
+class ScreenElement:
+    #####screen中的一个add或imagebutton语句#####
+    def __init__(self, kind, line, image=None):
+        self.kind = kind
+        self.line = line
+        self.image = image
+        self.images = {}
+        self.x = 0
+        self.y = 0
+        # 是否写出了pos/xpos/ypos/xypos，没有坐标的add通常是铺满界面的背景
+        self.positioned = False
+
+    def apply_properties(self, text):
+        #####从一行文本中读取图片与坐标属性#####
+        for name, value in STRING_PROPERTY_PATTERN.findall(text):
+            self.images[name] = unquote(value)
+        for _, x, y in PAIR_PROPERTY_PATTERN.findall(text):
+            self.x, self.y = parse_number(x), parse_number(y)
+            self.positioned = True
+        for name, value in SINGLE_PROPERTY_PATTERN.findall(text):
+            self.positioned = True
+            if name == "xpos":
+                self.x = parse_number(value)
+            else:
+                self.y = parse_number(value)
+
+    def image_reference(self):
+        #####返回用于显示的图片引用(auto按idle状态解析)#####
+        if self.image:
+            return self.image
+        if "idle" in self.images:
+            return self.images["idle"]
+        if "auto" in self.images:
+            return self.images["auto"].replace("%s", "idle")
+        return next(iter(self.images.values()), None)
+
+
+def parse_screen_lines(lines, start, points=None):
+    #####从screen语句所在行开始解析其中的add/imagebutton语句，传入points时收集坐标点注释#####
+    screen_indent = indent_width(lines[start])
+    elements = []
+    current = None
+    current_indent = 0
+
+    for number in range(start + 1, len(lines)):
+        line = lines[number]
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("#"):
+            match = POINT_COMMENT_PATTERN.match(stripped) if points is not None else None
+            if match and indent_width(line) > screen_indent:
+                points.append((int(match.group(1)), int(match.group(2))))
+            continue
+        indent = indent_width(line)
+        if indent <= screen_indent:
+            break
+
+        # 属于当前语句块的子行
+        if current is not None and indent > current_indent:
+            current.apply_properties(stripped)
+            continue
+        current = None
+
+        match = ADD_PATTERN.match(line)
+        if match:
+            element = ScreenElement("add", number + 1, unquote(match.group(2).strip()))
+            element.apply_properties(match.group(3))
+        else:
+            match = IMAGEBUTTON_PATTERN.match(line)
+            if not match:
+                continue
+            element = ScreenElement("imagebutton", number + 1)
+            element.apply_properties(match.group(2))
+
+        elements.append(element)
+        if stripped.endswith(":"):
+            current = element
+            current_indent = indent
+    return elements
+
+
+def scan_file(path):
+    #####扫描一个.rpy文件，返回(screen列表[(名称, 行号)], 图片定义{名称: 文件})#####
+    screens = []
+    images = {}
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            match = SCREEN_PATTERN.match(line)
+            if match:
+                screens.append((match.group(2), number))
+                continue
+            match = IMAGE_DEFINE_PATTERN.match(line)
+            if match:
+                images[" ".join(match.group(1).split())] = match.group(2)
+    return screens, images
+
+
+def find_game_dir(project_dir):
+    #####Ren'Py项目的图片路径相对于game目录#####
+    game_dir = os.path.join(project_dir, "game")
+    return game_dir if os.path.isdir(game_dir) else project_dir
+
+
+def is_background(element, number, path, background_path=None):
+    #####判断没有坐标的add是否为背景: 与当前背景同名，未指定背景时取screen中的第一条语句#####
+    if element.kind != "add" or element.positioned:
+        return False
+    if background_path:
+        return os.path.basename(path).lower() == os.path.basename(background_path).lower()
+    return number == 0
+
+
+def round_trip_problems(layout, options=None):
+    #####把布局生成screen代码后重新解析，返回无法原样还原的内容列表#####
+    from renpy_export import RenpyExportOptions, image_reference, iter_screen_code
+
+    options = options or RenpyExportOptions()
+    lines = "".join(iter_screen_code(layout, options)).splitlines()
+    points = []
+    elements = parse_screen_lines(lines, 0, points)
+    problems = []
+
+    # 背景没有坐标，应当是screen中的第一条语句
+    if options.include_background and layout.background_path:
+        expected = image_reference(layout.background_path, "background", options.image_prefix)
+        if not elements or not is_background(elements[0], 0, expected) or elements[0].image != expected:
+            problems.append(f"背景 {expected} 无法还原")
+        else:
+            elements = elements[1:]
+    elif elements and is_background(elements[0], 0, elements[0].image_reference() or ""):
+        problems.append(f"叠加图片 {elements[0].image_reference()} 会被识别为背景")
+
+    for overlay, element in zip(layout.overlays, elements):
+        expected = image_reference(overlay.path, overlay.name, options.image_prefix)
+        found = (element.image_reference(), element.x, element.y)
+        if found != (expected, overlay.x, overlay.y):
+            problems.append(f"叠加图片 {overlay.name}: 期望 {(expected, overlay.x, overlay.y)}，读回 {found}")
+    if len(elements) != len(layout.overlays):
+        problems.append(f"叠加图片数量: 期望 {len(layout.overlays)}，读回 {len(elements)}")
+
+    expected_points = [(x, y) for x, y in layout.points] if options.include_points else []
+    if points != expected_points:
+        problems.append(f"坐标点: 期望 {len(expected_points)} 个，读回 {len(points)} 个或坐标不一致")
+    return problems
+
+
+class RenpyScreenIndex:
+    #####Ren'Py项目的screen索引，按文件修改时间增量更新并缓存到磁盘#####
+    def __init__(self, project_dir, cache_dir=None):
+        self.project_dir = os.path.abspath(project_dir)
+        self.game_dir = find_game_dir(self.project_dir)
+        digest = hashlib.sha1(self.project_dir.encode("utf-8")).hexdigest()[:16]
+        self.index_path = os.path.join(cache_dir or default_cache_dir(), f"renpy_index_{digest}.json")
+        self.files = {}  # 相对路径 -> {"mtime", "size", "screens", "images"}
+        self.screens = {}  # screen名称 -> (相对路径, 行号)
+        self.images = {}  # 图片名称 -> 相对game目录的文件
+        self.image_files = {}  # images目录下的文件名(小写、不含扩展名) -> 相对路径
+        self.sorted_names = []
+
+    def load_cache(self):
+        #####读取磁盘上的索引缓存，格式不符时忽略#####
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("project") == self.project_dir:
+            self.files = data.get("files", {})
+
+    def save_cache(self):
+        #####写出索引缓存(先写临时文件再替换，避免中途失败留下损坏的文件)#####
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": INDEX_VERSION, "project": self.project_dir, "files": self.files}, f)
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self, progress=None):
+        #####重新扫描项目，只解析新增或修改过的.rpy文件，返回重新解析的文件数#####
+        self.load_cache()
+        found = {}
+        image_files = {}
+        for directory, _, file_names in os.walk(self.game_dir):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                relative = os.path.relpath(path, self.game_dir).replace("\\", "/")
+                base, extension = os.path.splitext(file_name)
+                if extension.lower() == ".rpy":
+                    found[relative] = path
+                elif extension.lower() in IMAGE_EXTENSIONS and relative.lower().startswith("images/"):
+                    image_files.setdefault(" ".join(base.lower().replace("_", " ").split()), relative)
+
+        parsed = 0
+        files = {}
+        for index, (relative, path) in enumerate(sorted(found.items())):
+            stat = os.stat(path)
+            entry = self.files.get(relative)
+            if entry is None or entry["mtime"] != stat.st_mtime or entry["size"] != stat.st_size:
+                screens, images = scan_file(path)
+                entry = {"mtime": stat.st_mtime, "size": stat.st_size, "screens": screens, "images": images}
+                parsed += 1
+            files[relative] = entry
+            if progress is not None:
+                progress(index + 1, len(found))
+
+        removed = len(set(self.files) - set(files))
+        self.files = files
+        self.image_files = image_files
+        self.rebuild_lookup()
+        if parsed or removed:
+            self.save_cache()
+        return parsed
+
+    def rebuild_lookup(self):
+        #####根据文件条目重建名称查找表#####
+        self.screens = {}
+        self.images = {}
+        for relative, entry in self.files.items():
+            for name, line in entry["screens"]:
+                self.screens.setdefault(name, (relative, line))
+            self.images.update(entry["images"])
+        self.sorted_names = sorted(self.screens, key=str.lower)
+
+    def search(self, query="", limit=None):
+        #####按名称搜索screen(不区分大小写的子串匹配)，结果按名称排序#####
+        query = query.strip().lower()
+        names = self.sorted_names if not query else [name for name in self.sorted_names if query in name.lower()]
+        return names if limit is None else names[:limit]
+
+    def resolve_image(self, reference):
+        #####把screen中的图片引用解析为磁盘上的文件路径，无法解析时返回None#####
+        if not reference:
+            return None
+
+        # image语句定义的图片名称
+        if reference in self.images:
+            reference = self.images[reference]
+
+        candidate = os.path.join(self.game_dir, reference)
+        if os.path.isfile(candidate):
+            return candidate
+        candidate = os.path.join(self.game_dir, "images", reference)
+        if os.path.isfile(candidate):
+            return candidate
+
+        # images目录下自动定义的图片按去掉扩展名的小写文件名匹配
+        relative = self.image_files.get(" ".join(reference.lower().replace("_", " ").split()))
+        return os.path.join(self.game_dir, relative) if relative else None
+
+    def load_screen(self, name, width=None, height=None, background_path=None):
+        #####读取一个screen并转换为布局，浮点坐标按背景尺寸换算为像素#####
+        relative, line = self.screens[name]
+        with open(os.path.join(self.game_dir, relative), 'r', encoding='utf-8-sig', errors='replace') as f:
+            lines = f.read().splitlines()
+
+        overlays = []
+        unresolved = []
+        points = []
+        background = None
+        elements = parse_screen_lines(lines, line - 1, points)
+        for number, element in enumerate(elements):
+            reference = element.image_reference()
+            path = self.resolve_image(reference)
+            if path is None:
+                unresolved.append(reference or f"{relative}:{element.line}")
+                continue
+            if background is None and is_background(element, number, path, background_path):
+                background = path
+                continue
+            x = round(element.x * width) if isinstance(element.x, float) and width else int(element.x)
+            y = round(element.y * height) if isinstance(element.y, float) and height else int(element.y)
+            item_name = os.path.splitext(os.path.basename(path))[0]
+            overlays.append(OverlayItem(item_name, x, y, path=path))
+
+        layout = Layout(width or 0, height or 0, points, overlays, background_path=background, name=name)
+        return layout, unresolved